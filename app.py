@@ -1,25 +1,40 @@
 import os
 import json
-import tempfile
-from PyPDF2 import PdfReader
-from docx import Document
-from PIL import Image
-import pytesseract
-from langdetect import detect
+import time
+from concurrent.futures import ProcessPoolExecutor
 from src.prompt import *
-from langdetect import detect
+from src.prompt import VERIFICATION_WINDOW
+from src.pre_verification import prepare_verification
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
 from werkzeug.utils import secure_filename
-from deep_translator import GoogleTranslator
-from flask import Flask, render_template, request, jsonify, Response
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 from src.helper import download_hugging_face_embeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain.chains import create_retrieval_chain
+from src.resources import registry
+from src.embedding_service import BatchingEmbeddingService
+from src.vector_store import open_vector_store, VECTOR_BACKEND
+from src.hybrid_retriever import HybridRetriever, LexicalIndex, LEXICAL_INDEX_PATH, RETRIEVER_MODE
+from src.answer_cache import build_answer_cache, context_fingerprint
+from src.streaming import sse_event, translate_stream, SSE_HEADERS
+from src.pipeline import Stage, run_dag
+from src.translation import build_translation_service, SUPPORTED_LANGS, DETECT_PREFIX_CHARS
+from src.extraction import extract_document, DOCUMENT_EXTENSIONS, EXTRACTION_WORKERS
+from src.tariff_index import get_tariff_index
+from src.intent_router import IntentRouter
+from src.duty_calculator import get_duty_calculator, to_rows
+from src.metrics import metrics, stage, timed_stream, start_trace, finish_trace, CONTENT_TYPE, CONTEXT_TOKENS
+from src.context_builder import assemble_context, cap_input, context_budget, documents_tokens, MAX_INPUT_TOKENS
+from src.tokens import estimate_tokens, message_tokens
+from src.job_queue import JobQueue, JobWorkerPool, public_job, JOB_WORKERS
+from src.session_store import (
+    BoundedChatMessageHistory,
+    build_session_store,
+    resolve_session_id,
+    SESSION_COOKIE,
+    SESSION_HEADER,
+    SESSION_TTL,
+)
 from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.messages import HumanMessage, AIMessage
 
 
 # ----------------------------- Flask App Setup -----------------------------
@@ -27,22 +42,63 @@ app = Flask(__name__)
 load_dotenv()
 
 # ----------------------------- API Keys -----------------------------
-PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
-HUGGINGFACEHUB_API_TOKEN = os.getenv('HUGGINGFACEHUB_API_TOKEN')
+def load_api_keys():
+    PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
+    HUGGINGFACEHUB_API_TOKEN = os.getenv('HUGGINGFACEHUB_API_TOKEN')
+
+    if not PINECONE_API_KEY or not HUGGINGFACEHUB_API_TOKEN:
+        raise ValueError("❌ Missing API keys. Check your .env file.")
+
+    os.environ['PINECONE_API_KEY'] = PINECONE_API_KEY
+    os.environ['HUGGINGFACEHUB_API_TOKEN'] = HUGGINGFACEHUB_API_TOKEN
+    print("✅ API keys loaded successfully!")
+
+# ----------------------------- Embeddings & Vector Store -----------------------------
+# Everything heavy is built lazily through the resource registry: importing
+# this module is cheap, and each resource is created once, on first use.
+
+# Query embeddings go through a micro-batching, LRU-cached service so
+# concurrent /get requests share one forward pass and repeated FAQs skip it.
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "2"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+
+
+@registry.resource("embeddings")
+def build_embeddings():
+    return BatchingEmbeddingService(
+        download_hugging_face_embeddings(),
+        max_batch=EMBED_MAX_BATCH,
+        max_wait_ms=EMBED_MAX_WAIT_MS,
+        cache_size=EMBED_CACHE_SIZE,
+    )
+
+
+@registry.resource("docsearch")
+def build_docsearch():
+    # VECTOR_BACKEND=local serves retrieval from the on-disk index instead of Pinecone
+    if VECTOR_BACKEND == "pinecone":
+        load_api_keys()
+    return open_vector_store(registry.get("embeddings"))
 
-if not PINECONE_API_KEY or not HUGGINGFACEHUB_API_TOKEN:
-    raise ValueError("❌ Missing API keys. Check your .env file.")
 
-os.environ['PINECONE_API_KEY'] = PINECONE_API_KEY
-os.environ['HUGGINGFACEHUB_API_TOKEN'] = HUGGINGFACEHUB_API_TOKEN
-print("✅ API keys loaded successfully!")
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "3"))
 
-# ----------------------------- Embeddings & Pinecone -----------------------------
-embeddings = download_hugging_face_embeddings()
-index_name = "customs-clearance-chatbot"
 
-docsearch = PineconeVectorStore.from_existing_index(index_name=index_name, embedding=embeddings)
-retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k": 3})
+@registry.resource("retriever")
+def build_retriever():
+    docsearch = registry.get("docsearch")
+    # Hybrid mode: BM25 + dense fused with RRF, exact HS-code hits bypass vector search
+    if RETRIEVER_MODE == "hybrid" and os.path.exists(LEXICAL_INDEX_PATH):
+        return HybridRetriever(
+            dense=docsearch.as_retriever(search_type="similarity", search_kwargs={"k": 10}),
+            lexical=LexicalIndex.load(LEXICAL_INDEX_PATH),
+            k=RETRIEVER_K,
+            candidate_k=10,
+        )
+    if RETRIEVER_MODE == "hybrid":
+        print(f"⚠️ {LEXICAL_INDEX_PATH} not found, using dense retrieval only. Run src/store_index.py.")
+    return docsearch.as_retriever(search_type="similarity", search_kwargs={"k": RETRIEVER_K})
 
 # ----------------------------- LLM Setup -----------------------------
 # llm = ChatGroq(
@@ -53,12 +109,16 @@ retriever = docsearch.as_retriever(search_type="similarity", search_kwargs={"k":
 # )
 
 
-llm = ChatGroq(
-    model="llama-3.3-70b-versatile",
-    temperature=0.7,
-    max_tokens=512,
-    streaming=True
-)
+@registry.resource("llm")
+def build_llm():
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model="llama-3.3-70b-versatile",
+        temperature=0.7,
+        max_tokens=512,
+        streaming=True
+    )
 
 
 # ----------------------------- Prompt Template -----------------------------
@@ -69,23 +129,207 @@ prompt = ChatPromptTemplate.from_messages([
 ])
 
 # ----------------------------- Chat Memory -----------------------------
-store = {}
+# SESSION_BACKEND=memory|sqlite; histories are windowed to HISTORY_TOKEN_BUDGET
+# with older turns folded into a summary (see src/session_store.py)
+registry.register("session_store", build_session_store)
+
 
 def get_session_history(session_id: str):
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-    return store[session_id]
+    return BoundedChatMessageHistory(session_id, registry.get("session_store"))
+
+
+def get_session_id():
+    # Per-client conversation, resolved once per request
+    if "session_id" not in g:
+        g.session_id, _ = resolve_session_id(
+            request.headers.get(SESSION_HEADER), request.cookies.get(SESSION_COOKIE)
+        )
+    return g.session_id
 
 # ----------------------------- RAG Chain -----------------------------
-question_answer_chain = create_stuff_documents_chain(llm, prompt)
-rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-rag_chain_with_memory = RunnableWithMessageHistory(
-    rag_chain,
-    get_session_history,
-    input_messages_key="input",
-    history_messages_key="chat_history",
-    output_messages_key="answer"
-)
+def retrieve_context(inputs):
+    # Reuse documents the caller already retrieved (see generate_answer)
+    if inputs.get("context") is not None:
+        return inputs["context"]
+    return registry.get("retriever").invoke(inputs["input"])
+
+
+# Prompt overhead without any context; the rest of PROMPT_TOKEN_BUDGET goes
+# to history, question and context (see src/context_builder.py)
+SYSTEM_PROMPT_TOKENS = estimate_tokens(system_prompt.format(context=""))
+
+
+def cap_question(inputs):
+    # /upload sends the whole extracted document as the question
+    return cap_input(inputs["input"])
+
+
+def compress_context(inputs):
+    """Deduplicated, query-relevant sentences of the retrieved chunks, within the token budget."""
+    with stage("context_assembly"):
+        used = (
+            SYSTEM_PROMPT_TOKENS
+            + estimate_tokens(inputs["input"])
+            + sum(message_tokens(m) for m in inputs.get("chat_history") or [])
+        )
+        documents = assemble_context(inputs["input"], inputs["context"], context_budget(used))
+    CONTEXT_TOKENS.inc(documents_tokens(inputs["context"]), kind="retrieved")
+    CONTEXT_TOKENS.inc(documents_tokens(documents), kind="sent")
+    return documents
+
+
+@registry.resource("rag_chain_with_memory")
+def build_rag_chain():
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+    from langchain_core.runnables.history import RunnableWithMessageHistory
+
+    question_answer_chain = create_stuff_documents_chain(registry.get("llm"), prompt)
+    # Same shape as create_retrieval_chain, but retrieval can be done up front
+    # and the context is compressed before it is stuffed into the prompt
+    rag_chain = (
+        RunnablePassthrough.assign(input=RunnableLambda(cap_question))
+        .assign(context=RunnableLambda(retrieve_context))
+        .assign(context=RunnableLambda(compress_context))
+        .assign(answer=question_answer_chain)
+        .with_config(run_name="retrieval_chain")
+    )
+    return RunnableWithMessageHistory(
+        rag_chain,
+        get_session_history,
+        input_messages_key="input",
+        history_messages_key="chat_history",
+        output_messages_key="answer"
+    )
+
+
+def get_llm():
+    return registry.get("llm")
+
+
+def get_rag_chain():
+    return registry.get("rag_chain_with_memory")
+
+
+# ----------------------------- Intent Routing -----------------------------
+# HS code / duty / documentation / trade statistics questions are answered by
+# structured lookups before retrieval; INTENT_ROUTER=full|rules|off, see src/intent_router.py
+@registry.resource("intent_router")
+def build_intent_router():
+    return IntentRouter(
+        embed=lambda text: registry.get("embeddings").embed_query(text),
+        embed_documents=lambda texts: registry.get("embeddings").embed_documents(texts),
+    )
+
+
+def route_question(question, session_id):
+    """
+    Structured answer for an (already translated) question, or None when it
+    needs the RAG chain. Routed turns are recorded in the session history.
+    """
+    with stage("intent_routing"):
+        answer = registry.get("intent_router").route(question)
+    if answer is not None:
+        get_session_history(session_id).add_messages([HumanMessage(content=question), AIMessage(content=answer)])
+    return answer
+
+
+# ----------------------------- Answer Cache -----------------------------
+# ANSWER_CACHE_BACKEND=memory|sqlite|off, see src/answer_cache.py
+registry.register("answer_cache", build_answer_cache)
+
+
+def lookup_cached_answer(question, session_id):
+    """
+    Retrieve the context for an (already translated) question and check the
+    semantic answer cache. Retrieval runs first so the cache can be keyed on
+    the retrieved context; on a hit the turn is recorded in the session
+    history as if the chain had produced it.
+
+    Only the first turn of a conversation uses the cache: later answers also
+    depend on the chat history, which the cache key does not cover.
+
+    Returns (docs, cached_answer or None, cache_key or None).
+    """
+    with stage("vector_search"):
+        docs = registry.get("retriever").invoke(question)
+    cache = registry.get("answer_cache")
+    if cache is None or get_session_history(session_id).messages:
+        return docs, None, None
+
+    with stage("answer_cache"):
+        cache_key = (registry.get("embeddings").embed_query(question), context_fingerprint(docs))
+        cached_answer = cache.lookup(*cache_key)
+    if cached_answer is not None:
+        get_session_history(session_id).add_messages(
+            [HumanMessage(content=question), AIMessage(content=cached_answer)]
+        )
+    return docs, cached_answer, cache_key
+
+
+def remember_answer(cache_key, answer):
+    if cache_key is not None:
+        registry.get("answer_cache").add(*cache_key, answer)
+
+
+def generate_answer(question, session_id):
+    """
+    English answer for an (already translated) question, served by the
+    intent router or the answer cache when possible so the LLM is skipped entirely.
+    """
+    routed_answer = route_question(question, session_id)
+    if routed_answer is not None:
+        return routed_answer
+
+    docs, cached_answer, cache_key = lookup_cached_answer(question, session_id)
+    if cached_answer is not None:
+        return cached_answer
+
+    with stage("llm_generation"):
+        response = get_rag_chain().invoke(
+            {"input": question, "context": docs},
+            config={"configurable": {"session_id": session_id}}
+        )
+    answer = response["answer"]
+    remember_answer(cache_key, answer)
+    return answer
+
+
+def stream_rag_tokens(inputs, session_id):
+    # The chain streams dict chunks; only the "answer" ones carry LLM tokens
+    for chunk in get_rag_chain().stream(inputs, config={"configurable": {"session_id": session_id}}):
+        token = chunk.get("answer")
+        if token:
+            yield token
+
+
+def stream_answer(question, session_id):
+    """
+    Streaming counterpart of generate_answer: yields answer tokens as the LLM
+    produces them (routed answers and cache hits are yielded in one piece).
+    """
+    routed_answer = route_question(question, session_id)
+    if routed_answer is not None:
+        yield routed_answer
+        return
+
+    docs, cached_answer, cache_key = lookup_cached_answer(question, session_id)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+
+    parts = []
+    tokens = stream_rag_tokens({"input": question, "context": docs}, session_id)
+    for token in timed_stream(tokens, "llm_first_token", "llm_generation"):
+        parts.append(token)
+        yield token
+    remember_answer(cache_key, "".join(parts))
+
+
+# Optional: start loading the model/clients in the background as soon as a
+# worker imports the app, so the first request does not pay for it.
+if os.getenv("WARM_UP_RESOURCES", "0") == "1":
+    registry.warm_up(background=True)
 
 # ----------------------------- Upload Folder -----------------------------
 UPLOAD_FOLDER = 'uploads'
@@ -93,162 +337,449 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # ----------------------------- Routes -----------------------------
+# Per-request trace: stage spans feed the /metrics histograms, and requests
+# slower than SLOW_REQUEST_SECONDS are sampled into the slow-request log
+@app.before_request
+def begin_trace():
+    # Label by route pattern, not raw path, so the metric cardinality stays bounded
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    g.trace, g.trace_token = start_trace(route)
+
+
+@app.after_request
+def trace_streamed_body(response):
+    g.status = response.status_code
+    if response.is_streamed and "trace" in g:
+        # A streamed body is timed until the client has received all of it
+        trace, token = g.pop("trace"), g.pop("trace_token")
+        response.call_on_close(lambda: finish_trace(trace, token, response.status_code))
+    return response
+
+
+@app.teardown_request
+def end_trace(error=None):
+    trace = g.pop("trace", None)
+    if trace is not None:
+        finish_trace(trace, g.pop("trace_token"), 500 if error else g.get("status", 500))
+
+
+@app.after_request
+def set_session_cookie(response):
+    # Re-set on every response so the cookie expires SESSION_TTL after last use, like the session
+    if "session_id" in g:
+        response.set_cookie(SESSION_COOKIE, g.session_id, max_age=int(SESSION_TTL), httponly=True, samesite="Lax")
+    return response
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
+# ----------------------------- Customs Tariff -----------------------------
+# HS codes and duty rates parsed from the Customs Tariff PDF (python -m
+# src.tariff_index); None, and looked up again on the next use, until the
+# index has been built
+registry.register("tariff_index", get_tariff_index, cache_none=False)
+# Deterministic duty/VAT calculation on top of it (see src/duty_calculator.py)
+registry.register("duty_calculator", get_duty_calculator)
+
+
+def run_duty_calculation(payload):
+    """
+    One invoice line, or {"lines": [...]} for a batch. Returns (body, status).
+    """
+    if not isinstance(payload, dict):
+        return {"error": "Expected a JSON object"}, 400
+    calculator = registry.get("duty_calculator")
+    try:
+        if "lines" not in payload:
+            result = calculator.calculate(payload)
+            return result, 400 if result["error"] else 200
+        if not isinstance(payload["lines"], list):
+            return {"error": "'lines' must be a list of invoice lines"}, 400
+        invalid = [i for i, line in enumerate(payload["lines"]) if not isinstance(line, dict)]
+        if invalid:
+            return {"error": f"Invoice lines at index {', '.join(map(str, invalid))} are not JSON objects"}, 400
+        rows = to_rows(calculator.calculate_batch(payload["lines"]))
+    except (TypeError, ValueError) as e:
+        return {"error": f"Invalid invoice line: {e}"}, 400
+    total = sum(row["total_taxes"] for row in rows if not row["error"])
+    return {"lines": rows, "failed": sum(1 for row in rows if row["error"]), "total_taxes": round(total, 2)}, 200
+
+
+# ----------------------------- Language Support -----------------------------
+# TRANSLATION_BACKEND=google|offline|module:factory; translations are cached
+# in memory and on disk, see src/translation.py
+registry.register("translation", build_translation_service)
+supported_langs = SUPPORTED_LANGS
+
+
+def detect_user_lang(text):
+    # --- Detect and limit language support ---
+    with stage("language_detection"):
+        return registry.get("translation").detect(text)
+
+
+def translator_to(user_lang):
+    """
+    English -> user_lang translate function, or None for English users.
+    """
+    if user_lang in ["hi", "ne", "mai"]:
+        translate = registry.get("translation").translator("en", user_lang)
+
+        def timed_translate(text):
+            with stage("translation_output"):
+                return translate(text)
+
+        return timed_translate
+    return None
+
+
+def translate_input(msg, user_lang):
+    # Translate user message to English (only for Hindi/Nepali/Maithili)
+    if user_lang != "en":
+        with stage("translation_input"):
+            return registry.get("translation").translate(msg, user_lang, "en")
+    return msg
+
 # ----------------------------- Chat API -----------------------------
 @app.route("/get", methods=["POST"])
 def chat():
     msg = request.form["msg"]
     print("🧍 User:", msg)
 
-    # --- Detect and limit language support ---
-    try:
-        detected_lang = detect(msg)
-    except:
-        detected_lang = "en"
-
-    supported_langs = {"en": "en", "hi": "hi", "ne": "ne","mai": "mai"}
-    user_lang = supported_langs.get(detected_lang, "en")
-
-    # Translate user message to English (only for Hindi/Nepali)
-    if user_lang != "en":
-        translated_input = GoogleTranslator(source=user_lang, target="en").translate(msg)
-    else:
-        translated_input = msg
+    user_lang = detect_user_lang(msg)
+    translated_input = translate_input(msg, user_lang)
 
     print("🔤 Translated Input:", translated_input)
-    session_id = "default_user"
+    session_id = get_session_id()
 
-    # --- Generate response ---
-    response = rag_chain_with_memory.invoke(
-        {"input": translated_input},
-        config={"configurable": {"session_id": session_id}}
-    )
-
-    english_answer = response["answer"]
+    # --- Generate response (served from the answer cache when possible) ---
+    english_answer = generate_answer(translated_input, session_id)
 
     # Translate response back to user's language (only for Hindi/Nepali)
-    if user_lang in ["hi", "ne", "mai"]:
-        translated_answer = GoogleTranslator(source="en", target=user_lang).translate(english_answer)
-    else:
-        translated_answer = english_answer
+    translate = translator_to(user_lang)
+    translated_answer = translate(english_answer) if translate else english_answer
 
     return str(translated_answer)
 
+
+@app.route("/get/stream", methods=["POST"])
+def chat_stream():
+    """
+    Same as /get, but answers as Server-Sent Events while the LLM generates:
+    `data: {"text": ...}` per piece, then `event: done`. Non-English answers
+    are translated sentence by sentence as each sentence completes.
+    """
+    msg = request.form["msg"]
+    print("🧍 User (stream):", msg)
+    session_id = get_session_id()
+
+    def events():
+        try:
+            user_lang = detect_user_lang(msg)
+            translated_input = translate_input(msg, user_lang)
+            tokens = stream_answer(translated_input, session_id)
+            for text in translate_stream(tokens, translator_to(user_lang)):
+                yield sse_event({"text": text})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            print("❌ Error:", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+# ----------------------------- Stats API -----------------------------
+@app.route("/stats", methods=["GET"])
+def stats():
+    # Never force-load anything here: report only what is already built
+    data = {"resources": registry.status()}
+    if registry.is_ready("embeddings"):
+        data["embeddings"] = registry.get("embeddings").metrics()
+    if registry.is_ready("answer_cache") and registry.get("answer_cache") is not None:
+        data["answer_cache"] = registry.get("answer_cache").stats()
+    if registry.is_ready("translation"):
+        data["translation"] = registry.get("translation").stats()
+    if registry.is_ready("session_store"):
+        data["sessions"] = len(registry.get("session_store"))
+    if registry.is_ready("intent_router"):
+        data["intent_router"] = registry.get("intent_router").stats()
+    if registry.is_ready("tariff_index"):
+        data["tariff_lines"] = len(registry.get("tariff_index"))
+    if registry.is_ready("job_workers"):
+        data["jobs"] = registry.get("job_workers").stats()
+    return jsonify(data)
+
+@app.route("/calculate-duty", methods=["POST"])
+def calculate_duty():
+    body, status = run_duty_calculation(request.get_json(silent=True))
+    return jsonify(body), status
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    # Prometheus text format; histograms are per process, scrape each worker
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
 # ----------------------------- File Upload + Document Verification -----------------------------
-ALLOWED_EXTENSIONS = {'pdf', 'docx', 'jpg', 'jpeg', 'png'}
+ALLOWED_EXTENSIONS = DOCUMENT_EXTENSIONS
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-@app.route("/upload", methods=["POST"])
-def upload_file():
+def get_uploaded_file():
+    """
+    Validate the multipart upload. Returns (file, None) or (None, error response).
+    """
     if "file" not in request.files:
-        return jsonify({"error": "No file uploaded"}), 400
+        return None, (jsonify({"error": "No file uploaded"}), 400)
 
     file = request.files["file"]
     if file.filename == "":
-        return jsonify({"error": "No file selected"}), 400
+        return None, (jsonify({"error": "No file selected"}), 400)
 
     if not allowed_file(file.filename):
-        return jsonify({"error": "Invalid file format"}), 400
+        return None, (jsonify({"error": "Invalid file format"}), 400)
+    return file, None
 
-    filename = secure_filename(file.filename)
-    with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-        file.save(temp_file.name)
-        file_path = temp_file.name
 
-    ext = filename.rsplit('.', 1)[1].lower()
-    extracted_text = ""
+# Scanned pages/images are OCR'd on a process pool (EXTRACTION_WORKERS) so
+# multi-page scans use every core
+registry.register("extraction_pool", lambda: ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS))
 
-    try:
-        # Extract text from supported document formats
-        if ext == "pdf":
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                extracted_text += page.extract_text() or ""
-
-        elif ext == "docx":
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                extracted_text += para.text + "\n"
-
-        elif ext in ["jpg", "jpeg", "png"]:
-            image = Image.open(file_path)
-            extracted_text = pytesseract.image_to_string(image)
-
-        os.remove(file_path)  # Clean up temp file
-
-        if not extracted_text.strip():
-            return jsonify({"reply": "No readable text found in document."})
-
-        session_id = "default_user"
-
-
-        verification_prompt = (
-    "You are a **Customs Document Verification Assistant**.\n"
-    "Your task is to carefully analyze the provided document text and determine:\n"
-    "1️⃣ Whether it is a valid customs-related document (e.g., Invoice, Bill of Lading, Customs Declaration, or Packing List).\n"
-    "2️⃣ Whether all essential trade details are present:\n"
-    "   - HS Code\n"
-    "   - Product Description\n"
-    "   - Country of Origin\n"
-    "   - Quantity & Value\n"
-    "   - Exporter/Importer Details\n"
-    "3️⃣ Whether the document appears **authentic and complete** (no missing or inconsistent data).\n\n"
-    "Respond strictly in the following format:\n"
-    "📄 Document Type: [Invoice / Bill of Lading / Customs Declaration / Other / Unknown]\n"
-    "📋 Document Status: [✅ Correct / ❌ Incorrect]\n"
-    "🔍 Verification Result: [✅ Verified: reason] or [❌ Invalid: reason]\n"
-    "💡 Missing or Suspicious Details (if any): [List clearly]\n\n"
-    f"Document Text:\n{extracted_text[:3000]}"
-)
 
+def upload_extension(file):
+    return secure_filename(file.filename).rsplit('.', 1)[1].lower()
 
-        verification_response = llm.invoke(verification_prompt)
-        verification_result = verification_response.content.strip()
-        print("📄 Verification Result:", verification_result)
 
-        # Step 2: Use RAG to generate customs explanation
-        response = rag_chain_with_memory.invoke(
-            {"input": extracted_text},
-            config={"configurable": {"session_id": session_id}}
-        )
+# Every upload stage reads only a prefix of the document: verification the
+# first VERIFICATION_WINDOW characters, language detection the first
+# DETECT_PREFIX_CHARS, the RAG analysis MAX_INPUT_TOKENS tokens (cap_question).
+# Extraction, and with it OCR of scanned pages, stops once all are covered.
+UPLOAD_TEXT_CHARS = max(VERIFICATION_WINDOW, DETECT_PREFIX_CHARS)
 
-        english_answer = response["answer"]
 
-        # --- Detect and restrict translation languages ---
-        try:
-            detected_lang = detect(extracted_text)
-        except:
-            detected_lang = "en"
+def extract_upload(data, ext, executor):
+    return extract_document(data, ext, max_chars=UPLOAD_TEXT_CHARS, max_tokens=MAX_INPUT_TOKENS,
+                            executor=executor, workers=EXTRACTION_WORKERS)
+
+
+def extract_upload_text(file):
+    # Read straight from the upload stream; no temp file on disk
+    data = file.read()
+    with stage("extraction"):
+        return extract_upload(data, upload_extension(file), registry.get("extraction_pool"))
+
+
+# ----------------------------- Upload Pipeline -----------------------------
+# Verification and RAG analysis are independent, and so are the two
+# translations, so the upload runs as a small DAG:
+#
+#   verification ─┐                 ┌─ translate_verification
+#   analysis ─────┼─────────────────┼─ translate_analysis
+#   language ─────┘ (detect + pick translator)
+def detect_translator(extracted_text):
+    # --- Detect and restrict translation languages ---
+    return translator_to(detect_user_lang(extracted_text))
+
+
+def translate_with(text, language):
+    return language(text) if language else text
+
+
+def upload_stages(extracted_text, verification, analysis):
+    """
+    The upload DAG around its two model stages. Flask passes blocking
+    callables; the ASGI app passes coroutines for the same stages.
+    """
+    return [
+        Stage("verification", verification),
+        Stage("analysis", analysis),
+        Stage("language", lambda: detect_translator(extracted_text)),
+        Stage("translate_verification", lambda verification, language: translate_with(verification, language),
+              deps=("verification", "language")),
+        Stage("translate_analysis", lambda analysis, language: translate_with(analysis, language),
+              deps=("analysis", "language")),
+    ]
+
+
+def build_upload_stages(extracted_text, session_id):
+    def verification():
+        # Clear-cut rejections are answered by the rule check without an LLM call
+        verification_result, verification_prompt = prepare_verification(extracted_text)
+        if verification_result is None:
+            with stage("llm_verification"):
+                verification_result = get_llm().invoke(verification_prompt).content.strip()
+        print("📄 Verification Result:", verification_result)
+        return verification_result
+
+    def analysis():
+        # Use RAG to generate customs explanation
+        with stage("rag_analysis"):
+            response = get_rag_chain().invoke(
+                {"input": extracted_text},
+                config={"configurable": {"session_id": session_id}}
+            )
+        return response["answer"]
+
+    return upload_stages(extracted_text, verification, analysis)
+
+
+def process_document(data, ext, session_id, on_stage=None):
+    """
+    Extract, verify and analyse one uploaded document. Returns the /upload
+    response body; `on_stage(name, ms)` is called as each stage finishes.
+    """
+    start = time.perf_counter()
+    with stage("extraction"):
+        extracted_text = extract_upload(data, ext, registry.get("extraction_pool"))
+    extract_ms = round((time.perf_counter() - start) * 1000, 1)
+    if on_stage is not None:
+        on_stage("extract", extract_ms)
+
+    if not extracted_text.strip():
+        return {"reply": "No readable text found in document."}
+
+    results, timings = run_dag(build_upload_stages(extracted_text, session_id), on_stage=on_stage)
+    timings = {"extract_ms": extract_ms, **timings}
+    timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    return {
+        "verification": results["translate_verification"],
+        "analysis": results["translate_analysis"],
+        "timings": timings,
+    }
 
-        supported_langs = {"en": "en", "hi": "hi", "ne": "ne","mai": "mai"}
-        user_lang = supported_langs.get(detected_lang, "en")
 
-        if user_lang in ["hi", "ne","mai"]:
-            translated_answer = GoogleTranslator(source="en", target=user_lang).translate(english_answer)
-            translated_verification = GoogleTranslator(source="en", target=user_lang).translate(verification_result)
-        else:
-            translated_answer = english_answer
-            translated_verification = verification_result
+@app.route("/upload", methods=["POST"])
+def upload_file():
+    file, error = get_uploaded_file()
+    if error:
+        return error
 
-        return jsonify({
-            "verification": translated_verification,
-            "analysis": translated_answer
-        })
+    try:
+        # Read straight from the upload stream; no temp file on disk
+        return jsonify(process_document(file.read(), upload_extension(file), get_session_id()))
 
     except Exception as e:
         print("❌ Error:", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/upload/stream", methods=["POST"])
+def upload_file_stream():
+    """
+    Same as /upload, but streamed as Server-Sent Events: verification tokens
+    (`"stage": "verification"`) followed by the RAG analysis
+    (`"stage": "analysis"`), then `event: done`.
+    """
+    file, error = get_uploaded_file()
+    if error:
+        return error
+    # Read the file while the request is still open; generation happens in the stream
+    try:
+        extracted_text = extract_upload_text(file)
+    except Exception as e:
+        print("❌ Error:", e)
+        return jsonify({"error": str(e)}), 500
+
+    if not extracted_text.strip():
+        return jsonify({"reply": "No readable text found in document."})
+
+    session_id = get_session_id()
+
+    def events():
+        try:
+            translate = translator_to(detect_user_lang(extracted_text))
+
+            verification_result, verification_prompt = prepare_verification(extracted_text)
+            if verification_result is not None:
+                verification_tokens = iter([verification_result])
+            else:
+                verification_tokens = timed_stream(
+                    (chunk.content for chunk in get_llm().stream(verification_prompt)),
+                    "llm_verification_first_token", "llm_verification",
+                )
+            for text in translate_stream(verification_tokens, translate):
+                yield sse_event({"stage": "verification", "text": text})
+
+            analysis_tokens = timed_stream(
+                stream_rag_tokens({"input": extracted_text}, session_id), "rag_analysis_first_token", "rag_analysis"
+            )
+            for text in translate_stream(analysis_tokens, translate):
+                yield sse_event({"stage": "analysis", "text": text})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            print("❌ Error:", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+# ----------------------------- Upload Jobs -----------------------------
+# POST /jobs/upload answers at once with a job ID; worker threads run
+# process_document() and GET /jobs/<job_id> reports progress and the result.
+# See src/job_queue.py.
+UPLOAD_JOB_STAGES = (
+    "extract", "verification", "analysis", "language", "translate_verification", "translate_analysis",
+)
+
+
+def run_upload_job(job, data, on_stage):
+    return process_document(data, job["ext"], job["session_id"], on_stage=on_stage)
+
+
+registry.register("job_queue", JobQueue)
+
+
+@registry.resource("job_workers")
+def build_job_workers():
+    # JOB_WORKERS=0: this process only enqueues; `python -m src.job_queue worker` processes
+    return JobWorkerPool(registry.get("job_queue"), run_upload_job, workers=JOB_WORKERS,
+                         stages=UPLOAD_JOB_STAGES).start()
+
+
+def get_job_queue():
+    # Polling also starts the workers, so jobs left from a restart are picked up
+    registry.get("job_workers")
+    return registry.get("job_queue")
+
+
+def enqueue_upload(data, filename, ext, session_id):
+    """Returns (response body, status code) for POST /jobs/upload."""
+    job, created = get_job_queue().enqueue(data, ext, filename=secure_filename(filename), session_id=session_id)
+    if created:
+        registry.get("job_workers").notify()
+    body = {**public_job(job), "deduplicated": not created, "status_url": f"/jobs/{job['id']}"}
+    # A document processed before comes back with its result straight away
+    return body, 200 if job["status"] == "done" else 202
+
+
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return {"error": "Unknown job"}, 404
+    return public_job(job), 200
+
+
+@app.route("/jobs/upload", methods=["POST"])
+def upload_job():
+    file, error = get_uploaded_file()
+    if error:
+        return error
+    body, status = enqueue_upload(file.read(), file.filename, upload_extension(file), get_session_id())
+    return jsonify(body), status
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    body, status = job_status(job_id)
+    return jsonify(body), status
+
 
 # ----------------------------- Main -----------------------------
 if __name__ == "__main__":
+    registry.warm_up(background=True)
     app.run(host="0.0.0.0", port=5000, debug=True)
 
 
@@ -0,0 +1,364 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from fastapi import FastAPI, Form, File, Request, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.templating import Jinja2Templates
+
+# The Flask app module is the composition root: resources, chain, cache and
+# prompt helpers are shared so both servers answer identically.
+from app import (
+    registry,
+    allowed_file,
+    detect_user_lang,
+    translator_to,
+    translate_input,
+    route_question,
+    run_duty_calculation,
+    lookup_cached_answer,
+    remember_answer,
+    extract_upload,
+    upload_extension,
+    upload_stages,
+    enqueue_upload,
+    job_status,
+)
+from src.streaming import sse_event, atranslate_stream, SSE_HEADERS
+from src.pipeline import arun_dag
+from src.extraction import EXTRACTION_WORKERS
+from src.pre_verification import prepare_verification
+from src.session_store import resolve_session_id, SESSION_COOKIE, SESSION_HEADER, SESSION_TTL
+from src.metrics import metrics, stage, atimed_stream, start_trace, finish_trace, CONTENT_TYPE
+
+
+# ----------------------------- Executors -----------------------------
+# Blocking I/O (translator, Pinecone, history) runs on a large thread pool so
+# hundreds of chats can wait on the network at once; CPU-bound text
+# extraction/OCR runs in separate processes so it never holds the event loop's GIL.
+ASGI_IO_THREADS = int(os.getenv("ASGI_IO_THREADS", "64"))
+
+extraction_pool = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global extraction_pool
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=ASGI_IO_THREADS))
+    extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+    registry.warm_up(background=True)
+    yield
+    extraction_pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="Intelligent Customs Clearance Assistant", lifespan=lifespan)
+app.mount("/static", StaticFiles(directory="static"), name="static")
+templates = Jinja2Templates(directory="templates")
+# templates/index.html uses Flask's url_for('static', filename=...) signature
+templates.env.globals["url_for"] = lambda endpoint, filename: f"/{endpoint}/{filename}"
+
+
+@app.middleware("http")
+async def session_cookie(request: Request, call_next):
+    # Per-client conversation: X-Session-ID header, else cookie, else a new ID
+    request.state.session_id, _ = resolve_session_id(
+        request.headers.get(SESSION_HEADER), request.cookies.get(SESSION_COOKIE)
+    )
+    response = await call_next(request)
+    # Re-set on every response so the cookie expires SESSION_TTL after last use, like the session
+    response.set_cookie(SESSION_COOKIE, request.state.session_id, max_age=int(SESSION_TTL),
+                        httponly=True, samesite="lax")
+    return response
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    # Registered last, so it wraps everything else. A streamed body is timed
+    # until its last chunk, not just until the response headers.
+    trace, token = start_trace(request.url.path)
+    try:
+        response = await call_next(request)
+    except Exception:
+        finish_trace(trace, token, 500)
+        raise
+    route = request.scope.get("route")
+    # Label by route pattern, not raw path, so the metric cardinality stays bounded
+    trace.route = route.path if route is not None else "unmatched"
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            finish_trace(trace, token, response.status_code)
+
+    response.body_iterator = traced_body()
+    return response
+
+
+async def aresource(name):
+    # Building a resource can take seconds; never do it on the event loop
+    if registry.is_ready(name):
+        return registry.get(name)
+    return await asyncio.to_thread(registry.get, name)
+
+
+# ----------------------------- Async Chat Helpers -----------------------------
+async def aprepare_question(msg):
+    user_lang = await asyncio.to_thread(detect_user_lang, msg)
+    translated_input = await asyncio.to_thread(translate_input, msg, user_lang)
+    return user_lang, translated_input
+
+
+async def agenerate_answer(question, session_id):
+    # Structured lookups may call the trade APIs, so routing runs off the loop
+    routed_answer = await asyncio.to_thread(route_question, question, session_id)
+    if routed_answer is not None:
+        return routed_answer
+
+    docs, cached_answer, cache_key = await asyncio.to_thread(lookup_cached_answer, question, session_id)
+    if cached_answer is not None:
+        return cached_answer
+
+    rag_chain = await aresource("rag_chain_with_memory")
+    with stage("llm_generation"):
+        response = await rag_chain.ainvoke(
+            {"input": question, "context": docs},
+            config={"configurable": {"session_id": session_id}}
+        )
+    answer = response["answer"]
+    await asyncio.to_thread(remember_answer, cache_key, answer)
+    return answer
+
+
+async def astream_rag_tokens(inputs, session_id):
+    rag_chain = await aresource("rag_chain_with_memory")
+    async for chunk in rag_chain.astream(inputs, config={"configurable": {"session_id": session_id}}):
+        token = chunk.get("answer")
+        if token:
+            yield token
+
+
+async def astream_answer(question, session_id):
+    routed_answer = await asyncio.to_thread(route_question, question, session_id)
+    if routed_answer is not None:
+        yield routed_answer
+        return
+
+    docs, cached_answer, cache_key = await asyncio.to_thread(lookup_cached_answer, question, session_id)
+    if cached_answer is not None:
+        yield cached_answer
+        return
+
+    parts = []
+    tokens = astream_rag_tokens({"input": question, "context": docs}, session_id)
+    async for token in atimed_stream(tokens, "llm_first_token", "llm_generation"):
+        parts.append(token)
+        yield token
+    await asyncio.to_thread(remember_answer, cache_key, "".join(parts))
+
+
+async def atranslate(text, translate):
+    if translate is None:
+        return text
+    return await asyncio.to_thread(translate, text)
+
+
+# ----------------------------- Upload Helpers -----------------------------
+def validate_upload(file):
+    if file is None:
+        return JSONResponse({"error": "No file uploaded"}, status_code=400)
+    if file.filename == "":
+        return JSONResponse({"error": "No file selected"}, status_code=400)
+    if not allowed_file(file.filename):
+        return JSONResponse({"error": "Invalid file format"}, status_code=400)
+    return None
+
+
+async def aextract_upload_text(file):
+    data = await file.read()
+    # The page loop runs on a thread; OCR jobs fan out to the process pool
+    with stage("extraction"):
+        return await asyncio.to_thread(extract_upload, data, upload_extension(file), extraction_pool)
+
+
+# ----------------------------- Routes -----------------------------
+@app.get("/", response_class=HTMLResponse)
+async def index(request: Request):
+    return templates.TemplateResponse(request, "index.html")
+
+
+@app.post("/get", response_class=PlainTextResponse)
+async def chat(request: Request, msg: str = Form(...)):
+    print("🧍 User:", msg)
+    user_lang, translated_input = await aprepare_question(msg)
+    print("🔤 Translated Input:", translated_input)
+    session_id = request.state.session_id
+
+    english_answer = await agenerate_answer(translated_input, session_id)
+    return str(await atranslate(english_answer, translator_to(user_lang)))
+
+
+@app.post("/get/stream")
+async def chat_stream(request: Request, msg: str = Form(...)):
+    print("🧍 User (stream):", msg)
+    session_id = request.state.session_id
+
+    async def events():
+        try:
+            user_lang, translated_input = await aprepare_question(msg)
+            tokens = astream_answer(translated_input, session_id)
+            async for text in atranslate_stream(tokens, translator_to(user_lang)):
+                yield sse_event({"text": text})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            print("❌ Error:", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/calculate-duty")
+async def calculate_duty(request: Request):
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    body, status = await asyncio.to_thread(run_duty_calculation, payload)
+    return JSONResponse(body, status_code=status)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
+def build_upload_stages(extracted_text, session_id):
+    # The Flask app's DAG; LLM stages are native coroutines here
+    async def verification():
+        verification_result, verification_prompt = prepare_verification(extracted_text)
+        if verification_result is None:
+            llm = await aresource("llm")
+            with stage("llm_verification"):
+                verification_result = (await llm.ainvoke(verification_prompt)).content.strip()
+        print("📄 Verification Result:", verification_result)
+        return verification_result
+
+    async def analysis():
+        rag_chain = await aresource("rag_chain_with_memory")
+        with stage("rag_analysis"):
+            response = await rag_chain.ainvoke(
+                {"input": extracted_text},
+                config={"configurable": {"session_id": session_id}}
+            )
+        return response["answer"]
+
+    return upload_stages(extracted_text, verification, analysis)
+
+
+@app.post("/upload")
+async def upload_file(request: Request, file: UploadFile = File(None)):
+    error = validate_upload(file)
+    if error:
+        return error
+
+    try:
+        start = time.perf_counter()
+        extracted_text = await aextract_upload_text(file)
+        extract_ms = round((time.perf_counter() - start) * 1000, 1)
+        if not extracted_text.strip():
+            return {"reply": "No readable text found in document."}
+
+        session_id = request.state.session_id
+        results, timings = await arun_dag(build_upload_stages(extracted_text, session_id))
+        timings = {"extract_ms": extract_ms, **timings}
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return {
+            "verification": results["translate_verification"],
+            "analysis": results["translate_analysis"],
+            "timings": timings,
+        }
+
+    except Exception as e:
+        print("❌ Error:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.post("/upload/stream")
+async def upload_file_stream(request: Request, file: UploadFile = File(None)):
+    error = validate_upload(file)
+    if error:
+        return error
+    try:
+        extracted_text = await aextract_upload_text(file)
+    except Exception as e:
+        print("❌ Error:", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    if not extracted_text.strip():
+        return {"reply": "No readable text found in document."}
+
+    session_id = request.state.session_id
+
+    async def events():
+        try:
+            user_lang = await asyncio.to_thread(detect_user_lang, extracted_text)
+            translate = translator_to(user_lang)
+            verification_result, verification_prompt = prepare_verification(extracted_text)
+
+            async def verification_tokens():
+                if verification_result is not None:
+                    yield verification_result
+                    return
+                llm = await aresource("llm")
+                chunks = (chunk.content async for chunk in llm.astream(verification_prompt))
+                async for token in atimed_stream(chunks, "llm_verification_first_token", "llm_verification"):
+                    yield token
+
+            async for text in atranslate_stream(verification_tokens(), translate):
+                yield sse_event({"stage": "verification", "text": text})
+
+            analysis_tokens = atimed_stream(
+                astream_rag_tokens({"input": extracted_text}, session_id), "rag_analysis_first_token", "rag_analysis"
+            )
+            async for text in atranslate_stream(analysis_tokens, translate):
+                yield sse_event({"stage": "analysis", "text": text})
+            yield sse_event({}, event="done")
+        except Exception as e:
+            print("❌ Error:", e)
+            yield sse_event({"error": str(e)}, event="error")
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+# ----------------------------- Upload Jobs -----------------------------
+# Same queue and workers as the Flask app (see src/job_queue.py); only the
+# SQLite calls run here, on a thread
+@app.post("/jobs/upload")
+async def upload_job(request: Request, file: UploadFile = File(None)):
+    error = validate_upload(file)
+    if error:
+        return error
+    data = await file.read()
+    body, status = await asyncio.to_thread(
+        enqueue_upload, data, file.filename, upload_extension(file), request.state.session_id
+    )
+    return JSONResponse(body, status_code=status)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    body, status = await asyncio.to_thread(job_status, job_id)
+    return JSONResponse(body, status_code=status)
+
+
+# ----------------------------- Main -----------------------------
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi_app:app", host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
+
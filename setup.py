@@ -23,7 +23,8 @@ setup(
         "langchain-community",
         "langchain-pinecone",
         "langchain-huggingface",
-        "pinecone-client"
+        "pinecone-client",
+        "numpy"
         
    ]
 )
\ No newline at end of file
@@ -0,0 +1,214 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+# ANSWER_CACHE_BACKEND: memory (default) | sqlite | off
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", os.path.join("artifacts", "answer_cache.sqlite3"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Paraphrases kept per retrieved context before the oldest is dropped
+MAX_VARIANTS_PER_CONTEXT = 16
+
+
+def context_fingerprint(docs):
+    """
+    Hash of the retrieved chunks, in order. When the index is rebuilt and a
+    question retrieves different chunks, its fingerprint changes and any
+    answer generated from the old context is no longer reachable.
+    """
+    digest = hashlib.sha256()
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _unit(vector):
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+# ----------------------------- Stores -----------------------------
+class InMemoryAnswerStore:
+    """
+    Per-process store: context fingerprint -> [(unit vector, answer, expires_at)].
+    As in the SQLite store, `max_entries` bounds the number of answers (not
+    fingerprints); the oldest answers of the least recently used fingerprints
+    are dropped first.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._groups = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def candidates(self, fingerprint):
+        now = time.time()
+        with self._lock:
+            group = self._groups.get(fingerprint)
+            if group is None:
+                return []
+            self._groups.move_to_end(fingerprint)
+            return [(v, a) for v, a, expires in group if expires > now]
+
+    def add(self, fingerprint, vector, answer):
+        with self._lock:
+            now = time.time()
+            previous = self._groups.pop(fingerprint, [])
+            group = [e for e in previous if e[2] > now]
+            group.append((vector, answer, now + self.ttl))
+            group = group[-MAX_VARIANTS_PER_CONTEXT:]
+            self._groups[fingerprint] = group
+            self._size += len(group) - len(previous)
+            while self._size > self.max_entries:
+                oldest, entries = self._groups.popitem(last=False)
+                drop = min(len(entries), self._size - self.max_entries)
+                self._size -= drop
+                if entries[drop:]:
+                    self._groups[oldest] = entries[drop:]
+                    self._groups.move_to_end(oldest, last=False)
+
+    def clear(self):
+        with self._lock:
+            self._groups.clear()
+            self._size = 0
+
+    def __len__(self):
+        return self._size
+
+
+class SQLiteAnswerStore:
+    """
+    Store shared by every worker on the host. Vectors are float32 blobs; rows
+    past their TTL are ignored on read and purged on write, and the least
+    recently used rows are dropped above `max_entries`.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " fingerprint TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_fp ON answers (fingerprint)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def candidates(self, fingerprint):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, vector, answer FROM answers WHERE fingerprint = ? AND expires_at > ?",
+                (fingerprint, time.time()),
+            ).fetchall()
+            if rows:
+                self._conn.execute(
+                    f"UPDATE answers SET last_used = ? WHERE id IN ({','.join('?' * len(rows))})",
+                    (time.time(), *[r[0] for r in rows]),
+                )
+                self._conn.commit()
+        return [(np.frombuffer(blob, dtype=np.float32), answer) for _, blob, answer in rows]
+
+    def add(self, fingerprint, vector, answer):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (fingerprint, vector, answer, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (fingerprint, np.asarray(vector, dtype=np.float32).tobytes(), answer, now + self.ttl, now),
+            )
+            self._conn.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE id IN ("
+                " SELECT id FROM answers ORDER BY last_used DESC, id DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+
+# ----------------------------- Semantic Cache -----------------------------
+class SemanticAnswerCache:
+    """
+    Answer cache keyed by (retrieved-context fingerprint, question embedding).
+
+    A lookup only considers answers generated from exactly the same context
+    and returns the closest one whose cosine similarity to the question is at
+    least `threshold`, so paraphrases of a cached FAQ reuse its answer.
+    """
+
+    def __init__(self, store, threshold=ANSWER_CACHE_THRESHOLD):
+        self.store = store
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query_vector, fingerprint):
+        candidates = self.store.candidates(fingerprint)
+        if candidates:
+            q = _unit(query_vector)
+            sims = np.stack([v for v, _ in candidates]) @ q
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                self.hits += 1
+                return candidates[best][1]
+        self.misses += 1
+        return None
+
+    def add(self, query_vector, fingerprint, answer):
+        self.store.add(fingerprint, _unit(query_vector), answer)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "entries": len(self.store),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+def build_answer_cache(backend=None):
+    """
+    Cache for the configured backend, or None when caching is switched off.
+    """
+    backend = backend or ANSWER_CACHE_BACKEND
+    if backend == "off":
+        return None
+    if backend == "memory":
+        return SemanticAnswerCache(InMemoryAnswerStore())
+    if backend == "sqlite":
+        return SemanticAnswerCache(SQLiteAnswerStore())
+    raise ValueError(f"Unknown ANSWER_CACHE_BACKEND: {backend}")
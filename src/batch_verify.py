@@ -0,0 +1,243 @@
+"""
+Bulk document verification for whole shipments.
+
+    python -m src.batch_verify shipment_42/ --out report.jsonl
+    python -m src.batch_verify shipment_42.zip --out report.csv --concurrency 8
+
+Every supported document in the directory (recursively) or archive
+(.zip, .tar, .tar.gz) is extracted on a process pool and verified with the
+same rule check and prompt as /upload. At most --concurrency LLM calls are
+in flight, and each call is retried with exponential backoff. One report
+row per document is written as soon as it finishes.
+"""
+import os
+import re
+import csv
+import json
+import time
+import random
+import asyncio
+import tarfile
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from src.extraction import extract_document, DOCUMENT_EXTENSIONS, EXTRACTION_WORKERS
+from src.pre_verification import prepare_verification
+from src.prompt import VERIFICATION_WINDOW
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+VERIFY_CONCURRENCY = int(os.getenv("VERIFY_CONCURRENCY", "4"))
+VERIFY_MAX_RETRIES = int(os.getenv("VERIFY_MAX_RETRIES", "5"))
+VERIFY_BACKOFF_SECONDS = float(os.getenv("VERIFY_BACKOFF_SECONDS", "1.0"))
+
+REPORT_FIELDS = [
+    "file", "status", "decided_by", "document_type", "document_status", "verification_result",
+    "missing_details", "attempts", "extract_ms", "verify_ms", "error",
+]
+
+
+# ----------------------------- Inputs -----------------------------
+def _extension(name):
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def iter_documents(path):
+    """
+    Yield (name, ext, data) for every supported document under a directory
+    or inside a .zip/.tar archive, in name order.
+    """
+    if os.path.isdir(path):
+        for root, _, files in sorted(os.walk(path)):
+            for filename in sorted(files):
+                if _extension(filename) in DOCUMENT_EXTENSIONS:
+                    full = os.path.join(root, filename)
+                    with open(full, "rb") as f:
+                        yield os.path.relpath(full, path), _extension(filename), f.read()
+
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if not name.endswith("/") and _extension(name) in DOCUMENT_EXTENSIONS:
+                    yield name, _extension(name), archive.read(name)
+
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in sorted(archive.getmembers(), key=lambda m: m.name):
+                if member.isfile() and _extension(member.name) in DOCUMENT_EXTENSIONS:
+                    yield member.name, _extension(member.name), archive.extractfile(member).read()
+
+    else:
+        raise ValueError(f"Not a directory or a .zip/.tar archive: {path}")
+
+
+# ----------------------------- Verification -----------------------------
+_FIELDS = {
+    "document_type": re.compile(r"Document Type:\s*(.+)"),
+    "document_status": re.compile(r"Document Status:\s*(.+)"),
+    "verification_result": re.compile(r"Verification Result:\s*(.+)"),
+    "missing_details": re.compile(r"Missing or Suspicious Details[^:]*:\s*(.+)", re.S),
+}
+
+
+def parse_verification(text):
+    """
+    Pull the fields of the verification format out of the LLM response.
+    "status" is verified/invalid, or unparsed when the model ignored the format.
+    """
+    fields = {}
+    for key, pattern in _FIELDS.items():
+        match = pattern.search(text)
+        fields[key] = match.group(1).strip(" *[]\n") if match else ""
+
+    result = fields["verification_result"] + " " + fields["document_status"]
+    if "Invalid" in result or "Incorrect" in result or "❌" in result:
+        fields["status"] = "invalid"
+    elif "Verified" in result or "Correct" in result or "✅" in result:
+        fields["status"] = "verified"
+    else:
+        fields["status"] = "unparsed"
+    return fields
+
+
+async def ainvoke_with_retry(llm, prompt, max_retries=VERIFY_MAX_RETRIES, backoff=VERIFY_BACKOFF_SECONDS):
+    """
+    Returns (response text, attempts). Waits backoff * 2**attempt (plus
+    jitter) between attempts so rate-limited calls spread out.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = await llm.ainvoke(prompt)
+            return response.content.strip(), attempt + 1
+        except Exception:
+            if attempt == max_retries:
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt * (1 + random.random() / 2))
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+async def verify_documents(documents, llm, concurrency=VERIFY_CONCURRENCY, extraction_workers=EXTRACTION_WORKERS,
+                           max_retries=VERIFY_MAX_RETRIES, backoff=VERIFY_BACKOFF_SECONDS):
+    """
+    Async generator of one report row per document, in completion order.
+
+    Extraction runs on `extraction_workers` processes. Input is read only a
+    few documents ahead of extraction, so raw file bytes for a large
+    shipment are never all in memory at once; what waits for the LLM is
+    just the extracted text window.
+    """
+    loop = asyncio.get_running_loop()
+    llm_slots = asyncio.Semaphore(concurrency)
+    extraction_slots = asyncio.Semaphore(max(concurrency, extraction_workers) * 2)
+
+    with ProcessPoolExecutor(max_workers=extraction_workers) as pool:
+
+        async def verify(name, ext, data):
+            row = {"file": name, "attempts": 0}
+            start = time.perf_counter()
+            try:
+                text = await loop.run_in_executor(pool, extract_document, data, ext, VERIFICATION_WINDOW)
+            except Exception as e:
+                return {**row, "status": "extraction_failed", "error": str(e)}
+            finally:
+                extraction_slots.release()
+            row["extract_ms"] = _ms(time.perf_counter() - start)
+            if not text.strip():
+                return {**row, "status": "no_text"}
+
+            answer, verification_prompt = prepare_verification(text)
+            if answer is not None:
+                return {**row, "decided_by": "rules", **parse_verification(answer)}
+
+            async with llm_slots:
+                start = time.perf_counter()
+                try:
+                    answer, row["attempts"] = await ainvoke_with_retry(
+                        llm, verification_prompt, max_retries, backoff
+                    )
+                except Exception as e:
+                    return {**row, "status": "llm_failed", "attempts": max_retries + 1, "error": str(e)}
+                row["verify_ms"] = _ms(time.perf_counter() - start)
+            return {**row, "decided_by": "llm", **parse_verification(answer)}
+
+        tasks = []
+        for name, ext, data in documents:
+            await extraction_slots.acquire()
+            tasks.append(asyncio.ensure_future(verify(name, ext, data)))
+            # Hand back finished rows while the rest of the input is read
+            while tasks and tasks[0].done():
+                yield tasks.pop(0).result()
+        for row in asyncio.as_completed(tasks):
+            yield await row
+
+
+# ----------------------------- Report -----------------------------
+class ReportWriter:
+    """JSONL or CSV (picked from the file extension), flushed after every row."""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        if self.csv:
+            self._writer = csv.DictWriter(self._file, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+            self._writer.writeheader()
+
+    def write(self, row):
+        if self.csv:
+            self._writer.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def build_llm():
+    from langchain_groq import ChatGroq
+
+    # Same model as the chat app; deterministic output for reproducible reports
+    return ChatGroq(model="llama-3.3-70b-versatile", temperature=0, max_tokens=512)
+
+
+async def run(input_path, out_path, llm, concurrency=VERIFY_CONCURRENCY, extraction_workers=EXTRACTION_WORKERS,
+              max_retries=VERIFY_MAX_RETRIES):
+    counts = {}
+    start = time.perf_counter()
+    writer = ReportWriter(out_path)
+    try:
+        async for row in verify_documents(iter_documents(input_path), llm, concurrency, extraction_workers, max_retries):
+            writer.write(row)
+            counts[row["status"]] = counts.get(row["status"], 0) + 1
+            print(f"{'✅' if row['status'] == 'verified' else '❌'} {row['file']}: {row['status']}")
+    finally:
+        writer.close()
+    counts["total"] = sum(counts.values())
+    counts["seconds"] = round(time.perf_counter() - start, 1)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify every customs document in a directory or archive.")
+    parser.add_argument("input", help="directory, .zip or .tar(.gz) of PDF/DOCX/image documents")
+    parser.add_argument("--out", default="verification_report.jsonl", help="report path (.jsonl or .csv)")
+    parser.add_argument("--concurrency", type=int, default=VERIFY_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS, help="extraction processes")
+    parser.add_argument("--retries", type=int, default=VERIFY_MAX_RETRIES, help="retries per LLM call")
+    args = parser.parse_args(argv)
+
+    counts = asyncio.run(run(args.input, args.out, build_llm(), args.concurrency, args.workers, args.retries))
+    print(f"📄 Report written to {args.out}:", counts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+End-to-end benchmark and load test, runnable offline.
+
+    python -m src.benchmark load --requests 300 --concurrency 8 --upload-ratio 0.1
+    python -m src.benchmark ingest --repeat 3
+    python -m src.benchmark all --out bench.json --baseline bench_main.json
+
+`load` drives /get, /get/stream and /upload of the Flask app in-process with
+the stand-ins from src/stand_ins.py in place of Groq, Pinecone, the
+translator and the trade APIs (their latencies are configurable), or a
+running server with --url. The query mix covers English, Hindi and Nepali
+questions, routed lookups and sample invoice uploads. The report has
+p50/p95/p99 latency and throughput per endpoint, the same percentiles per
+pipeline stage (from the src/metrics.py spans), and process memory.
+
+`ingest` times load_multiple_pdfs, text_split, the parallel loader and
+embedding, with peak traced memory for each step.
+
+With --baseline, any p95 latency or ingestion time more than --tolerance
+worse than the baseline report makes the command exit with status 1.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import threading
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.helper import load_multiple_pdfs, text_split, load_and_split_parallel
+from src.stand_ins import HashingEmbeddings, sample_invoice_docx
+
+# ----------------------------- Settings -----------------------------
+DEFAULT_PDFS = [
+    os.path.join("data", name)
+    for name in ("Navigating Import.pdf", "nepal.pdf", "np_e.pdf", "trade_industry_tax.pdf")
+]
+
+# (language, question, weight). Weighted towards open questions, which take
+# the full retrieval + generation path; the rest hit the intent router.
+QUERY_MIX = [
+    ("en", "What documents are required to import goods into Nepal?", 4),
+    ("en", "How is the customs value of imported goods calculated?", 4),
+    ("en", "What is the procedure for customs clearance at the border?", 3),
+    ("en", "Which goods are prohibited from import?", 2),
+    ("en", "What is the HS code for green tea?", 2),
+    ("en", "What is the import duty on 6403.99?", 2),
+    ("en", "Calculate the duty on 6403.99.00 worth Rs 500000 from India", 1),
+    ("hi", "नेपाल में माल आयात करने के लिए कौन से दस्तावेज़ आवश्यक हैं?", 2),
+    ("hi", "सीमा शुल्क मूल्य की गणना कैसे की जाती है?", 1),
+    ("ne", "नेपालमा सामान आयात गर्न कुन कागजातहरू आवश्यक छन्?", 2),
+    ("ne", "भन्सार मूल्याङ्कन कसरी गरिन्छ?", 1),
+]
+
+
+def _percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return float("nan")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+# ----------------------------- Workload -----------------------------
+class Workload:
+    """
+    Deterministic request plan: each job is ("/get" | "/get/stream", message)
+    or ("/upload", filename, bytes). A share of questions gets a unique suffix
+    so both the cached and the uncached path are measured.
+    """
+
+    def __init__(self, requests, upload_ratio=0.1, stream_ratio=0.2, unique_ratio=0.5, invoices=None, seed=7):
+        self.rng = random.Random(seed)
+        self.requests = requests
+        self.upload_ratio = upload_ratio
+        self.stream_ratio = stream_ratio
+        self.unique_ratio = unique_ratio
+        self.invoices = invoices or [(f"invoice_{i}.docx", sample_invoice_docx(i)) for i in range(1, 6)]
+
+    def jobs(self):
+        questions = [q for _, q, w in QUERY_MIX for _ in range(w)]
+        for i in range(self.requests):
+            if self.rng.random() < self.upload_ratio:
+                name, data = self.rng.choice(self.invoices)
+                yield ("/upload", name, data)
+                continue
+            message = self.rng.choice(questions)
+            if self.rng.random() < self.unique_ratio:
+                message = f"{message} (ref {i})"
+            yield ("/get/stream" if self.rng.random() < self.stream_ratio else "/get", message)
+
+
+def load_invoices(path):
+    """(name, bytes) for every PDF/DOCX/image in a directory."""
+    from src.extraction import DOCUMENT_EXTENSIONS
+
+    invoices = []
+    for name in sorted(os.listdir(path)):
+        if name.rsplit(".", 1)[-1].lower() in DOCUMENT_EXTENSIONS:
+            with open(os.path.join(path, name), "rb") as f:
+                invoices.append((name, f.read()))
+    return invoices
+
+
+# ----------------------------- Clients -----------------------------
+class FlaskClient:
+    """In-process client (one Werkzeug test client per thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def _client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def send(self, job):
+        from io import BytesIO
+
+        if job[0] == "/upload":
+            response = self._client().post(
+                "/upload", data={"file": (BytesIO(job[2]), job[1])}, content_type="multipart/form-data"
+            )
+        else:
+            response = self._client().post(job[0], data={"msg": job[1]}, buffered=False)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+
+class HttpClient:
+    """Client for a running server (Flask or ASGI), one session per thread."""
+
+    def __init__(self, url, timeout=120):
+        import requests
+
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._requests = requests
+        self._local = threading.local()
+
+    def send(self, job):
+        if not hasattr(self._local, "session"):
+            self._local.session = self._requests.Session()
+        session = self._local.session
+        if job[0] == "/upload":
+            response = session.post(self.url + "/upload", files={"file": (job[1], job[2])}, timeout=self.timeout)
+        else:
+            response = session.post(self.url + job[0], data={"msg": job[1]}, timeout=self.timeout)
+        return response.status_code
+
+
+# ----------------------------- Load Test -----------------------------
+def run_load(client, workload, concurrency=8):
+    """
+    Send every job of `workload` with `concurrency` in flight. Returns the
+    report dict (endpoints, stages, throughput, memory).
+    """
+    from src import metrics
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    stages = defaultdict(list)
+    lock = threading.Lock()
+
+    def on_stage(stage, seconds):
+        with lock:
+            stages[stage].append(seconds)
+
+    def send(job):
+        start = time.perf_counter()
+        try:
+            status = client.send(job)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[job[0]].append(elapsed)
+            if status >= 400:
+                errors[job[0]] += 1
+
+    rss_start = _rss_mb()
+    metrics.stage_listeners.append(on_stage)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(send, workload.jobs()))
+    finally:
+        metrics.stage_listeners.remove(on_stage)
+    wall = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "config": {"requests": workload.requests, "concurrency": concurrency, "upload_ratio": workload.upload_ratio,
+                   "stream_ratio": workload.stream_ratio, "unique_ratio": workload.unique_ratio},
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "endpoints": {ep: {**_percentiles(v), "errors": errors[ep]} for ep, v in sorted(latencies.items())},
+        "stages": {name: _percentiles(v) for name, v in sorted(stages.items())},
+        "memory": {"rss_start_mb": round(rss_start, 1), "rss_end_mb": round(_rss_mb(), 1),
+                   "peak_rss_mb": round(_peak_rss_mb(), 1)},
+    }
+
+
+def build_offline_app(pdfs, args):
+    """The Flask app with stand-ins installed; returns (app, mock trade API)."""
+    import app as flask_app
+    from src.stand_ins import install_stand_ins
+
+    corpus = [doc.page_content for doc in text_split(load_multiple_pdfs(pdfs))]
+    mock = install_stand_ins(
+        flask_app.registry, corpus,
+        embed_latency_ms=args.embed_ms,
+        llm_first_token_ms=args.llm_first_token_ms,
+        llm_token_ms=args.llm_token_ms,
+        translate_latency_ms=args.translate_ms,
+        answer_cache=not args.no_answer_cache,
+    )
+    return flask_app.app, mock
+
+
+# ----------------------------- Ingestion Micro-benchmarks -----------------------------
+def _measure(fn, repeat):
+    """(median seconds over `repeat` runs, peak traced MB of one extra run, last result)"""
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    # tracemalloc slows allocation-heavy code a lot, so memory gets its own run
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return float(np.median(times)), peak / 2**20, result
+
+
+def run_ingest(pdfs, repeat=3, embeddings=None, embed_chunks=512, batch_size=32):
+    embeddings = embeddings or HashingEmbeddings()
+    report = {}
+
+    def add(step, seconds, peak_mb, items, unit):
+        report[step] = {"seconds": round(seconds, 4), f"{unit}_per_s": round(items / seconds, 1) if seconds else None,
+                        "items": items, "peak_traced_mb": round(peak_mb, 1)}
+
+    seconds, peak, documents = _measure(lambda: load_multiple_pdfs(pdfs), repeat)
+    add("load_multiple_pdfs", seconds, peak, len(documents), "pages")
+
+    seconds, peak, chunks = _measure(lambda: text_split(documents), repeat)
+    add("text_split", seconds, peak, len(chunks), "chunks")
+
+    seconds, peak, parallel_chunks = _measure(lambda: load_and_split_parallel(pdfs), repeat)
+    add("load_and_split_parallel", seconds, peak, len(parallel_chunks), "chunks")
+
+    texts = [c.page_content for c in chunks[:embed_chunks]]
+
+    def embed():
+        for i in range(0, len(texts), batch_size):
+            embeddings.embed_documents(texts[i:i + batch_size])
+
+    seconds, peak, _ = _measure(embed, repeat)
+    add(f"embedding ({type(embeddings).__name__})", seconds, peak, len(texts), "chunks")
+    return report
+
+
+# ----------------------------- Reporting -----------------------------
+def print_report(report):
+    if "load" in report:
+        load = report["load"]
+        print(f"\n🚦 Load: {load['config']['requests']} requests, concurrency {load['config']['concurrency']}, "
+              f"{load['throughput_rps']} req/s over {load['wall_s']} s")
+        print(f"{'endpoint / stage':32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}")
+        for name, row in load["endpoints"].items():
+            print(f"{name:32} {row['count']:>6} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} "
+                  f"{row['errors']:>6}")
+        for name, row in load["stages"].items():
+            print(f"  {name:30} {row['count']:>6} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}")
+        print("🧠 Memory (MB):", load["memory"])
+    if "ingest" in report:
+        print("\n📥 Ingestion")
+        for name, row in report["ingest"].items():
+            rate = next(f"{v} {k[:-6]}/s" for k, v in row.items() if k.endswith("_per_s"))
+            print(f"{name:40} {row['seconds'] * 1000:>10.1f} ms  {rate:>18}  peak {row['peak_traced_mb']} MB")
+
+
+def compare(report, baseline, tolerance):
+    """Regressions as readable lines: p95 latencies and ingestion times worse than baseline * (1 + tolerance)."""
+    regressions = []
+
+    def check(label, new, old):
+        if new is not None and old and new > old * (1 + tolerance):
+            regressions.append(f"{label}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+
+    for section in ("endpoints", "stages"):
+        for name, row in report.get("load", {}).get(section, {}).items():
+            old = baseline.get("load", {}).get(section, {}).get(name)
+            if old:
+                check(f"{section[:-1]} {name} p95_ms", row.get("p95_ms"), old.get("p95_ms"))
+    for name, row in report.get("ingest", {}).items():
+        old = baseline.get("ingest", {}).get(name)
+        if old:
+            check(f"ingest {name} seconds", row["seconds"], old["seconds"])
+    return regressions
+
+
+# ----------------------------- CLI -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the chatbot end to end and the ingestion steps.")
+    parser.add_argument("mode", choices=["load", "ingest", "all"])
+    parser.add_argument("--pdf", action="append", help="PDF for ingestion and the stand-in corpus (repeatable)")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--url", help="benchmark a running server instead of the in-process app with stand-ins")
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--upload-ratio", type=float, default=0.1)
+    load.add_argument("--stream-ratio", type=float, default=0.2)
+    load.add_argument("--unique-ratio", type=float, default=0.5, help="share of questions made cache-unique")
+    load.add_argument("--invoices", help="directory of sample invoices (default: generated DOCX invoices)")
+    load.add_argument("--seed", type=int, default=7)
+    load.add_argument("--embed-ms", type=float, default=15.0, help="stand-in embedding latency per batch")
+    load.add_argument("--llm-first-token-ms", type=float, default=300.0, help="stand-in LLM time to first token")
+    load.add_argument("--llm-token-ms", type=float, default=10.0, help="stand-in LLM delay per streamed word")
+    load.add_argument("--translate-ms", type=float, default=80.0, help="stand-in translator latency per request")
+    load.add_argument("--no-answer-cache", action="store_true")
+
+    ingest = parser.add_argument_group("ingest")
+    ingest.add_argument("--repeat", type=int, default=3)
+    ingest.add_argument("--embed-chunks", type=int, default=512, help="chunks embedded in the embedding benchmark")
+    ingest.add_argument("--real-embeddings", action="store_true", help="time the MiniLM model instead of the stand-in")
+    args = parser.parse_args(argv)
+
+    pdfs = args.pdf or [p for p in DEFAULT_PDFS if os.path.exists(p)]
+    report = {"pdfs": pdfs}
+
+    if args.mode in ("ingest", "all"):
+        embeddings = None
+        if args.real_embeddings:
+            from src.helper import download_hugging_face_embeddings
+
+            embeddings = download_hugging_face_embeddings()
+        report["ingest"] = run_ingest(pdfs, args.repeat, embeddings, args.embed_chunks)
+
+    if args.mode in ("load", "all"):
+        workload = Workload(args.requests, args.upload_ratio, args.stream_ratio, args.unique_ratio,
+                            load_invoices(args.invoices) if args.invoices else None, args.seed)
+        mock = None
+        if args.url:
+            client = HttpClient(args.url)
+        else:
+            app, mock = build_offline_app(pdfs, args)
+            client = FlaskClient(app)
+        try:
+            report["load"] = run_load(client, workload, args.concurrency)
+        finally:
+            if mock is not None:
+                mock.stop()
+
+    print_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 Report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressions against", args.baseline)
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
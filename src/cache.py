@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# ----------------------------- LRU + TTL Cache -----------------------------
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with an optional time-to-live.
+    Keeps hit/miss counters so callers can report a hit rate.
+
+    With `sliding=True` every hit restarts the entry's TTL, so entries expire
+    after `ttl` seconds without use rather than `ttl` seconds after `set`.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize=1024, ttl=None, sliding=False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, self._MISSING)
+            if item is not self._MISSING:
+                value, expires_at = item
+                now = time.monotonic()
+                if expires_at is None or expires_at > now:
+                    if self.sliding and expires_at is not None:
+                        self._data[key] = (value, now + self.ttl)
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and (item[1] is None or item[1] > time.monotonic())
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
@@ -0,0 +1,218 @@
+"""
+Context assembly between retrieval and create_stuff_documents_chain.
+
+Retrieved chunks overlap (CHUNK_OVERLAP) and are mostly text unrelated to
+the question, yet every token of them is sent to the LLM. assemble_context()
+turns the retrieved documents into a smaller list of documents:
+
+1. Split every chunk into sentences (table rows count as sentences) and drop
+   the ones already seen in a higher-ranked chunk, which removes the
+   overlap between neighbouring chunks and duplicate pages.
+2. Score the sentences by the question terms they contain (idf-weighted,
+   HS codes named in the question count most) and keep the best ones plus
+   SENTENCE_WINDOW neighbours, in document order, until the context budget
+   is spent. Sentences under MIN_RELATIVE_SCORE of the best score (those
+   sharing only a generic word such as "customs") are dropped.
+3. If no sentence matches the question at all, the deduplicated chunks are
+   kept as they are, truncated to the budget, so a paraphrased question
+   still gets its context.
+
+The budget is what is left of PROMPT_TOKEN_BUDGET after the system prompt,
+history and question, but never less than MIN_CONTEXT_TOKENS. Questions
+(and documents sent in as questions by /upload) are capped at
+MAX_INPUT_TOKENS. CONTEXT_COMPRESSION=off keeps only the dedupe and caps.
+"""
+import os
+import re
+import math
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from src.tokens import estimate_tokens
+from src.hybrid_retriever import tokenize, extract_hs_codes, extract_query_hs_codes
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "on").lower() != "off"
+# System prompt + history + context + question, in estimated tokens
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+MIN_CONTEXT_TOKENS = int(os.getenv("MIN_CONTEXT_TOKENS", "300"))
+MAX_INPUT_TOKENS = int(os.getenv("MAX_INPUT_TOKENS", "600"))
+# Sentences kept on each side of a matching one (tariff rows need their heading)
+SENTENCE_WINDOW = int(os.getenv("SENTENCE_WINDOW", "1"))
+# Sentences scoring below this fraction of the best one are dropped
+MIN_RELATIVE_SCORE = float(os.getenv("MIN_RELATIVE_SCORE", "0.3"))
+
+# An HS code from the question outweighs any number of ordinary terms
+_HS_CODE_WEIGHT = 10.0
+_GAP = " … "
+# Shorter sentences are never treated as duplicates of earlier text
+_MIN_DUPLICATE_CHARS = 20
+
+# Sentence ends, or line breaks (tables, bullet lists)
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(•\-])|\s*\n\s*")
+_SPACE = re.compile(r"\s+")
+
+
+def _normalise(text):
+    return _SPACE.sub(" ", text).strip().lower()
+
+
+# ----------------------------- Input Caps -----------------------------
+def truncate_to_tokens(text, max_tokens):
+    """`text` cut at a word boundary so that it estimates to at most max_tokens."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # estimate_tokens is monotonic in the prefix length, so bisect on words
+    words = text.split(" ")
+    low, high = 0, len(words)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(" ".join(words[:mid])) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return " ".join(words[:low]).rstrip() + _GAP.rstrip()
+
+
+def cap_input(text, max_tokens=MAX_INPUT_TOKENS):
+    return truncate_to_tokens(text, max_tokens) if text else text
+
+
+def context_budget(used_tokens, budget=PROMPT_TOKEN_BUDGET, minimum=MIN_CONTEXT_TOKENS):
+    return max(minimum, budget - used_tokens)
+
+
+# ----------------------------- Sentences -----------------------------
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def dedupe_sentences(documents):
+    """
+    [(document, [sentence, ...])] with every sentence already contained in
+    an earlier (higher-ranked) document removed. Chunk overlaps start or end
+    mid-sentence, so containment, not equality, is checked, on whole words
+    only. Sentences under _MIN_DUPLICATE_CHARS ("Other", "Tea": tariff rows
+    that mean something else in every table) are always kept, and so are
+    repeats within one document (identical tariff rows).
+    """
+    seen_text = ""
+    result = []
+    for document in documents:
+        sentences = split_sentences(document.page_content)
+        normalised = [_normalise(s) for s in sentences]
+        kept = [
+            s for s, n in zip(sentences, normalised)
+            if len(n) < _MIN_DUPLICATE_CHARS or f" {n} " not in seen_text
+        ]
+        # Space-padded, so a match always starts and ends at a word boundary
+        seen_text += "".join(f"\n {n} " for n in normalised)
+        if kept:
+            result.append((document, kept))
+    return result
+
+
+_SUFFIXES = ("ing", "es", "ed", "s")
+
+
+def _stem(term):
+    # Enough to match "exports"/"export", "customs"/"custom", "charged"/"charges"
+    for suffix in _SUFFIXES:
+        if len(term) > len(suffix) + 3 and term.endswith(suffix):
+            return term[:-len(suffix)]
+    return term
+
+
+def _terms(text):
+    return {_stem(t) for t in tokenize(text)}
+
+
+def _score_sentences(question, sentences):
+    """Relevance of each sentence: summed idf of the question terms it contains."""
+    terms = _terms(question)
+    codes = extract_query_hs_codes(question)
+    sentence_terms = [_terms(s) for s in sentences]
+    n = len(sentences)
+    idf = {}
+    for term in terms:
+        df = sum(1 for st in sentence_terms if term in st)
+        idf[term] = math.log(1 + n / df) if df else 0.0
+
+    scores = []
+    for sentence, st in zip(sentences, sentence_terms):
+        score = sum(idf[t] for t in terms & st)
+        if codes:
+            sentence_codes = extract_hs_codes(sentence)
+            if any(sc.startswith(code) for code in codes for sc in sentence_codes):
+                score += _HS_CODE_WEIGHT
+        scores.append(score)
+    return scores
+
+
+# ----------------------------- Assembly -----------------------------
+def _truncate_documents(grouped, budget):
+    documents = []
+    for document, sentences in grouped:
+        text = truncate_to_tokens(" ".join(sentences), budget)
+        budget -= estimate_tokens(text)
+        documents.append(Document(page_content=text, metadata=document.metadata))
+        if budget <= 0:
+            break
+    return documents
+
+
+def assemble_context(question, documents, budget, compress=CONTEXT_COMPRESSION):
+    """
+    The retrieved `documents` reduced to what the LLM needs for `question`
+    within `budget` estimated tokens. Returns Documents (metadata kept) in
+    retrieval order, ready for create_stuff_documents_chain.
+    """
+    grouped = dedupe_sentences(documents or [])
+    if not compress:
+        return _truncate_documents(grouped, budget)
+
+    flat = [(d, i) for d, (_, sentences) in enumerate(grouped) for i in range(len(sentences))]
+    scores = _score_sentences(question, [grouped[d][1][i] for d, i in flat])
+    if not any(scores):
+        return _truncate_documents(grouped, budget)
+
+    # Best sentences first (ties: retrieval order); each brings its window along
+    threshold = max(scores) * MIN_RELATIVE_SCORE
+    selected = set()
+    spent = 0
+    for p in sorted(range(len(flat)), key=lambda p: (-scores[p], p)):
+        if scores[p] <= 0 or scores[p] < threshold:
+            break
+        d, i = flat[p]
+        window = [
+            (d, j) for j in range(i - SENTENCE_WINDOW, i + SENTENCE_WINDOW + 1)
+            if 0 <= j < len(grouped[d][1]) and (d, j) not in selected
+        ]
+        cost = sum(estimate_tokens(grouped[d][1][j]) for _, j in window)
+        if spent + cost > budget:
+            if not selected:
+                # Even the best window is too big: keep the sentence alone, truncated
+                selected.add((d, i))
+                grouped[d][1][i] = truncate_to_tokens(grouped[d][1][i], budget)
+                break
+            continue
+        selected.update(window)
+        spent += cost
+
+    result = []
+    for d, (document, sentences) in enumerate(grouped):
+        kept = sorted(i for dd, i in selected if dd == d)
+        if not kept:
+            continue
+        parts = [sentences[kept[0]]]
+        for previous, i in zip(kept, kept[1:]):
+            parts.append((" " if i == previous + 1 else _GAP) + sentences[i])
+        result.append(Document(page_content="".join(parts), metadata=document.metadata))
+    return result
+
+
+def documents_tokens(documents):
+    return sum(estimate_tokens(doc.page_content) for doc in documents or [])
@@ -0,0 +1,334 @@
+"""
+Deterministic import duty and tax calculation driven by the tariff index.
+
+    python -m src.duty_calculator invoice_lines.csv --out duties.csv
+
+Valuation follows the usual CIF basis: FOB/EXW values get freight and
+insurance added, CFR/CPT values insurance only. On the assessable value (CIF
+in NPR) come, in order:
+
+    customs duty  ad valorem rate from the tariff (SAARC rate for SAARC
+                  origins), or the specific duty ("Per ltr. Rs.300") x quantity
+    excise        EXCISE_RATES_PATH rate x (assessable + customs duty)
+    levies        DUTY_LEVIES rates x assessable
+    VAT           VAT_RATE x (assessable + customs duty + excise + levies)
+
+calculate_batch() evaluates every line as one set of NumPy array operations,
+so thousands of invoice lines take milliseconds; calculate() is a batch of one.
+"""
+import os
+import re
+import csv
+import json
+import argparse
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.tariff_index import get_tariff_index, TariffIndex
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+VAT_RATE = float(os.getenv("VAT_RATE", "13"))
+# Insurance added to FOB/CFR values when the invoice does not state it (% of FOB + freight)
+DEFAULT_INSURANCE_RATE = float(os.getenv("DEFAULT_INSURANCE_RATE", "1"))
+# {"2203": 40.0, ...}: excise % by HS code prefix, longest prefix wins
+EXCISE_RATES_PATH = os.getenv("EXCISE_RATES_PATH", "")
+# {"customs service charge": 0.5, ...}: other ad valorem levies on the assessable value
+DUTY_LEVIES = json.loads(os.getenv("DUTY_LEVIES", "{}"))
+# NPR per unit of invoice currency; INR is pegged at 1.6, others must be configured or passed per line
+EXCHANGE_RATES = {"NPR": 1.0, "INR": 1.6, **json.loads(os.getenv("EXCHANGE_RATES", "{}"))}
+
+SAARC_COUNTRIES = frozenset(
+    ["afghanistan", "bangladesh", "bhutan", "india", "maldives", "nepal", "pakistan", "sri lanka"]
+)
+CIF_TERMS = frozenset(["CIF", "CIP", "DAP", "DPU", "DDP", "DAT", "DDU"])
+CFR_TERMS = frozenset(["CFR", "C&F", "CPT"])
+
+# Specific duties in the tariff: "Per ltr. Rs.300", "Per thousand sticks Rs. 4500", "Per MT Rs.1000".
+# Quantities are given in the base unit (ltr, kg, sticks); scale converts to the duty's unit.
+_SPECIFIC_DUTY = re.compile(r"per\s*(thousand sticks|kl|mt|ltr|kg)\.?\s*rs\.?\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+SPECIFIC_SCALES = {"thousand sticks": 1000.0, "kl": 1000.0, "mt": 1000.0, "ltr": 1.0, "kg": 1.0}
+SPECIFIC_BASE_UNITS = {"thousand sticks": "sticks", "kl": "ltr", "mt": "kg", "ltr": "ltr", "kg": "kg"}
+
+RESULT_FIELDS = [
+    "hs_code", "description", "valuation", "currency", "exchange_rate", "fob", "freight", "insurance", "cif",
+    "assessable_value", "duty_basis", "duty_rate", "customs_duty", "excise_rate", "excise", "levies",
+    "vat_base", "vat", "total_taxes", "landed_cost", "error",
+]
+
+
+def parse_specific_duty(duty_text):
+    """(rate in NPR, unit) for a specific duty text, or None."""
+    match = _SPECIFIC_DUTY.search(duty_text or "")
+    if not match:
+        return None
+    return float(match.group(2).replace(",", "")), match.group(1).lower()
+
+
+def load_excise_rates(path=EXCISE_RATES_PATH):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {re.sub(r"\D", "", k): float(v) for k, v in json.load(f).items()}
+
+
+def _number(value, default=np.nan):
+    if value is None or value == "":
+        return default
+    return float(str(value).replace(",", ""))
+
+
+# ----------------------------- Calculator -----------------------------
+class DutyCalculator:
+    """
+    Invoice line fields (all but hs_code and value optional):
+        hs_code, value, incoterm (default FOB), freight, insurance, quantity,
+        origin, currency (default NPR), exchange_rate, excise_rate
+    Money is returned in NPR; everything is rounded to paisa only on output.
+    """
+
+    def __init__(self, index=None, vat_rate=VAT_RATE, excise_rates=None, levies=None,
+                 insurance_rate=DEFAULT_INSURANCE_RATE, exchange_rates=None):
+        self._index = index
+        self.vat_rate = vat_rate
+        self.excise_rates = excise_rates if excise_rates is not None else load_excise_rates()
+        self.levies = DUTY_LEVIES if levies is None else levies
+        self.insurance_rate = insurance_rate
+        self.exchange_rates = exchange_rates if exchange_rates is not None else EXCHANGE_RATES
+
+    @property
+    def index(self):
+        # Resolved on use so a calculator created before the index was built picks it up
+        return self._index if self._index is not None else get_tariff_index()
+
+    # -------- Rates (one lookup per distinct code) --------
+    def _excise_rate(self, code):
+        for end in range(len(code), 1, -1):
+            rate = self.excise_rates.get(code[:end])
+            if rate is not None:
+                return rate
+        return 0.0
+
+    def _resolve_code(self, code):
+        """
+        The 8-digit tariff code for `code`. A heading or subheading ("6403.99")
+        resolves when exactly one tariff line sits under it.
+        """
+        index = self.index
+        if index is None or len(code) == 8 or len(code) < 4:
+            return code
+        lines = index.lookup(code, limit=2)
+        return lines[0]["code"] if len(lines) == 1 else code
+
+    def _rates(self, code):
+        """(saarc %, general %, specific NPR, specific scale, excise %, description, error)"""
+        index = self.index
+        line = index.duty_rate(code) if index is not None and len(code) == 8 else None
+        if line is None:
+            error = "tariff index not built" if index is None else f"no tariff line for {code or 'blank code'}"
+            return np.nan, np.nan, np.nan, 1.0, 0.0, "", error
+        specific = parse_specific_duty(line["duty_text"]) if line["duty_general"] is None else None
+        if line["duty_general"] is None and specific is None:
+            return np.nan, np.nan, np.nan, 1.0, 0.0, line["description"], f"no duty rate parsed for {code}"
+        amount, unit = specific or (np.nan, None)
+        description = f"{line['context']} > {line['description']}" if line["context"] else line["description"]
+        return (
+            line["duty_saarc"] if line["duty_saarc"] is not None else np.nan,
+            line["duty_general"] if line["duty_general"] is not None else np.nan,
+            amount,
+            SPECIFIC_SCALES.get(unit, 1.0),
+            self._excise_rate(code),
+            description,
+            None,
+        )
+
+    # -------- Batch evaluation --------
+    def calculate_batch(self, lines):
+        """
+        Evaluate a list of invoice line dicts. Returns a dict of columns
+        (NumPy arrays for amounts, lists for text), see RESULT_FIELDS.
+        """
+        n = len(lines)
+        codes = [self._resolve_code(re.sub(r"\D", "", str(line.get("hs_code", "")))) for line in lines]
+        incoterms = [str(line.get("incoterm") or "FOB").upper() for line in lines]
+        currencies = [str(line.get("currency") or "NPR").upper() for line in lines]
+        value = np.array([_number(line.get("value")) for line in lines], dtype=np.float64)
+        freight = np.array([_number(line.get("freight"), 0.0) for line in lines], dtype=np.float64)
+        insurance_given = np.array([_number(line.get("insurance")) for line in lines], dtype=np.float64)
+        quantity = np.array([_number(line.get("quantity")) for line in lines], dtype=np.float64)
+        exchange_rate = np.array(
+            [_number(line.get("exchange_rate"), self.exchange_rates.get(c, np.nan)) for line, c in zip(lines, currencies)],
+            dtype=np.float64,
+        )
+        preferential = np.array(
+            [str(line.get("origin") or "").strip().lower() in SAARC_COUNTRIES for line in lines], dtype=bool
+        )
+        excise_override = np.array([_number(line.get("excise_rate")) for line in lines], dtype=np.float64)
+
+        unique_codes, inverse = np.unique(np.array(codes, dtype=str), return_inverse=True)
+        table = [self._rates(code) for code in unique_codes]
+        saarc, general, specific, scale, excise_table = (
+            np.array([row[i] for row in table], dtype=np.float64).reshape(-1)[inverse] for i in range(5)
+        )
+        descriptions = [table[i][5] for i in inverse]
+        errors = [table[i][6] for i in inverse]
+
+        # Valuation: CIF terms as invoiced; CFR adds insurance; FOB/EXW/FCA add freight and insurance
+        is_cif = np.array([t in CIF_TERMS for t in incoterms], dtype=bool)
+        is_cfr = np.array([t in CFR_TERMS for t in incoterms], dtype=bool)
+        freight = np.where(is_cif | is_cfr, 0.0, freight)
+        base = value + freight
+        insurance = np.where(is_cif, 0.0, np.where(np.isnan(insurance_given), base * self.insurance_rate / 100,
+                                                    insurance_given))
+        cif = base + insurance
+        assessable = cif * exchange_rate
+
+        duty_rate = np.where(preferential & ~np.isnan(saarc), saarc, general)
+        is_specific = np.isnan(duty_rate) & ~np.isnan(specific)
+        customs_duty = np.where(is_specific, quantity / scale * specific, assessable * duty_rate / 100)
+
+        excise_rate = np.where(np.isnan(excise_override), excise_table, excise_override)
+        excise = (assessable + customs_duty) * excise_rate / 100
+        levies = assessable * sum(self.levies.values()) / 100
+        vat_base = assessable + customs_duty + excise + levies
+        vat = vat_base * self.vat_rate / 100
+        total_taxes = customs_duty + excise + levies + vat
+
+        for i in range(n):
+            if errors[i] is None:
+                if np.isnan(value[i]):
+                    errors[i] = "missing value"
+                elif np.isnan(exchange_rate[i]):
+                    errors[i] = f"no exchange rate for {currencies[i]} (set EXCHANGE_RATES or pass exchange_rate)"
+                elif is_specific[i] and np.isnan(quantity[i]):
+                    errors[i] = "specific duty needs a quantity"
+
+        def money(column):
+            return np.round(column, 2)
+
+        return {
+            "hs_code": codes,
+            "description": descriptions,
+            "valuation": ["CIF" if c else "CFR" if f else "FOB" for c, f in zip(is_cif, is_cfr)],
+            "currency": currencies,
+            "exchange_rate": exchange_rate,
+            "fob": money(value),
+            "freight": money(freight),
+            "insurance": money(insurance),
+            "cif": money(cif),
+            "assessable_value": money(assessable),
+            "duty_basis": ["specific" if s else "ad valorem" for s in is_specific],
+            "duty_rate": duty_rate,
+            "customs_duty": money(customs_duty),
+            "excise_rate": excise_rate,
+            "excise": money(excise),
+            "levies": money(levies),
+            "vat_base": money(vat_base),
+            "vat": money(vat),
+            "total_taxes": money(total_taxes),
+            "landed_cost": money(assessable + total_taxes),
+            "error": errors,
+        }
+
+    def calculate(self, line):
+        """One invoice line as a result dict (NaN amounts become None)."""
+        return to_rows(self.calculate_batch([line]))[0]
+
+    # -------- Chatbot --------
+    def explain(self, line):
+        """
+        Step-by-step breakdown in plain text, the way the chatbot shows it.
+        """
+        r = self.calculate(line)
+        if r["error"]:
+            return f"❌ Cannot calculate duty for HS {TariffIndex.format_code(r['hs_code'])}: {r['error']}."
+        if r["duty_basis"] == "specific":
+            amount, unit = parse_specific_duty(self.index.duty_rate(r["hs_code"])["duty_text"])
+            duty_step = (f"Customs duty (specific, Rs. {amount:g} per {unit}): "
+                         f"{_number(line.get('quantity')):g} {SPECIFIC_BASE_UNITS[unit]} = NPR {r['customs_duty']:,.2f}")
+        else:
+            duty_step = f"Customs duty ({r['duty_rate']:g}% of assessable value): NPR {r['customs_duty']:,.2f}"
+        steps = [
+            f"HS {self.index.format_code(r['hs_code'])}: {r['description']}",
+            f"1. Value ({r['valuation']} basis, {r['currency']}): {r['fob']:,.2f} + freight {r['freight']:,.2f} "
+            f"+ insurance {r['insurance']:,.2f} = CIF {r['cif']:,.2f}",
+            f"2. Assessable value at {r['exchange_rate']:g} NPR/{r['currency']}: NPR {r['assessable_value']:,.2f}",
+            f"3. {duty_step}",
+            f"4. Excise ({r['excise_rate']:g}%): NPR {r['excise']:,.2f}",
+            f"5. Other levies: NPR {r['levies']:,.2f}",
+            f"6. VAT ({self.vat_rate:g}% of NPR {r['vat_base']:,.2f}): NPR {r['vat']:,.2f}",
+            f"💰 Total duties and taxes: NPR {r['total_taxes']:,.2f} (landed cost NPR {r['landed_cost']:,.2f})",
+        ]
+        return "\n".join(steps)
+
+    def as_tool(self):
+        from langchain_core.tools import StructuredTool
+
+        def calculate_duty(hs_code: str, value: float, incoterm: str = "FOB", freight: float = 0.0,
+                           insurance: float = None, quantity: float = None, origin: str = "",
+                           currency: str = "NPR") -> str:
+            return self.explain({
+                "hs_code": hs_code, "value": value, "incoterm": incoterm, "freight": freight,
+                "insurance": insurance, "quantity": quantity, "origin": origin, "currency": currency,
+            })
+
+        return StructuredTool.from_function(
+            calculate_duty,
+            name="customs_duty_calculator",
+            description=(
+                "Exact customs duty, excise, VAT and landed cost in NPR for one invoice line: HS code, invoice "
+                "value, incoterm (FOB/CFR/CIF), freight, insurance, quantity (for specific duties), country of "
+                "origin and invoice currency."
+            ),
+        )
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_duty_calculator():
+    """Process-wide calculator with the configured rates."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DutyCalculator()
+        return _shared
+
+
+def to_rows(result):
+    """Column result of calculate_batch as JSON-ready dicts."""
+    columns = []
+    for field in RESULT_FIELDS:
+        column = result[field]
+        if isinstance(column, np.ndarray):
+            column = np.where(np.isnan(column), None, column).tolist()
+        columns.append(column)
+    return [dict(zip(RESULT_FIELDS, values)) for values in zip(*columns)]
+
+
+# ----------------------------- CLI -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate duties and taxes for every line of a CSV invoice.")
+    parser.add_argument("input", help="CSV with hs_code, value and optional incoterm, freight, insurance, "
+                                      "quantity, origin, currency, exchange_rate, excise_rate columns")
+    parser.add_argument("--out", default="duties.csv", help="result CSV")
+    args = parser.parse_args(argv)
+
+    with open(args.input, newline="", encoding="utf-8") as f:
+        lines = list(csv.DictReader(f))
+    rows = to_rows(DutyCalculator().calculate_batch(lines))
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    failed = sum(1 for row in rows if row["error"])
+    total = sum(row["total_taxes"] for row in rows if not row["error"])
+    print(f"🧮 {len(rows)} lines ({failed} failed), total duties and taxes NPR {total:,.2f} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+"""
+Precomputed corpus embeddings as a versioned, memory-mappable artifact.
+
+    python -m src.embedding_artifact build [--dtype float16|int8|float32]
+    python -m src.embedding_artifact info [PATH]
+    python -m src.embedding_artifact diff OLD_PATH NEW_PATH
+    python -m src.embedding_artifact upsert [--backend local|pinecone]
+
+Layout of each version directory under EMBEDDING_ARTIFACT_DIR (see
+src/versioned_dir.py; a rebuild writes a new version and swaps the CURRENT
+pointer, so a reader never mixes files of two builds):
+  header.json    format version, model, dimension, chunking, dtype, row count
+                 and per-file {sha256, start, count} row ranges
+  vectors.npy    [n, dim] unit vectors as float16 (default), int8 or float32
+  scales.npy     float32 [n] per-row dequantisation scale (int8 only)
+  chunks.jsonl   one {"id", "text", "metadata"} per row, in row order
+
+Rows are grouped by file in name order and chunk IDs are the ones the
+ingestion pipeline uses (src.ingestion.chunk_ids), so an artifact can fill
+any Pinecone-style index, and two builds diff by file hash and chunk ID.
+vectors.npy is opened memory-mapped; loading costs one JSON parse of the
+chunk texts. store_index.py keeps the artifact up to date and takes its
+embeddings from it, so the model only runs on chunks that are new.
+"""
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.helper import iter_pdf_chunks, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL_NAME
+from src.ingestion import file_sha256, chunk_ids, list_pdfs, batched, flush_index, DEFAULT_BATCH_SIZE
+from src.versioned_dir import current_dir, read_current, write_version
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+EMBEDDING_ARTIFACT_DIR = os.getenv("EMBEDDING_ARTIFACT_DIR", os.path.join("artifacts", "embeddings"))
+EMBEDDING_ARTIFACT_DTYPE = os.getenv("EMBEDDING_ARTIFACT_DTYPE", "float16")
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_DTYPES = ("float16", "int8", "float32")
+EMBED_BATCH_SIZE = 64
+_ARTIFACT_FILES = ("header.json", "vectors.npy", "scales.npy", "chunks.jsonl")
+
+
+# ----------------------------- Encoding -----------------------------
+def _unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def encode(unit_vectors, dtype):
+    """(stored matrix, per-row scales or None) for float32 unit vectors."""
+    if dtype == "float32":
+        return unit_vectors.astype(np.float32), None
+    if dtype == "float16":
+        return unit_vectors.astype(np.float16), None
+    # Symmetric per-row int8: the largest component maps to +-127
+    scales = np.abs(unit_vectors).max(axis=1) if len(unit_vectors) else np.zeros(0, dtype=np.float32)
+    scales[scales == 0] = 1.0
+    quantised = np.round(unit_vectors / scales[:, None] * 127).astype(np.int8)
+    return quantised, (scales / 127).astype(np.float32)
+
+
+# ----------------------------- Artifact -----------------------------
+class EmbeddingArtifact:
+    def __init__(self, path, header, records, vectors, scales=None):
+        self.path = path
+        self.header = header
+        self.records = records      # [{"id", "text", "metadata"}] in row order
+        self.vectors = vectors      # memory-mapped when loaded from disk
+        self.scales = scales
+        self._by_text = None
+
+    @classmethod
+    def load(cls, path=EMBEDDING_ARTIFACT_DIR):
+        """The current version of the artifact at `path`; its .path is that version's directory."""
+        return read_current(path, cls._load, legacy_file="header.json")
+
+    @classmethod
+    def _load(cls, path):
+        with open(os.path.join(path, "header.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding artifact version: {header.get('version')}")
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r") if header["dtype"] == "int8" else None
+        with open(os.path.join(path, "chunks.jsonl"), "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if len(records) != header["count"] or vectors.shape[0] != header["count"]:
+            raise ValueError(f"❌ Embedding artifact at {path} is incomplete "
+                             f"(header {header['count']}, vectors {vectors.shape[0]}, chunks {len(records)})")
+        return cls(path, header, records, vectors, scales)
+
+    @classmethod
+    def load_or_none(cls, path=EMBEDDING_ARTIFACT_DIR):
+        if current_dir(path, legacy_file="header.json") is None:
+            return None
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Embedding artifact at {path} unreadable ({e}), rebuilding.")
+            return None
+
+    # -------- Header --------
+    @property
+    def settings(self):
+        """Same keys as the ingestion manifest settings."""
+        return {key: self.header[key] for key in ("model", "chunk_size", "chunk_overlap")}
+
+    @property
+    def files(self):
+        return self.header["files"]
+
+    def __len__(self):
+        return len(self.records)
+
+    # -------- Vectors --------
+    def unit_vectors(self, rows=None):
+        """float32 unit vectors for a slice/index array of rows (all rows by default)."""
+        rows = slice(None) if rows is None else rows
+        values = np.asarray(self.vectors[rows], dtype=np.float32)
+        if self.scales is not None:
+            values = values * np.asarray(self.scales[rows])[:, None]
+        return values
+
+    def file_rows(self, name):
+        entry = self.files[name]
+        return slice(entry["start"], entry["start"] + entry["count"])
+
+    def row_for_text(self, text):
+        if self._by_text is None:
+            self._by_text = {}
+            for row, record in enumerate(self.records):
+                self._by_text.setdefault(record["text"], row)
+        return self._by_text.get(text)
+
+    def documents(self, name):
+        """The chunks of one file as Documents (e.g. for the lexical index)."""
+        rows = self.file_rows(name)
+        return [Document(page_content=r["text"], metadata=r["metadata"]) for r in self.records[rows]]
+
+    # -------- Export --------
+    def iter_upserts(self, batch_size=DEFAULT_BATCH_SIZE):
+        """Pinecone-style upsert batches: [{"id", "values", "metadata"}]."""
+        for start in range(0, len(self.records), batch_size):
+            stop = min(start + batch_size, len(self.records))
+            values = self.unit_vectors(slice(start, stop))
+            yield [
+                # "text" is the key PineconeVectorStore reads the page content from
+                {"id": r["id"], "values": v.tolist(), "metadata": {**r["metadata"], "text": r["text"]}}
+                for r, v in zip(self.records[start:stop], values)
+            ]
+
+    def upsert_to(self, index, batch_size=DEFAULT_BATCH_SIZE):
+        """Bulk-load every chunk into `index` (local or Pinecone). Returns the row count."""
+        for vectors in self.iter_upserts(batch_size):
+            index.upsert(vectors=vectors)
+        flush_index(index)
+        return len(self.records)
+
+    def embeddings(self, fallback_factory=None):
+        return ArtifactEmbeddings(self, fallback_factory)
+
+
+class ArtifactEmbeddings(Embeddings):
+    """
+    Embeddings served from an artifact by chunk text; texts it does not
+    contain (and queries) go to the model from `fallback_factory`, which is
+    only called on the first miss.
+    """
+
+    def __init__(self, artifact, fallback_factory=None):
+        self.artifact = artifact
+        self.fallback_factory = fallback_factory
+        self._fallback = None
+        self.hits = 0
+        self.misses = 0
+
+    def _model(self):
+        if self._fallback is None:
+            if self.fallback_factory is None:
+                raise KeyError("Text not in the embedding artifact and no fallback model configured")
+            self._fallback = self.fallback_factory()
+        return self._fallback
+
+    def embed_documents(self, texts):
+        rows = [self.artifact.row_for_text(text) for text in texts]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        result = [None] * len(texts)
+        found = [i for i, row in enumerate(rows) if row is not None]
+        if found:
+            for i, vector in zip(found, self.artifact.unit_vectors(np.array([rows[i] for i in found]))):
+                result[i] = vector.tolist()
+        if missing:
+            for i, vector in zip(missing, self._model().embed_documents([texts[i] for i in missing])):
+                result[i] = vector
+        return result
+
+    def embed_query(self, text):
+        return self._model().embed_query(text)
+
+
+# ----------------------------- Writing -----------------------------
+def write_artifact(path, header, records, unit_vectors):
+    """
+    Write an artifact. All files go to a new version directory that becomes
+    current in one pointer swap, so a reader loads either the old or the new
+    build, never vectors of one with chunks of the other.
+    """
+    stored, scales = encode(unit_vectors, header["dtype"])
+
+    def _write(directory):
+        def _file(name, writer):
+            with open(os.path.join(directory, name), "wb") as f:
+                writer(f)
+
+        _file("vectors.npy", lambda f: np.save(f, np.ascontiguousarray(stored)))
+        if scales is not None:
+            _file("scales.npy", lambda f: np.save(f, scales))
+        _file("chunks.jsonl", lambda f: f.writelines(
+            (json.dumps(r, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8") for r in records
+        ))
+        _file("header.json", lambda f: f.write(json.dumps(header, indent=2, sort_keys=True).encode("utf-8")))
+
+    return write_version(path, _write, legacy_files=_ARTIFACT_FILES)
+
+
+def build_artifact(data_dir, path=EMBEDDING_ARTIFACT_DIR, embeddings_factory=None, settings=None,
+                   dtype=EMBEDDING_ARTIFACT_DTYPE, max_workers=None):
+    """
+    Write the artifact for every PDF in data_dir and return (artifact, stats).
+
+    Files whose hash and settings match the previous artifact are copied
+    over without parsing; in the others only chunk texts the previous
+    artifact has not seen (with the same model) are embedded. A dtype change
+    counts as a settings change: every chunk is embedded again, since int8
+    or float16 vectors re-encoded to another dtype would keep their
+    quantisation error. `embeddings_factory` is called at most once, and
+    only when needed.
+    """
+    if dtype not in ARTIFACT_DTYPES:
+        raise ValueError(f"Unsupported artifact dtype: {dtype}")
+    settings = settings or {"model": EMBEDDING_MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    previous = EmbeddingArtifact.load_or_none(path)
+    same_dtype = previous is not None and previous.header["dtype"] == dtype
+    same_model = same_dtype and previous.settings["model"] == settings["model"]
+    same_settings = same_dtype and previous.settings == settings
+    stats = {"reused_files": 0, "parsed_files": 0, "embedded": 0, "reused_vectors": 0}
+
+    records, parts, files = [], [], {}
+    embeddings = None
+    pool = None
+    try:
+        for name in list_pdfs(data_dir):
+            sha = file_sha256(os.path.join(data_dir, name))
+            old = previous.files.get(name) if same_settings else None
+            if old and old["sha256"] == sha:
+                rows = previous.file_rows(name)
+                file_records = previous.records[rows]
+                vectors = previous.unit_vectors(rows)
+                stats["reused_files"] += 1
+            else:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=max_workers)
+                chunks = list(iter_pdf_chunks(
+                    [os.path.join(data_dir, name)], max_workers=max_workers, executor=pool
+                ))
+                ids = chunk_ids(name, chunks)
+                file_records = [
+                    {"id": vid, "text": c.page_content, "metadata": c.metadata} for vid, c in zip(ids, chunks)
+                ]
+                known = [previous.row_for_text(r["text"]) if same_model else None for r in file_records]
+                vectors = np.zeros((len(file_records), 0), dtype=np.float32)
+                todo = [i for i, row in enumerate(known) if row is None]
+                if todo and embeddings is None:
+                    embeddings = embeddings_factory()
+                embedded = {}
+                for batch in batched(todo, EMBED_BATCH_SIZE):
+                    values = embeddings.embed_documents([file_records[i]["text"] for i in batch])
+                    embedded.update(zip(batch, _unit_rows(values)))
+                reused_rows = [row for row in known if row is not None]
+                reused = iter(previous.unit_vectors(np.array(reused_rows)) if reused_rows else [])
+                if file_records:
+                    vectors = np.stack([embedded[i] if row is None else next(reused) for i, row in enumerate(known)])
+                stats["parsed_files"] += 1
+                stats["embedded"] += len(todo)
+                stats["reused_vectors"] += len(file_records) - len(todo)
+                print(f"📄 {name}: {len(file_records)} chunks, {len(todo)} embedded")
+
+            files[name] = {"sha256": sha, "start": len(records), "count": len(file_records)}
+            records.extend(file_records)
+            if len(file_records):
+                parts.append(vectors)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    unit_vectors = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+    header = {
+        "version": ARTIFACT_FORMAT_VERSION,
+        **settings,
+        "dtype": dtype,
+        "dimension": int(unit_vectors.shape[1]) if unit_vectors.ndim == 2 else 0,
+        "count": len(records),
+        "created": time.time(),
+        "files": files,
+    }
+    unchanged = same_dtype and not stats["parsed_files"] and set(previous.files) == set(files)
+    if not unchanged:
+        write_artifact(path, header, records, unit_vectors)
+    return EmbeddingArtifact.load(path), stats
+
+
+# ----------------------------- Diff -----------------------------
+def diff_artifacts(old, new):
+    """What changed between two builds: settings, files and chunk IDs."""
+    old_ids = {r["id"] for r in old.records}
+    new_ids = {r["id"] for r in new.records}
+    return {
+        "settings": {key: [old.header.get(key), new.header.get(key)]
+                     for key in ("model", "chunk_size", "chunk_overlap", "dtype", "dimension")
+                     if old.header.get(key) != new.header.get(key)},
+        "files_added": sorted(set(new.files) - set(old.files)),
+        "files_removed": sorted(set(old.files) - set(new.files)),
+        "files_changed": sorted(name for name in set(old.files) & set(new.files)
+                                if old.files[name]["sha256"] != new.files[name]["sha256"]),
+        "chunks_added": len(new_ids - old_ids),
+        "chunks_removed": len(old_ids - new_ids),
+        "chunks_unchanged": len(old_ids & new_ids),
+    }
+
+
+# ----------------------------- Index Migration -----------------------------
+def restore_index(artifact, index, data_dir, manifest_path, lexical_index=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Fill a vector index from the artifact and write the ingestion manifest
+    (and lexical index) to match, so the next store_index run has nothing
+    to do. Only files whose current hash matches the artifact are recorded.
+    """
+    from src.ingestion import new_manifest, save_manifest
+    from src.vector_store import manifest_settings
+
+    count = artifact.upsert_to(index, batch_size)
+    manifest = new_manifest(manifest_settings(index, artifact.settings))
+    for name, entry in artifact.files.items():
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path) or file_sha256(path) != entry["sha256"]:
+            continue
+        stat = os.stat(path)
+        ids = [r["id"] for r in artifact.records[artifact.file_rows(name)]]
+        manifest["files"][name] = {"sha256": entry["sha256"], "size": stat.st_size, "mtime": stat.st_mtime,
+                                   "chunks": ids}
+        if lexical_index is not None:
+            lexical_index.set_file(name, ids, artifact.documents(name))
+    save_manifest(manifest_path, manifest)
+    if lexical_index is not None:
+        lexical_index.build()
+    return count
+
+
+# ----------------------------- CLI -----------------------------
+def _print_info(artifact):
+    h = artifact.header
+    size = sum(os.path.getsize(os.path.join(artifact.path, name))
+               for name in os.listdir(artifact.path) if not name.endswith(".tmp"))
+    print(f"📦 {artifact.path}: {h['count']} chunks x {h['dimension']} ({h['dtype']}), {size / 2**20:.1f} MB")
+    print(f"   model {h['model']}, chunk_size {h['chunk_size']}, chunk_overlap {h['chunk_overlap']}")
+    for name, entry in sorted(h["files"].items()):
+        print(f"   {name}: {entry['count']} chunks, sha256 {entry['sha256'][:12]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, inspect, diff and bulk-load the embedding artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="embed data/ into the artifact (only new chunks are embedded)")
+    build.add_argument("--data", default=os.getenv("DATA_DIR", "data"))
+    build.add_argument("--path", default=EMBEDDING_ARTIFACT_DIR)
+    build.add_argument("--dtype", choices=ARTIFACT_DTYPES, default=EMBEDDING_ARTIFACT_DTYPE)
+    info = sub.add_parser("info")
+    info.add_argument("path", nargs="?", default=EMBEDDING_ARTIFACT_DIR)
+    diff = sub.add_parser("diff")
+    diff.add_argument("old")
+    diff.add_argument("new", nargs="?", default=EMBEDDING_ARTIFACT_DIR)
+    upsert = sub.add_parser("upsert", help="load the artifact into the configured vector backend")
+    upsert.add_argument("--path", default=EMBEDDING_ARTIFACT_DIR)
+    upsert.add_argument("--backend", choices=["local", "pinecone"], help="default: VECTOR_BACKEND")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        from src.helper import download_hugging_face_embeddings
+
+        start = time.perf_counter()
+        artifact, stats = build_artifact(args.data, args.path, download_hugging_face_embeddings, dtype=args.dtype)
+        print(f"✅ Artifact built in {time.perf_counter() - start:.1f}s:", stats)
+        _print_info(artifact)
+    elif args.command == "info":
+        _print_info(EmbeddingArtifact.load(args.path))
+    elif args.command == "diff":
+        print(json.dumps(diff_artifacts(EmbeddingArtifact.load(args.old), EmbeddingArtifact.load(args.new)), indent=2))
+    elif args.command == "upsert":
+        if args.backend:
+            os.environ["VECTOR_BACKEND"] = args.backend
+        # Imported late: the backend is chosen from the environment at import time
+        from src.store_index import open_target_index, DATA_DIR, MANIFEST_PATH
+        from src.hybrid_retriever import LexicalIndex, LEXICAL_INDEX_PATH
+
+        artifact = EmbeddingArtifact.load(args.path)
+        start = time.perf_counter()
+        lexical_index = LexicalIndex()
+        count = restore_index(artifact, open_target_index(), DATA_DIR, MANIFEST_PATH, lexical_index)
+        lexical_index.save(LEXICAL_INDEX_PATH)
+        print(f"✅ Upserted {count} vectors in {time.perf_counter() - start:.1f}s; manifest and lexical index rewritten")
+
+
+if __name__ == "__main__":
+    main()
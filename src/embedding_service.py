@@ -0,0 +1,126 @@
+import re
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from src.cache import LRUCache
+from src.metrics import stage
+
+
+# ----------------------------- Query Normalisation -----------------------------
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalise_query(text):
+    """
+    Canonical form used as the cache key and as the text sent to the model:
+    lower-cased, whitespace collapsed, trailing punctuation dropped, so
+    "What is the HS code for tea?" and "what is the hs code for tea" share a vector.
+    MiniLM is uncased, so lower-casing does not change what the model sees.
+    """
+    return _WHITESPACE.sub(" ", text).strip().lower().rstrip("?!. ")
+
+
+# ----------------------------- Batching Embedding Service -----------------------------
+class BatchingEmbeddingService(Embeddings):
+    """
+    Drop-in LangChain Embeddings wrapper for query-time embedding.
+
+    - embed_query() first checks an LRU cache of normalised query -> vector.
+    - Cache misses are queued; a single background thread coalesces queries
+      that arrive within `max_wait_ms` (up to `max_batch`) into one
+      embed_documents() forward pass and resolves every caller's future.
+    - embed_documents() (bulk ingestion) goes straight to the wrapped model.
+    """
+
+    def __init__(self, base, max_batch=32, max_wait_ms=2.0, cache_size=4096):
+        self.base = base
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache = LRUCache(maxsize=cache_size)
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._batched_queries = 0
+        self._max_batch_seen = 0
+        self._batch_size_counts = {}
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    # -------- LangChain Embeddings interface --------
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = normalise_query(text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector
+        # Cache misses only: queueing + the batched forward pass
+        with stage("embedding"):
+            future = Future()
+            self._queue.put((key, future))
+            return future.result()
+
+    # -------- Batching worker --------
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+
+            # Identical concurrent questions share one slot in the forward pass
+            pending = {}
+            for key, future in batch:
+                pending.setdefault(key, []).append(future)
+            texts = list(pending)
+
+            try:
+                vectors = self.base.embed_documents(texts)
+            except Exception as e:
+                for futures in pending.values():
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+
+            for text, vector in zip(texts, vectors):
+                self.cache.set(text, vector)
+                for future in pending[text]:
+                    future.set_result(vector)
+            self._record_batch(len(texts))
+
+    def _record_batch(self, size):
+        with self._stats_lock:
+            self._batches += 1
+            self._batched_queries += size
+            self._max_batch_seen = max(self._max_batch_seen, size)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
+
+    # -------- Metrics --------
+    def metrics(self):
+        with self._stats_lock:
+            batches = self._batches
+            return {
+                "cache": self.cache.stats(),
+                "batches": batches,
+                "batched_queries": self._batched_queries,
+                "avg_batch_size": round(self._batched_queries / batches, 2) if batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "batch_size_counts": dict(sorted(self._batch_size_counts.items())),
+                "queue_depth": self._queue.qsize(),
+            }
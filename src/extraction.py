@@ -0,0 +1,143 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import Future
+
+from docx import Document
+from PIL import Image, UnidentifiedImageError
+from pypdf import PdfReader
+import pytesseract
+
+from src.tokens import estimate_tokens
+
+
+# ----------------------------- Settings -----------------------------
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+# Pages with less text than this are treated as scanned and OCR'd
+MIN_PAGE_TEXT = int(os.getenv("MIN_PAGE_TEXT", "20"))
+
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png"}
+DOCUMENT_EXTENSIONS = {"pdf", "docx"} | IMAGE_EXTENSIONS
+
+
+# ----------------------------- OCR (worker side) -----------------------------
+def ocr_images(images):
+    """
+    OCR a list of encoded images (bytes) and join the text. Module-level so
+    it can run in a worker process; only the image bytes cross the boundary.
+    An image PIL cannot decode (JBIG2, CCITT) is skipped; Tesseract errors
+    (e.g. no tesseract binary) propagate.
+    """
+    texts = []
+    for data in images:
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except (UnidentifiedImageError, OSError) as e:
+            print("⚠️ Skipping unreadable image:", e)
+            continue
+        texts.append(pytesseract.image_to_string(image))
+    return "\n".join(texts)
+
+
+def _page_images(page):
+    try:
+        return [image.data for image in page.images]
+    except Exception:
+        # Unsupported image filters: nothing we can OCR on this page
+        return []
+
+
+# ----------------------------- Page Iterators -----------------------------
+def iter_pdf_pages(data, executor=None, workers=EXTRACTION_WORKERS, lookahead=None):
+    """
+    Yield the text of each PDF page in order.
+
+    The text layer is read in this process (cheap); pages without one are
+    scanned, so their embedded images are OCR'd on `executor` (a process
+    pool of `workers` processes) while later pages are being read. Up to
+    `lookahead` OCR jobs run at once. Closing the generator early cancels the jobs not yet started.
+    """
+    reader = PdfReader(io.BytesIO(data))
+    # Keep every worker busy plus one queued job each
+    lookahead = lookahead or workers * 2
+    pending = deque()
+    in_flight = 0
+
+    def _drain(block):
+        nonlocal in_flight
+        while pending:
+            head = pending[0]
+            if isinstance(head, Future):
+                if not (block or head.done()):
+                    return
+                in_flight -= 1
+                head = head.result()
+            pending.popleft()
+            yield head + "\n"
+
+    try:
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            images = [] if len(text.strip()) >= MIN_PAGE_TEXT else _page_images(page)
+            if not images:
+                pending.append(text)
+            elif executor is None:
+                pending.append(ocr_images(images))
+            else:
+                pending.append(executor.submit(ocr_images, images))
+                in_flight += 1
+            yield from _drain(block=in_flight >= lookahead)
+        yield from _drain(block=True)
+    finally:
+        for item in pending:
+            if isinstance(item, Future):
+                item.cancel()
+
+
+def iter_docx_paragraphs(data):
+    for para in Document(io.BytesIO(data)).paragraphs:
+        yield para.text + "\n"
+
+
+def iter_image_text(data, executor=None):
+    if executor is None:
+        yield ocr_images([data])
+    else:
+        yield executor.submit(ocr_images, [data]).result()
+
+
+# ----------------------------- Extraction -----------------------------
+def extract_document(data, ext, max_chars=None, executor=None, workers=EXTRACTION_WORKERS, max_tokens=None):
+    """
+    Extract text from an uploaded document held in memory (no temp file).
+
+    Stops reading (and OCR-ing) once the text covers every window the caller
+    reads: at least `max_chars` characters and more than `max_tokens`
+    estimated tokens. With neither set, the whole document is read. Pass a
+    ProcessPoolExecutor of `workers` processes as `executor` to OCR scanned
+    PDF pages and images on other cores.
+    """
+    if ext == "pdf":
+        pieces = iter_pdf_pages(data, executor, workers)
+    elif ext == "docx":
+        pieces = iter_docx_paragraphs(data)
+    elif ext in IMAGE_EXTENSIONS:
+        pieces = iter_image_text(data, executor)
+    else:
+        return ""
+
+    parts = []
+    size = 0
+    bounded = max_chars is not None or max_tokens is not None
+    try:
+        for piece in pieces:
+            parts.append(piece)
+            size += len(piece)
+            if not bounded or size < (max_chars or 0):
+                continue
+            if max_tokens is None or estimate_tokens("".join(parts)) > max_tokens:
+                break
+    finally:
+        pieces.close()
+    return "".join(parts)
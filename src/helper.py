@@ -1,12 +1,61 @@
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
+from pypdf import PdfReader
+from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter 
 
-from langchain_huggingface import HuggingFaceEmbeddings  
-
 from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 
+
+# Chunking / embedding settings shared by ingestion and retrieval
+# (compare alternatives with `python -m src.retrieval_eval`)
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "750"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+EMBEDDING_DIMENSION = 384
  
 
+# ----------------------------- Text Repair -----------------------------
+# Most pages of the Customs Tariff PDF use a font whose text extracts shifted
+# down by 29 code points ("Heading" comes out as "+HDGLQJ", digits and spaces
+# as control characters). pypdf separates the font's runs from each other and
+# from normal-font text with real spaces, so on a line containing control
+# characters each space-delimited run is judged on its own:
+#   - a run with a control character is shifted text;
+#   - a run with ASCII above "]" (lowercase letters) and no control character
+#     is normal-font text, since shifted text never contains those;
+#   - a run with neither ("QRV" for "nos", but also a normal "HS 0902") is
+#     shifted only when the line has no normal-font run. Lines that mix in
+#     normal-font words keep such runs as they are.
+_SHIFTED_LINE = re.compile(r"[\x00-\x08\x0b-\x1f]")
+_NORMAL_FONT = re.compile(r"[\x5e-\x7e]")
+_FONT_SHIFT = 29
+
+
+def _shift_back(run):
+    return "".join(chr(ord(c) + _FONT_SHIFT) if 0x03 <= ord(c) <= 0x5d else c for c in run)
+
+
+def _repair_line(line):
+    if not _SHIFTED_LINE.search(line):
+        return line
+    runs = line.split(" ")
+    shifted = [bool(_SHIFTED_LINE.search(run)) for run in runs]
+    normal = [not s and bool(_NORMAL_FONT.search(run)) for run, s in zip(runs, shifted)]
+    mixed = any(normal)
+    return " ".join(
+        _shift_back(run) if s or not (n or mixed) else run
+        for run, s, n in zip(runs, shifted, normal)
+    )
+
+
+def repair_extracted_text(text):
+    return "\n".join(_repair_line(line) for line in text.split("\n"))
+
+
 # Load multiple PDFs (from different files or directories)
 # Here extraction of data from the pdf using different form the pdf 
 
@@ -22,38 +71,147 @@ def load_multiple_pdfs(folder_path):
             # Load all PDFs from a directory
             loader = DirectoryLoader(path, glob="*.pdf", loader_cls=PyPDFLoader)
             documents.extend(loader.load())
+    for doc in documents:
+        doc.page_content = repair_extracted_text(doc.page_content)
     return documents
 
 
-# Example usage:
-pdf_files = [
-    "D:\\Customs Clearance_chatbot\\data\\Customs Tariff 2024-25_zz1tedk.pdf",
-    "D:\\Customs Clearance_chatbot\\data\\Navigating Import.pdf",
-    "D:\\Customs Clearance_chatbot\\data\\nepal.pdf",
-    "D:\\Customs Clearance_chatbot\\data\\np_e.pdf",
-    "D:\\Customs Clearance_chatbot\\data\\trade_industry_tax.pdf",
-    "D:\\Customs Clearance_chatbot\\data\\CUSTOMS_ACT &  REGULATION 2064_1wnta5d.pdf"
-]
-
-all_documents = load_multiple_pdfs(pdf_files)
+# Example usage (relative to the project root):
+# all_documents = load_multiple_pdfs(["data"])
 # print(len(all_documents))  
 
 
 
 # split the data  into text chunks 
-def text_split(all_documents) :
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size = 750, chunk_overlap = 100 )
+def text_split(all_documents, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP) :
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size = chunk_size, chunk_overlap = chunk_overlap )
     text_chunks = text_splitter.split_documents(all_documents)
 
     return text_chunks
 
 
 
+# ----------------------------- Parallel PDF Loading -----------------------------
+# Pages (not whole files) are the unit of work, so one big PDF such as the
+# Customs Tariff is spread over every core instead of pinning a single one.
+
+PAGES_PER_TASK = 8
+
+# The open reader of the worker's current file (and its page labels, which
+# pypdf recomputes for the whole file on every access), so a PDF is parsed
+# once per worker. Tasks arrive in file order, so only the current file is
+# kept; the previous one is released when the next file starts.
+_worker_reader_cache = {}
+
+
+def _worker_reader(path):
+    cached = _worker_reader_cache.get(path)
+    if cached is None:
+        _worker_reader_cache.clear()
+        reader = PdfReader(path)
+        cached = (reader, reader.page_labels, _document_metadata(reader, path))
+        _worker_reader_cache[path] = cached
+    return cached
+
+
+def _document_metadata(reader, path):
+    # The file-level metadata PyPDFLoader puts on every page (producer,
+    # creator, creationdate, ...), normalised by the same langchain helper
+    from langchain_community.document_loaders.parsers.pdf import _purge_metadata
+
+    return _purge_metadata(
+        {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+        | dict(reader.metadata or {})
+        | {"source": path, "total_pages": len(reader.pages)}
+    )
+
+
+def _load_and_split_pages(task):
+    """
+    Worker: extract and split one contiguous run of pages of one PDF.
+    Page text and metadata are built the way PyPDFLoader builds them, so
+    the chunks equal those of text_split(load_multiple_pdfs([path])).
+    """
+    path, start, stop = task
+    reader, page_labels, metadata = _worker_reader(path)
+    pages = []
+    for page_number in range(start, stop):
+        page = reader.pages[page_number]
+        pages.append(Document(
+            page_content=repair_extracted_text((page.extract_text() or "").strip()),
+            metadata={**metadata, "page": page_number, "page_label": page_labels[page_number]},
+        ))
+    return text_split(pages)
+
+
+def _expand_pdf_paths(paths):
+    # Same path conventions as load_multiple_pdfs: a PDF file or a folder of PDFs
+    for path in paths:
+        if path.endswith(".pdf"):
+            yield path
+        else:
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(".pdf"):
+                    yield os.path.join(path, name)
+
+
+def _page_tasks(paths, pages_per_task):
+    # Lazy: a file is opened (to count its pages) only when its first task is due
+    for path in _expand_pdf_paths(paths):
+        page_count = len(PdfReader(path).pages)
+        for start in range(0, page_count, pages_per_task):
+            yield (path, start, min(start + pages_per_task, page_count))
+
+
+def iter_pdf_chunks(paths, max_workers=None, pages_per_task=PAGES_PER_TASK, executor=None, lookahead=None):
+    """
+    Parse and split PDFs in parallel, yielding chunks in file/page order, so
+    the output matches text_split(load_multiple_pdfs(paths)).
+
+    Pages are fanned out over a process pool in runs of `pages_per_task`.
+    At most `lookahead` runs (default: two per worker) are submitted ahead
+    of the consumer, so memory stays bounded by the window, not by the size
+    of the corpus. Pass `executor` (with its max_workers) to reuse an
+    existing pool, or max_workers=1 to run in-process.
+    """
+    tasks = _page_tasks(paths, pages_per_task)
+
+    if executor is None and max_workers == 1:
+        for task in tasks:
+            yield from _load_and_split_pages(task)
+        return
+
+    lookahead = lookahead or (max_workers or os.cpu_count() or 1) * 2
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(executor.submit(_load_and_split_pages, task))
+            if len(pending) >= lookahead:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+
+def load_and_split_parallel(paths, max_workers=None, pages_per_task=PAGES_PER_TASK):
+    return list(iter_pdf_chunks(paths, max_workers=max_workers, pages_per_task=pages_per_task))
+
+
+
 
 
 def download_hugging_face_embeddings():
-    # NEW (Updated)
-    embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2')
+    # Imported here: pulling in torch/sentence-transformers takes seconds, and
+    # only the processes that actually embed should pay for it
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
     return embeddings
 
-embeddings = download_hugging_face_embeddings()
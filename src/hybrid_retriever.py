@@ -0,0 +1,268 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", os.path.join("artifacts", "lexical_index.json"))
+RETRIEVER_MODE = os.getenv("RETRIEVER_MODE", "hybrid")
+LEXICAL_INDEX_VERSION = 1
+
+
+# ----------------------------- Tokenisation -----------------------------
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from how i in is it its of on or that the this "
+    "to was what when where which who will with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+# ----------------------------- HS Code Extraction -----------------------------
+# Tariff lines are printed as 8-digit national codes "6403.99.00"; people also
+# write 6-digit subheadings "6403.99"/"640399" or 4-digit headings "6403".
+_DOC_HS_CODE = re.compile(r"(?<![\d.])(\d{4})\.(\d{2})(?:\.(\d{2}))?(?![\d.])")
+_QUERY_HS_CODE = re.compile(r"(?<![\d.])(\d{4})(?:\.?(\d{2}))?(?:\.?(\d{2}))?(?![\d.])")
+_HS_CONTEXT = re.compile(r"\b(hs|heading|sub-?heading|code|tariff|duty|chapter)\b", re.IGNORECASE)
+
+
+def _valid_chapter(digits):
+    return 1 <= int(digits[:2]) <= 97
+
+
+def extract_hs_codes(text):
+    """
+    HS codes printed in a document chunk, as digit strings ("64039900").
+    """
+    codes = []
+    for m in _DOC_HS_CODE.finditer(text):
+        digits = "".join(g for g in m.groups() if g)
+        if _valid_chapter(digits):
+            codes.append(digits)
+    return codes
+
+
+def extract_query_hs_codes(query):
+    """
+    HS codes mentioned in a user question. A bare 4-digit number only counts
+    when the question is clearly about codes/duty, so "imports in 2024" is
+    not read as heading 20.24.
+    """
+    has_context = bool(_HS_CONTEXT.search(query))
+    codes = []
+    for m in _QUERY_HS_CODE.finditer(query):
+        digits = "".join(g for g in m.groups() if g)
+        if not _valid_chapter(digits):
+            continue
+        if len(digits) == 4 and not has_context:
+            continue
+        codes.append(digits)
+    return codes
+
+
+def _code_prefixes(code):
+    # 64039900 -> 6403, 640399, 64039900
+    return {code[:n] for n in (4, 6, 8) if len(code) >= n}
+
+
+# ----------------------------- Lexical Index -----------------------------
+class LexicalIndex:
+    """
+    BM25 inverted index plus an HS-code -> chunk index over the corpus chunks.
+
+    Chunks are kept grouped by source file so incremental ingestion can
+    replace one file at a time; postings, document lengths and the HS code
+    table are precomputed by build() and stored in one JSON file, so loading
+    at serving time does no tokenisation.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.files = {}       # file name -> [{"id", "text", "metadata"}]
+        self.chunks = []      # flat, in file order
+        self.postings = {}    # term -> [[chunk_idx, tf], ...]
+        self.doc_len = []
+        self.avg_len = 0.0
+        self.hs_codes = {}    # code prefix -> [[chunk_idx, exact_hits], ...]
+
+    # -------- Building --------
+    def has_file(self, name):
+        return name in self.files
+
+    def set_file(self, name, ids, chunks):
+        self.files[name] = [
+            {"id": vid, "text": chunk.page_content, "metadata": chunk.metadata}
+            for vid, chunk in zip(ids, chunks)
+        ]
+
+    def remove_file(self, name):
+        self.files.pop(name, None)
+
+    def build(self):
+        self.chunks = [chunk for name in sorted(self.files) for chunk in self.files[name]]
+        postings = {}
+        hs_codes = {}
+        self.doc_len = []
+        for idx, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk["text"]))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([idx, tf])
+
+            code_counts = Counter()
+            for code in extract_hs_codes(chunk["text"]):
+                for prefix in _code_prefixes(code):
+                    code_counts[prefix] += 1
+            for prefix, hits in code_counts.items():
+                hs_codes.setdefault(prefix, []).append([idx, hits])
+
+        # Chunks listing a code most often (its own tariff line) come first
+        for entries in hs_codes.values():
+            entries.sort(key=lambda e: -e[1])
+        self.postings = postings
+        self.hs_codes = hs_codes
+        self.avg_len = sum(self.doc_len) / len(self.doc_len) if self.doc_len else 0.0
+        return self
+
+    # -------- Persistence --------
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": LEXICAL_INDEX_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "files": {name: [c["id"] for c in chunks] for name, chunks in self.files.items()},
+            "chunks": self.chunks,
+            "postings": self.postings,
+            "doc_len": self.doc_len,
+            "hs_codes": self.hs_codes,
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            raise ValueError(f"Unsupported lexical index version: {data.get('version')}")
+        index = cls(k1=data["k1"], b=data["b"])
+        index.chunks = data["chunks"]
+        by_id = {c["id"]: c for c in index.chunks}
+        index.files = {name: [by_id[i] for i in ids] for name, ids in data["files"].items()}
+        index.postings = data["postings"]
+        index.doc_len = data["doc_len"]
+        index.hs_codes = data["hs_codes"]
+        index.avg_len = sum(index.doc_len) / len(index.doc_len) if index.doc_len else 0.0
+        return index
+
+    @classmethod
+    def load_or_empty(cls, path):
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, KeyError):
+                print("⚠️ Lexical index unreadable, rebuilding.")
+        return cls()
+
+    # -------- Search --------
+    def document(self, idx):
+        chunk = self.chunks[idx]
+        return Document(page_content=chunk["text"], metadata=dict(chunk["metadata"]), id=chunk["id"])
+
+    def lookup_hs_codes(self, codes, k):
+        """
+        Chunks containing any of the codes (longest, most specific code first).
+        A pure dict lookup, no scoring or embedding involved.
+        """
+        seen = set()
+        results = []
+        for code in sorted(set(codes), key=len, reverse=True):
+            for idx, _ in self.hs_codes.get(code, []):
+                if idx not in seen:
+                    seen.add(idx)
+                    results.append(idx)
+                    if len(results) >= k:
+                        return results
+        return results
+
+    def search(self, query, k):
+        """
+        BM25 top-k as [(chunk_idx, score), ...].
+        """
+        n = len(self.chunks)
+        if n == 0:
+            return []
+        scores = {}
+        for term in set(tokenize(query)):
+            entries = self.postings.get(term)
+            if not entries:
+                continue
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            for idx, tf in entries:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[idx] / self.avg_len)
+                scores[idx] = scores.get(idx, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+
+# ----------------------------- Rank Fusion -----------------------------
+def reciprocal_rank_fusion(rankings, k, rrf_k=60):
+    """
+    Fuse several ranked lists of (key, document) with RRF:
+    score(d) = sum over lists of 1 / (rrf_k + rank).
+    """
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, (key, doc) in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [docs[key] for key in ordered]
+
+
+# ----------------------------- Hybrid Retriever -----------------------------
+class HybridRetriever(BaseRetriever):
+    """
+    Drop-in replacement for the dense retriever in the RAG chain.
+
+    1. If the question names HS codes found in the tariff, return those
+       chunks straight from the code index (no embedding, no vector search).
+    2. Otherwise take `candidate_k` results from both the dense retriever and
+       BM25 and fuse them with reciprocal-rank fusion down to `k`.
+    """
+
+    dense: BaseRetriever
+    lexical: LexicalIndex
+    k: int = 3
+    candidate_k: int = 10
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        codes = extract_query_hs_codes(query)
+        if codes:
+            exact = self.lexical.lookup_hs_codes(codes, self.k)
+            if exact:
+                return [self.lexical.document(idx) for idx in exact]
+
+        dense_docs = self.dense.invoke(query)
+        lexical_hits = self.lexical.search(query, self.candidate_k)
+        # Key on the chunk text: it identifies a chunk across both indexes
+        dense_ranking = [(doc.page_content, doc) for doc in dense_docs]
+        lexical_ranking = [
+            (self.lexical.chunks[idx]["text"], self.lexical.document(idx)) for idx, _ in lexical_hits
+        ]
+        return reciprocal_rank_fusion([dense_ranking, lexical_ranking], self.k, self.rrf_k)
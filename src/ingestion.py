@@ -0,0 +1,283 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from src.helper import iter_pdf_chunks
+
+
+# ----------------------------- Manifest Settings -----------------------------
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST_PATH = os.path.join("artifacts", "ingest_manifest.json")
+DEFAULT_BATCH_SIZE = 100
+
+
+# ----------------------------- Hashing -----------------------------
+def file_sha256(path, block_size=1 << 20):
+    """
+    Content hash of a file, read in 1 MB blocks so large PDFs are not loaded at once.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_ids(source, chunks):
+    """
+    Stable vector IDs for the chunks of one file.
+
+    The ID is a hash of the source name, the page, the chunk text and its
+    occurrence number on that page, so an unchanged chunk keeps its ID
+    across runs, repeated boilerplate (page headers, footers) does not
+    collide, and a chunk that moves to another page gets a new ID (and so
+    new page metadata in the index).
+    """
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        text = chunk.page_content
+        page = chunk.metadata.get("page", "")
+        occurrence = seen.get((page, text), 0)
+        seen[(page, text)] = occurrence + 1
+        key = f"{source}\x00{page}\x00{occurrence}\x00{text}".encode("utf-8")
+        ids.append(hashlib.sha256(key).hexdigest()[:32])
+    return ids
+
+
+# ----------------------------- Manifest I/O -----------------------------
+def new_manifest(settings):
+    return {"version": MANIFEST_VERSION, "settings": settings, "files": {}}
+
+
+def load_manifest(path, settings):
+    """
+    Load the manifest, or start a fresh one if it is missing or unreadable.
+
+    Returns (manifest, stale_ids). If the manifest was built with different
+    chunking/embedding settings every stored vector is invalid, so a fresh
+    manifest is returned together with all previously stored chunk IDs for
+    the caller to delete.
+    """
+    if not os.path.exists(path):
+        return new_manifest(settings), []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_manifest(settings), []
+
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("settings") != settings:
+        print("⚠️ Ingestion settings changed, rebuilding index from scratch.")
+        stale_ids = [
+            vid for entry in manifest.get("files", {}).values() for vid in entry.get("chunks", [])
+        ]
+        return new_manifest(settings), stale_ids
+    return manifest, []
+
+
+def save_manifest(path, manifest):
+    """
+    Write the manifest atomically so an interrupted run never leaves it half written.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------- Change Detection -----------------------------
+def list_pdfs(data_dir):
+    return sorted(
+        name for name in os.listdir(data_dir)
+        if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(data_dir, name))
+    )
+
+
+def detect_changes(data_dir, manifest):
+    """
+    Compare the PDFs in data_dir against the manifest.
+
+    Size + mtime is checked first so unchanged files are never re-hashed; when
+    they differ the file is hashed and only counted as changed if the content
+    hash differs too (e.g. a fresh git checkout touches every mtime).
+
+    Returns (changed, removed) where changed maps file name -> (sha256, stat).
+    """
+    files = manifest["files"]
+    changed = {}
+    current = set()
+
+    for name in list_pdfs(data_dir):
+        current.add(name)
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        entry = files.get(name)
+
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            continue
+
+        sha = file_sha256(path)
+        if entry and entry.get("sha256") == sha:
+            entry["mtime"] = stat.st_mtime
+            entry["size"] = stat.st_size
+            continue
+        changed[name] = (sha, stat)
+
+    removed = sorted(set(files) - current)
+    return changed, removed
+
+
+# ----------------------------- Vector Sink Helpers -----------------------------
+def batched(items, batch_size):
+    for start in range(0, len(items), batch_size):
+        yield items[start:start + batch_size]
+
+
+def flush_index(index):
+    # Local indexes buffer writes; Pinecone indexes have nothing to flush
+    flush = getattr(index, "flush", None)
+    if flush is not None:
+        flush()
+
+
+def delete_vectors(index, ids, batch_size=DEFAULT_BATCH_SIZE):
+    for batch in batched(list(ids), batch_size):
+        index.delete(ids=batch)
+
+
+def upsert_chunks(index, embeddings, ids, chunks, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Embed and upsert chunks batch by batch, so memory stays flat and a failure
+    part way through only loses the current batch.
+    """
+    for start in range(0, len(chunks), batch_size):
+        batch_chunks = chunks[start:start + batch_size]
+        batch_ids = ids[start:start + batch_size]
+        vectors = embeddings.embed_documents([c.page_content for c in batch_chunks])
+        index.upsert(vectors=[
+            {
+                "id": vid,
+                "values": vector,
+                # "text" is the key PineconeVectorStore reads the page content from
+                "metadata": {**chunk.metadata, "text": chunk.page_content},
+            }
+            for vid, vector, chunk in zip(batch_ids, vectors, batch_chunks)
+        ])
+
+
+# ----------------------------- Incremental Ingestion -----------------------------
+def run_incremental_ingest(
+    data_dir,
+    index,
+    embeddings_factory,
+    manifest_path=DEFAULT_MANIFEST_PATH,
+    settings=None,
+    batch_size=DEFAULT_BATCH_SIZE,
+    max_workers=None,
+    lexical_index=None,
+):
+    """
+    Bring the vector index in line with the PDFs in data_dir.
+
+    Only new or modified files are parsed and split, only chunks whose ID is
+    not already in the index are embedded, and vectors of chunks that vanished
+    (edited pages, deleted files) are removed. `index` is anything exposing
+    Pinecone-style `upsert(vectors=...)` and `delete(ids=...)`.
+
+    `embeddings_factory` is called at most once, and only when there is
+    something to embed, so a no-op run never loads the embedding model.
+
+    If a `lexical_index` (see src.hybrid_retriever.LexicalIndex) is given it
+    is kept in step with the vector index and rebuilt when anything changed.
+    """
+    settings = settings or {}
+    manifest, stale_ids = load_manifest(manifest_path, settings)
+    stats = {"parsed_files": 0, "removed_files": 0, "embedded": 0, "deleted": 0, "unchanged": 0}
+
+    if stale_ids:
+        delete_vectors(index, stale_ids, batch_size)
+        flush_index(index)
+        stats["deleted"] += len(stale_ids)
+        save_manifest(manifest_path, manifest)
+
+    if lexical_index is not None:
+        # Files indexed before the lexical index existed must be re-parsed
+        # (not re-embedded) once to fill it in.
+        for name, entry in manifest["files"].items():
+            if not lexical_index.has_file(name):
+                entry["size"] = entry["mtime"] = entry["sha256"] = None
+
+    changed, removed = detect_changes(data_dir, manifest)
+    embeddings = None
+
+    for name in removed:
+        entry = manifest["files"].pop(name)
+        delete_vectors(index, entry.get("chunks", []), batch_size)
+        if lexical_index is not None:
+            lexical_index.remove_file(name)
+        stats["removed_files"] += 1
+        stats["deleted"] += len(entry.get("chunks", []))
+        flush_index(index)
+        save_manifest(manifest_path, manifest)
+        print(f"🗑️ Removed {name} ({len(entry.get('chunks', []))} chunks)")
+
+    # One process pool for the whole run; pages of each changed PDF fan out over it
+    pool = ProcessPoolExecutor(max_workers=max_workers) if changed else None
+    try:
+        for name, (sha, stat) in changed.items():
+            path = os.path.join(data_dir, name)
+            # One file's chunks are held at a time: its IDs and stale chunks are only known per file
+            chunks = list(iter_pdf_chunks([path], max_workers=max_workers, executor=pool))
+            ids = chunk_ids(name, chunks)
+
+            old_ids = set(manifest["files"].get(name, {}).get("chunks", []))
+            new_ids = set(ids)
+            to_embed = [(vid, chunk) for vid, chunk in zip(ids, chunks) if vid not in old_ids]
+            to_delete = old_ids - new_ids
+
+            if to_embed:
+                if embeddings is None:
+                    embeddings = embeddings_factory()
+                upsert_chunks(
+                    index, embeddings,
+                    [vid for vid, _ in to_embed], [chunk for _, chunk in to_embed],
+                    batch_size,
+                )
+            delete_vectors(index, sorted(to_delete), batch_size)
+            flush_index(index)
+            if lexical_index is not None:
+                lexical_index.set_file(name, ids, chunks)
+
+            manifest["files"][name] = {
+                "sha256": sha,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "chunks": ids,
+            }
+            save_manifest(manifest_path, manifest)
+
+            stats["parsed_files"] += 1
+            stats["embedded"] += len(to_embed)
+            stats["deleted"] += len(to_delete)
+            stats["unchanged"] += len(ids) - len(to_embed)
+            print(f"📄 {name}: {len(to_embed)} embedded, {len(to_delete)} deleted, "
+                  f"{len(ids) - len(to_embed)} unchanged")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    stats["lexical_rebuilt"] = False
+    if lexical_index is not None:
+        orphans = [name for name in lexical_index.files if name not in manifest["files"]]
+        for name in orphans:
+            lexical_index.remove_file(name)
+        if changed or removed or orphans:
+            lexical_index.build()
+            stats["lexical_rebuilt"] = True
+
+    # Persist mtime refreshes from detect_changes even when nothing changed.
+    save_manifest(manifest_path, manifest)
+    return stats
@@ -0,0 +1,369 @@
+import os
+import re
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from src.tariff_index import get_tariff_index
+from src.duty_calculator import get_duty_calculator
+from src.trade_api_integration import (
+    get_hs_code,
+    get_tariff_info,
+    get_trade_statistics,
+    get_eu_doc_requirements,
+    get_routing_client,
+    format_trade_statistics,
+    normalise_query,
+)
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+# INTENT_ROUTER=full (rules + embedding classifier) | rules | off
+INTENT_ROUTER = os.getenv("INTENT_ROUTER", "full")
+# Cosine similarity a question needs to its nearest intent example before the
+# embedding classifier dispatches it; below that it goes to the RAG chain
+ROUTER_MIN_SIMILARITY = float(os.getenv("ROUTER_MIN_SIMILARITY", "0.6"))
+ROUTER_DEFAULT_COUNTRY = os.getenv("ROUTER_DEFAULT_COUNTRY", "Nepal")
+
+RAG = "rag"
+INTENTS = ("calculation", "hs_code", "duty", "documentation", "trade_stats", RAG)
+
+
+# ----------------------------- Slot Extraction -----------------------------
+_HS_CODE = re.compile(r"(?<![\d.])(\d{4}(?:\.?\d{2}){0,2})(?![\d.]*\d)")
+# "hs code for leather shoes", "what is the HSN code of green tea?"
+_PRODUCT = re.compile(
+    r"\b(?:hs|hsn|h\.s\.|tariff|commodity)\s*(?:code|number|no\.?|classification)\s*(?:for|of)\s+(?P<product>.+)",
+    re.IGNORECASE,
+)
+# "classify leather shoes", "which hs code does green tea fall under", "which heading covers tea"
+_PRODUCT_ALT = re.compile(
+    r"^(?:classify|classification of|(?:which|what) (?:hs |tariff |commodity )?(?:code|heading) "
+    r"(?:does|do|is|covers|applies to|is for))\s+(?P<product>.+?)"
+    r"(?:\s+(?:fall under|come under|belong to|classified under|have|use))?$",
+    re.IGNORECASE,
+)
+# Question and tariff words dropped when the product has to be guessed from
+# the whole question ("how is a mobile phone classified" -> "mobile phone")
+_STOPWORDS = frozenset(
+    "a an the is are was what which how where who do does i we my our to of for in on under into by with "
+    "hs hsn code codes number tariff heading commodity classified classification classify find get "
+    "please tell me it its this that covers cover".split()
+)
+_COUNTRY = re.compile(r"\b(?:of|for|from|in|by)\s+([A-Z][a-z]+(?:\s[A-Z][a-z]+)?)\b")
+_TRAILING = re.compile(r"[\s?.!]+$")
+# "USD 5,000", "Rs. 20000", "5000 INR", "worth 5000"
+_CURRENCY_CODES = {"$": "USD", "US$": "USD", "RS": "NPR", "RS.": "NPR", "NRS": "NPR", "NRS.": "NPR", "₹": "INR",
+                   "€": "EUR", "£": "GBP"}
+_AMOUNT = re.compile(
+    r"(?:(?P<pre>USD|US\$|EUR|GBP|INR|NPR|CNY|NRs\.?|Rs\.?|\$|₹|€|£)\s?(?P<a>\d[\d,]*(?:\.\d+)?)"
+    r"|(?P<b>\d[\d,]*(?:\.\d+)?)\s?(?P<post>USD|EUR|GBP|INR|NPR|CNY|dollars?|rupees?)\b"
+    r"|\b(?:worth|valued? (?:at|of)|invoice value (?:of )?)\s?(?P<c>\d[\d,]*(?:\.\d+)?)"
+    # "invoice value 10000 INR": the currency after a keyword amount belongs to it
+    r"(?:\s?(?P<c_post>USD|EUR|GBP|INR|NPR|CNY|dollars?|rupees?)\b)?)",
+    re.IGNORECASE,
+)
+_INCOTERM = re.compile(r"\b(FOB|CIF|CFR|C&F|EXW|FCA|CPT|CIP|DAP|DDP)\b", re.IGNORECASE)
+_QUANTITY = re.compile(r"\b(\d[\d,]*(?:\.\d+)?)\s?(ltr|litres?|liters?|kg|kgs|sticks|pcs|pieces|units)\b",
+                       re.IGNORECASE)
+_CODE_LABEL = re.compile(r"\b(?:hs|hsn|heading|code|tariff|chapter|commodity|statistics)\b", re.IGNORECASE)
+
+
+def extract_hs_code(text):
+    """
+    First HS code in the text as digits. A bare 4-digit number only counts
+    when the text talks about codes/headings ("duty in 2024" is a year).
+    """
+    labelled = bool(_CODE_LABEL.search(text))
+    for match in _HS_CODE.finditer(text):
+        code = normalise_query(match.group(1))
+        if 1 <= int(code[:2]) <= 97 and (len(code) > 4 or labelled):
+            return code
+    return None
+
+
+def extract_product(text):
+    for pattern in (_PRODUCT, _PRODUCT_ALT):
+        match = pattern.search(_TRAILING.sub("", text.strip()))
+        if match:
+            product = re.sub(r"^(?:a|an|the)\s+", "", match.group("product").strip(), flags=re.IGNORECASE)
+            return product or None
+    return None
+
+
+def guess_product(text):
+    words = [w for w in re.findall(r"[a-z][a-z-]*", text.lower()) if w not in _STOPWORDS]
+    return " ".join(words) or None
+
+
+def extract_country(text):
+    match = _COUNTRY.search(text)
+    return match.group(1) if match else None
+
+
+def extract_value(text):
+    """
+    (amount, currency) of the invoice amount in the text, or (None, None).
+    The first amount with a currency wins; a bare amount ("worth 5000") is
+    taken as NPR only when no amount states its currency.
+    """
+    hs_code = extract_hs_code(text)
+    bare = None
+    for match in _AMOUNT.finditer(text):
+        amount = match.group("a") or match.group("b") or match.group("c")
+        # An HS code is not a value ("duty on 6403.99 worth 5000")
+        if hs_code == re.sub(r"\D", "", amount):
+            continue
+        unit = (match.group("pre") or match.group("post") or match.group("c_post") or "").upper()
+        if unit.startswith("DOLLAR"):
+            unit = "USD"
+        elif unit.startswith("RUPEE"):
+            unit = "NPR"
+        if unit:
+            return float(amount.replace(",", "")), _CURRENCY_CODES.get(unit, unit)
+        if bare is None:
+            bare = float(amount.replace(",", ""))
+    return (bare, "NPR") if bare is not None else (None, None)
+
+
+# ----------------------------- Rules -----------------------------
+# Ordered: the first rule whose pattern matches and whose slots are present wins
+_CALCULATION = re.compile(
+    r"\b(?:calculate|compute|work out|how much (?:duty|tax|vat|customs|will i pay|do i pay)|total (?:duty|duties|tax|"
+    r"taxes)|landed cost)\b",
+    re.IGNORECASE,
+)
+_DUTY = re.compile(r"\b(?:duty|duties|tariff rate|customs rate|import rate|tax rate|rate of duty)\b", re.IGNORECASE)
+_DOCUMENTATION = re.compile(
+    r"\b(?:documentation|documents? required|required documents?|licen[cs]e|certificates?)\b", re.IGNORECASE
+)
+_TRADE_STATS = re.compile(
+    r"\b(?:trade (?:data|statistics|stats|volume|value)|import statistics|export statistics|exports? of|imports? of)\b",
+    re.IGNORECASE,
+)
+_HS_QUESTION = re.compile(
+    r"\b(?:hs|hsn|h\.s\.)\s*(?:code|number|no\.?|classification)\b|\bclassify\b"
+    r"|\b(?:which|what) (?:tariff |commodity )?(?:code|heading)\b",
+    re.IGNORECASE,
+)
+
+RULES = (
+    ("calculation", _CALCULATION),
+    ("duty", _DUTY),
+    ("documentation", _DOCUMENTATION),
+    ("trade_stats", _TRADE_STATS),
+    ("hs_code", _HS_QUESTION),
+)
+# Slots a handler cannot do without; an intent missing one goes to RAG
+REQUIRED_SLOTS = {
+    "calculation": ("hs_code", "value"),
+    "hs_code": ("product",),
+    "duty": ("hs_code",),
+    "documentation": ("hs_code",),
+    "trade_stats": ("hs_code",),
+}
+
+# Example questions for the embedding classifier. They are embedded once with
+# the same MiniLM model used for retrieval; RAG examples keep procedural
+# questions that merely mention duties or codes on the RAG side.
+INTENT_EXAMPLES = {
+    "calculation": [
+        "calculate the duty on 6403.99 worth USD 5000 FOB",
+        "how much tax do I pay on 8517.13 valued at Rs 200000",
+        "total duty and vat for 0902.10 with invoice value 10000 INR",
+    ],
+    "hs_code": [
+        "what is the hs code for leather shoes",
+        "hs code of green tea",
+        "how is a mobile phone classified in the tariff",
+        "which tariff heading covers cotton t-shirts",
+        "find the commodity code for solar panels",
+    ],
+    "duty": [
+        "what is the import duty on 8517.13",
+        "customs duty rate for hs 6403.99",
+        "how much duty do I pay on 0902.10",
+        "tariff rate for code 8541.40",
+    ],
+    "documentation": [
+        "what documents are required to import 6403.99",
+        "licence needed for hs 3004.90",
+        "which certificates do I need for 0902.10",
+    ],
+    "trade_stats": [
+        "trade statistics for 0902 in India",
+        "export value of 6403 from China",
+        "how much 8517 does Nepal import",
+    ],
+    RAG: [
+        "how do I clear goods through customs",
+        "what is a bill of lading",
+        "explain the customs valuation method",
+        "how do I register as an importer",
+        "what is the procedure for duty drawback",
+        "what happens if my shipment is held at customs",
+    ],
+}
+
+
+# ----------------------------- Handlers -----------------------------
+# Each handler returns the final English answer, or None to fall back to RAG.
+# Trade API calls use the routing client: one short attempt, so an API that
+# is down costs at most TRADE_API_ROUTING_TIMEOUT before RAG takes over.
+def handle_calculation(slots):
+    calculator = get_duty_calculator()
+    if calculator.index is None:
+        return None
+    line = {
+        "hs_code": slots["hs_code"], "value": slots["value"], "currency": slots["currency"],
+        "incoterm": slots["incoterm"], "quantity": slots["quantity"], "origin": slots["country"],
+    }
+    # No single tariff line, no exchange rate, no quantity for a specific
+    # duty: the RAG chain can still explain how the duty is worked out
+    if calculator.calculate(line)["error"]:
+        return None
+    return calculator.explain(line)
+
+
+def handle_hs_code(slots):
+    index = get_tariff_index()
+    if index is not None:
+        lines = index.search(slots["product"], limit=3)
+        if lines:
+            return f"HS codes for {slots['product']} in the Customs Tariff:\n" + "\n".join(
+                index.describe(line) for line in lines
+            )
+    answer = get_hs_code(slots["product"], client=get_routing_client())
+    return None if answer.startswith(("Error", "No HS code")) else answer
+
+
+def handle_duty(slots):
+    index = get_tariff_index()
+    if index is not None:
+        lines = index.lookup(slots["hs_code"], limit=5)
+        if lines:
+            return "\n".join(index.describe(line) for line in lines)
+    answer = get_tariff_info(None, ROUTER_DEFAULT_COUNTRY, slots["hs_code"], client=get_routing_client())
+    return None if answer.startswith(("Error", "No tariff")) else answer
+
+
+def handle_documentation(slots):
+    answer = get_eu_doc_requirements(slots["hs_code"], client=get_routing_client())
+    return None if answer.startswith(("Error", "No documentation")) else answer
+
+
+def handle_trade_stats(slots):
+    country = slots.get("country") or ROUTER_DEFAULT_COUNTRY
+    data = get_trade_statistics(country, slots["hs_code"], client=get_routing_client())
+    if isinstance(data, str):
+        return None
+    return format_trade_statistics(country, slots["hs_code"], data)
+
+
+HANDLERS = {
+    "calculation": handle_calculation,
+    "hs_code": handle_hs_code,
+    "duty": handle_duty,
+    "documentation": handle_documentation,
+    "trade_stats": handle_trade_stats,
+}
+
+
+# ----------------------------- Router -----------------------------
+class IntentRouter:
+    """
+    Sends questions that a structured lookup can answer (HS code for a
+    product, duty on a code, required documents, trade statistics) to that
+    lookup instead of retrieval + LLM generation.
+
+    classify() tries the keyword rules first (compiled regexes, a few
+    microseconds). When no rule fires and `embed` is given, it compares the
+    question vector with the intent examples and then fills the slots the
+    nearest intent needs (an hs_code question without a known product gets
+    its product guessed from the wording); `embed` is the app's cached query
+    embedder, so the vector is reused by retrieval when the question goes
+    on to the RAG chain anyway.
+    """
+
+    def __init__(self, embed=None, embed_documents=None, mode=INTENT_ROUTER, min_similarity=ROUTER_MIN_SIMILARITY):
+        self.embed = embed
+        self.embed_documents = embed_documents
+        self.mode = mode
+        self.min_similarity = min_similarity
+        self.counts = {}
+        self._examples = None    # (labels, unit-norm example matrix)
+        self._lock = threading.Lock()
+
+    def slots(self, text):
+        value, currency = extract_value(text)
+        incoterm = _INCOTERM.search(text)
+        quantity = _QUANTITY.search(text)
+        return {
+            "hs_code": extract_hs_code(text),
+            "product": extract_product(text),
+            "country": extract_country(text),
+            "value": value,
+            "currency": currency,
+            "incoterm": incoterm.group(1).upper() if incoterm else None,
+            "quantity": float(quantity.group(1).replace(",", "")) if quantity else None,
+        }
+
+    def _rule_intent(self, text, slots):
+        for intent, pattern in RULES:
+            if pattern.search(text) and all(slots[s] for s in REQUIRED_SLOTS[intent]):
+                return intent
+        return None
+
+    def _example_matrix(self):
+        with self._lock:
+            if self._examples is None:
+                labels = [intent for intent, examples in INTENT_EXAMPLES.items() for _ in examples]
+                texts = [example for examples in INTENT_EXAMPLES.values() for example in examples]
+                matrix = np.asarray(self.embed_documents(texts), dtype=np.float32)
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                self._examples = (labels, matrix)
+            return self._examples
+
+    def _nearest_intent(self, text):
+        labels, matrix = self._example_matrix()
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        scores = matrix @ (vector / np.linalg.norm(vector))
+        best = int(np.argmax(scores))
+        return labels[best], float(scores[best])
+
+    def classify(self, text):
+        """
+        Returns (intent, slots, method) with method "rules", "embedding" or
+        None; intent is "rag" when nothing structured applies.
+        """
+        slots = self.slots(text)
+        if self.mode == "off":
+            return RAG, slots, None
+        intent = self._rule_intent(text, slots)
+        if intent:
+            return intent, slots, "rules"
+        if self.mode == "full" and self.embed is not None and self.embed_documents is not None:
+            intent, score = self._nearest_intent(text)
+            if intent == "hs_code" and not slots["product"]:
+                slots["product"] = guess_product(text)
+            if intent != RAG and score >= self.min_similarity and all(slots[s] for s in REQUIRED_SLOTS[intent]):
+                return intent, slots, "embedding"
+        return RAG, slots, None
+
+    def route(self, text):
+        """
+        The structured answer for `text`, or None when it should go to the
+        RAG chain (no intent, or the lookup came back empty/failed).
+        """
+        intent, slots, method = self.classify(text)
+        answer = HANDLERS[intent](slots) if intent != RAG else None
+        key = f"{intent}:{method}" if answer is not None else RAG
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+        return answer
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
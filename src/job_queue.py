@@ -0,0 +1,412 @@
+"""
+Background processing for document uploads.
+
+/upload keeps the HTTP request open through extraction/OCR, two LLM calls
+and translation. POST /jobs/upload instead stores the file in a local
+SQLite queue and answers 202 with a job ID at once; a pool of worker threads
+(JOB_WORKERS per server process) processes the jobs, recording each finished
+stage as progress, and GET /jobs/<job_id> returns the status and, when done,
+the same body /upload would have returned.
+
+Jobs are keyed by the SHA-256 of the file contents: uploading a document
+that is already queued, running or done (within JOB_RESULT_TTL) returns
+that job instead of processing it again. The cached result is shared, so
+the analysis only enters the chat history of the session that uploaded it
+first.
+
+Every server process (and `python -m src.job_queue worker`) can claim jobs
+from the same database. A claim is a lease that the worker renews while the
+job runs (every JOB_LEASE_SECONDS / 3, and after each stage); a job whose
+worker died is picked up again once its lease expires. The attempt number
+identifies the claim: progress, results and failures from a worker whose
+claim has been taken over are ignored. A failed job is retried until it has
+been attempted JOB_MAX_ATTEMPTS times.
+
+    python -m src.job_queue worker --workers 4   # workers without a web server
+    python -m src.job_queue stats
+    python -m src.job_queue purge
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+from dotenv import load_dotenv
+
+from src.metrics import metrics, Counter, start_trace, finish_trace
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join("artifacts", "jobs.sqlite3"))
+# Worker threads per server process; 0 leaves the jobs to `python -m src.job_queue worker`
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# A running job whose worker has not renewed its lease for this long is claimed again
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# Finished jobs (and their cached results) are kept this long
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "86400"))
+# How often an idle worker looks for jobs enqueued by other processes
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+# How often expired results are deleted
+JOB_PURGE_INTERVAL = float(os.getenv("JOB_PURGE_INTERVAL", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+JOBS = metrics.add(Counter(
+    "customs_jobs_total",
+    "Upload jobs by outcome (enqueued, deduplicated, done, retried, failed, stale: claim taken over).",
+    ("outcome",),
+))
+
+_COLUMNS = (
+    "id", "content_hash", "filename", "ext", "session_id", "status", "progress", "result", "error",
+    "attempts", "created_at", "started_at", "finished_at", "lease_until",
+)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# ----------------------------- Queue -----------------------------
+class JobQueue:
+    """
+    Upload jobs in SQLite, shared by every process on the host. Files are
+    kept in their own table until the job finishes, so listing and polling
+    jobs never reads them.
+    """
+
+    def __init__(self, path=JOB_DB_PATH, lease_seconds=JOB_LEASE_SECONDS,
+                 max_attempts=JOB_MAX_ATTEMPTS, result_ttl=JOB_RESULT_TTL):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit mode: enqueue and claim open their own BEGIN IMMEDIATE
+        # transactions so two processes can never take the same job
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, content_hash TEXT NOT NULL, filename TEXT, ext TEXT NOT NULL,"
+            " session_id TEXT, status TEXT NOT NULL, progress TEXT NOT NULL DEFAULT '{}', result TEXT,"
+            " error TEXT, attempts INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL,"
+            " started_at REAL, finished_at REAL, lease_until REAL);"
+            "CREATE TABLE IF NOT EXISTS job_files (job_id TEXT PRIMARY KEY, data BLOB NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS jobs_hash ON jobs (content_hash, status);"
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);"
+        )
+        self._lock = threading.Lock()
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                value = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return value
+
+    def enqueue(self, data, ext, filename=None, session_id=None):
+        """
+        Returns (job, created). An unfinished or recently finished job for
+        the same file contents is returned as it is, with created=False.
+        """
+        digest = content_hash(data)
+        now = time.time()
+
+        def _enqueue(conn):
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE content_hash = ? AND ext = ?"
+                " AND (status IN (?, ?) OR (status = ? AND finished_at > ?))"
+                " ORDER BY created_at DESC LIMIT 1",
+                (digest, ext, QUEUED, RUNNING, DONE, now - self.result_ttl),
+            ).fetchone()
+            if row is not None:
+                return row, False
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, content_hash, filename, ext, session_id, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, digest, filename, ext, session_id, QUEUED, now),
+            )
+            conn.execute("INSERT INTO job_files (job_id, data) VALUES (?, ?)", (job_id, data))
+            return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone(), True
+
+        row, created = self._transaction(_enqueue)
+        JOBS.inc(outcome="enqueued" if created else "deduplicated")
+        return _job_dict(row), created
+
+    def claim(self):
+        """
+        Take the oldest queued job (or one whose worker's lease expired).
+        Returns (job, file data), or (None, None) when there is nothing to do.
+        """
+        now = time.time()
+
+        def _claim(conn):
+            # Jobs abandoned by a dead worker too often are not tried again
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL"
+                " WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Worker stopped while processing the job", now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None, None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?,"
+                " progress = '{}' WHERE id = ?",
+                (RUNNING, now, now + self.lease_seconds, row["id"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            data = conn.execute("SELECT data FROM job_files WHERE job_id = ?", (row["id"],)).fetchone()
+            return job, data
+
+        job, data = self._transaction(_claim)
+        if job is None:
+            return None, None
+        job = _job_dict(job)
+        if data is None:
+            # The file is gone (purged under a worker that died); nothing left to process
+            self.fail(job, "Uploaded file is no longer available", retry=False)
+            return None, None
+        return job, data["data"]
+
+    # The methods below take the job as returned by claim(). Its attempt
+    # number is the claim: once the lease has expired and another worker
+    # has claimed the job, they change nothing and return False/None.
+    def _update_claimed(self, job, assignments, params):
+        return self._conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND attempts = ?",
+            (*params, job["id"], RUNNING, job["attempts"]),
+        ).rowcount == 1
+
+    def renew(self, job):
+        """Extend the lease. False when the claim has been lost."""
+        with self._lock:
+            return self._update_claimed(job, "lease_until = ?", (time.time() + self.lease_seconds,))
+
+    def update_progress(self, job, progress):
+        """Store the progress so far and renew the lease. False when the claim has been lost."""
+        with self._lock:
+            return self._update_claimed(
+                job, "progress = ?, lease_until = ?", (json.dumps(progress), time.time() + self.lease_seconds)
+            )
+
+    def complete(self, job, result):
+        """Store the result. False (result dropped) when the claim has been lost."""
+        def _complete(conn):
+            if not self._update_claimed(
+                job, "status = ?, result = ?, error = NULL, finished_at = ?, lease_until = NULL",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time()),
+            ):
+                return False
+            conn.execute("DELETE FROM job_files WHERE job_id = ?", (job["id"],))
+            return True
+
+        completed = self._transaction(_complete)
+        JOBS.inc(outcome=DONE if completed else "stale")
+        return completed
+
+    def fail(self, job, error, retry=True):
+        """
+        Queue the job again while it has attempts left, otherwise mark it
+        failed. Returns "retried", "failed", or None when the claim has been lost.
+        """
+        def _fail(conn):
+            if retry and job["attempts"] < self.max_attempts:
+                if self._update_claimed(job, "status = ?, error = ?, lease_until = NULL", (QUEUED, str(error))):
+                    return "retried"
+                return None
+            if not self._update_claimed(
+                job, "status = ?, error = ?, finished_at = ?, lease_until = NULL", (FAILED, str(error), time.time())
+            ):
+                return None
+            conn.execute("DELETE FROM job_files WHERE job_id = ?", (job["id"],))
+            return FAILED
+
+        outcome = self._transaction(_fail)
+        JOBS.inc(outcome=outcome or "stale")
+        return outcome
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row is not None else None
+
+    def purge(self):
+        """Delete finished jobs older than result_ttl. Returns how many were removed."""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+            ).rowcount
+            self._conn.execute("DELETE FROM job_files WHERE job_id NOT IN (SELECT id FROM jobs)")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+
+def _job_dict(row):
+    job = {name: row[name] for name in _COLUMNS}
+    job["progress"] = json.loads(job["progress"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+
+def public_job(job):
+    """The fields a client polling GET /jobs/<job_id> sees."""
+    body = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "filename": job["filename"],
+        "progress": job["progress"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+    }
+    if job["status"] == DONE:
+        body["result"] = job["result"]
+    if job["error"]:
+        body["error"] = job["error"]
+    return body
+
+
+# ----------------------------- Workers -----------------------------
+class JobWorkerPool:
+    """
+    Daemon threads that claim jobs and run `handler(job, data, on_stage)`.
+    The handler calls on_stage(name, ms) after each stage and returns the
+    result body. notify() wakes an idle worker at once when this process
+    enqueues; jobs from other processes are found within JOB_POLL_INTERVAL.
+    """
+
+    def __init__(self, queue, handler, workers=JOB_WORKERS, stages=(), poll_interval=JOB_POLL_INTERVAL):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        # Stage names the handler reports, so progress can say how far along a job is
+        self.stages = tuple(stages)
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._last_purge = time.monotonic()
+
+    def start(self):
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            job, data = self.queue.claim()
+            if job is None:
+                if time.monotonic() - self._last_purge > JOB_PURGE_INTERVAL:
+                    self._last_purge = time.monotonic()
+                    self.queue.purge()
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.process(job, data)
+
+    def _heartbeat(self, job, done):
+        # Keeps the lease through a long stage (OCR of a large scan) until `done` is set
+        interval = self.queue.lease_seconds / 3
+        while not done.wait(interval):
+            if not self.queue.renew(job):
+                print(f"⚠️ Job {job['id']}: lease lost, another worker has claimed it")
+                return
+
+    def process(self, job, data):
+        progress = {"completed": [], "total": len(self.stages), "timings": {}}
+
+        def on_stage(name, ms):
+            progress["completed"].append(name)
+            progress["timings"][f"{name}_ms"] = ms
+            self.queue.update_progress(job, progress)
+
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, done), name=f"job-lease-{job['id']}", daemon=True).start()
+
+        print(f"⚙️ Job {job['id']} ({job['filename']}), attempt {job['attempts']}")
+        # Traced like a request, so the stages feed /metrics and the slow-request log
+        trace, token = start_trace("job:upload")
+        try:
+            result = self.handler(job, data, on_stage)
+        except Exception as e:
+            print(f"❌ Job {job['id']} failed:", e)
+            finish_trace(trace, token, 500)
+            if self.queue.fail(job, e) is None:
+                print(f"⚠️ Job {job['id']}: claim lost, failure ignored")
+        else:
+            finish_trace(trace, token, 200)
+            if not self.queue.complete(job, result):
+                print(f"⚠️ Job {job['id']}: claim lost, result dropped")
+        finally:
+            done.set()
+
+    def stats(self):
+        return {"workers": sum(t.is_alive() for t in self._threads), **self.queue.stats()}
+
+
+# ----------------------------- CLI -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload job queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="process queued uploads without a web server")
+    worker.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="worker threads")
+    sub.add_parser("stats", help="jobs by status")
+    sub.add_parser("purge", help="delete finished jobs older than JOB_RESULT_TTL")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue()
+    if args.command == "stats":
+        print(json.dumps(queue.stats()))
+    elif args.command == "purge":
+        print(f"🧹 Removed {queue.purge()} finished jobs")
+    else:
+        # The app module is the composition root: same resources and pipeline as the servers
+        from app import run_upload_job, UPLOAD_JOB_STAGES
+
+        pool = JobWorkerPool(queue, run_upload_job, workers=args.workers, stages=UPLOAD_JOB_STAGES).start()
+        print(f"⚙️ {args.workers} job workers on {JOB_DB_PATH}")
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            pool.stop()
+
+
+if __name__ == "__main__":
+    main()
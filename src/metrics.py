@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import random
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+# Requests slower than this are candidates for the slow-request log
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "2.0"))
+# Fraction of slow requests written to the log (1.0 = all of them)
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "1.0"))
+SLOW_REQUEST_LOG = os.getenv("SLOW_REQUEST_LOG", os.path.join("logs", "slow_requests.jsonl"))
+
+# Seconds; spans from a cached embedding (~10us) up to a long LLM answer
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ----------------------------- Metric Types -----------------------------
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus data model. observe() is
+    a bisect plus three additions under a lock, cheap enough for every span.
+    """
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        """{labels: {"count", "sum", "buckets": [(le, cumulative count)]}}"""
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        result = {}
+        for key, values in series.items():
+            cumulative, buckets = 0, []
+            for le, count in zip(self.buckets + (float("inf"),), values[:-1]):
+                cumulative += count
+                buckets.append((le, cumulative))
+            result[key] = {"count": cumulative, "sum": values[-1], "buckets": buckets}
+        return result
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(self.snapshot().items()):
+            for le, count in data["buckets"]:
+                bound = "+Inf" if le == float("inf") else f"{le:g}"
+                labels = _label_text(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {data['sum']:.6f}")
+            lines.append(f"{self.name}_count{labels} {data['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+REQUEST_SECONDS = metrics.add(Histogram(
+    "customs_request_duration_seconds", "Request latency by route and status.", ("route", "status")
+))
+STAGE_SECONDS = metrics.add(Histogram(
+    "customs_stage_duration_seconds",
+    "Latency of one pipeline stage (language detection, translation, embedding, vector search, LLM, extraction).",
+    ("stage",),
+))
+STAGE_ERRORS = metrics.add(Counter("customs_stage_errors_total", "Stages that raised.", ("stage",)))
+SLOW_REQUESTS = metrics.add(Counter("customs_slow_requests_total", "Requests over SLOW_REQUEST_SECONDS.", ("route",)))
+CONTEXT_TOKENS = metrics.add(Counter(
+    "customs_context_tokens_total", "Estimated context tokens retrieved and actually sent to the LLM.", ("kind",)
+))
+
+
+# ----------------------------- Request Tracing -----------------------------
+class Trace:
+    """Spans of one request: [(stage, start offset s, duration s)]."""
+
+    def __init__(self, route):
+        self.route = route
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, start, seconds):
+        with self._lock:
+            self.spans.append((stage, round(start - self.start, 6), round(seconds, 6)))
+
+    def to_dict(self, status, seconds):
+        with self._lock:
+            spans = [{"stage": s, "offset_ms": round(o * 1000, 2), "ms": round(d * 1000, 2)} for s, o, d in self.spans]
+        return {
+            "time": self.started_at,
+            "route": self.route,
+            "status": status,
+            "ms": round(seconds * 1000, 2),
+            "spans": spans,
+        }
+
+
+_current = contextvars.ContextVar("customs_trace", default=None)
+_log_lock = threading.Lock()
+# fn(stage, seconds) called for every recorded stage, e.g. by the benchmark to keep raw samples
+stage_listeners = []
+
+
+def current_trace():
+    return _current.get()
+
+
+def start_trace(route):
+    """
+    Begin tracing a request; returns (trace, token) for finish_trace().
+    Spans recorded in this context (and in asyncio.to_thread calls, which
+    copy it) are attached to the trace.
+    """
+    trace = Trace(route)
+    return trace, _current.set(trace)
+
+
+def finish_trace(trace, token, status):
+    seconds = time.perf_counter() - trace.start
+    try:
+        _current.reset(token)
+    except (ValueError, RuntimeError):
+        # Finished from another context (end of a streamed body); nothing to restore
+        pass
+    REQUEST_SECONDS.observe(seconds, route=trace.route, status=str(status))
+    if seconds >= SLOW_REQUEST_SECONDS:
+        SLOW_REQUESTS.inc(route=trace.route)
+        if random.random() < SLOW_REQUEST_SAMPLE_RATE:
+            _log_slow_request(trace.to_dict(status, seconds))
+    return seconds
+
+
+def _log_slow_request(entry):
+    line = json.dumps(entry, ensure_ascii=False)
+    with _log_lock:
+        os.makedirs(os.path.dirname(SLOW_REQUEST_LOG) or ".", exist_ok=True)
+        with open(SLOW_REQUEST_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def record(stage, seconds, start=None):
+    """Record an already measured stage (e.g. time to first token)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for listener in stage_listeners:
+        listener(stage, seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, start if start is not None else time.perf_counter() - seconds, seconds)
+
+
+@contextmanager
+def stage(name):
+    """
+    Time a block as pipeline stage `name`:
+
+        with stage("vector_search"):
+            docs = retriever.invoke(question)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        record(name, time.perf_counter() - start, start)
+
+
+def timed_stream(tokens, first_token_stage, total_stage):
+    """
+    Pass a token iterator through, recording the time to its first token
+    and the time until it is exhausted.
+    """
+    start = time.perf_counter()
+    first = True
+    for token in tokens:
+        if first:
+            record(first_token_stage, time.perf_counter() - start, start)
+            first = False
+        yield token
+    record(total_stage, time.perf_counter() - start, start)
+
+
+async def atimed_stream(tokens, first_token_stage, total_stage):
+    start = time.perf_counter()
+    first = True
+    async for token in tokens:
+        if first:
+            record(first_token_stage, time.perf_counter() - start, start)
+            first = False
+        yield token
+    record(total_stage, time.perf_counter() - start, start)
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the trade APIs used by src/trade_api_integration.py.
+
+    with MockTradeApi(latency=0.05) as mock:
+        set_client(TradeApiClient(base_urls=mock.base_urls))
+        get_hs_code("leather shoes")
+        assert mock.hits["/v1/hslookup"] == 1
+
+Serves canned JSON in the shape of each real endpoint from a background
+thread. It counts the requests per path, can add latency, and can fail
+the first N requests with a status code to exercise retries. Also runs
+standalone: python -m src.mock_trade_api --port 8765
+"""
+import re
+import json
+import time
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+HS_LOOKUPS = {
+    "leather shoes": [{"hs_code": "6403.99", "description": "Other footwear with uppers of leather"}],
+    "mobile phone": [{"hs_code": "8517.13", "description": "Smartphones"}],
+    "green tea": [{"hs_code": "0902.10", "description": "Green tea in packings not exceeding 3 kg"}],
+}
+
+
+def _hs_lookup(path, query):
+    return HS_LOOKUPS.get(" ".join(query.get("query", [""])[0].lower().split()), [])
+
+
+def _tariff(path, query):
+    code = re.search(r"/commodities/(\d+)\.json", path).group(1)
+    return {"data": {"id": code, "attributes": {"goods_nomenclature_item_id": code,
+                                                "description": f"Mock commodity {code}"}}}
+
+
+def _trade_stats(path, query):
+    return {"data": [{"reporterCode": query.get("reporter", [""])[0], "cmdCode": query.get("cmdCode", [""])[0],
+                      "primaryValue": 1234567.0, "period": "2023"}]}
+
+
+def _eu_docs(path, query):
+    return {"measures": [{"measure_type": "Third country duty"}, {"measure_type": "Certificate of origin"}]}
+
+
+ROUTES = [
+    (re.compile(r"^/v1/hslookup$"), _hs_lookup),
+    (re.compile(r"^/commodities/\d+\.json$"), _tariff),
+    (re.compile(r"^/public/v1/preview$"), _trade_stats),
+    (re.compile(r"^/api/commodities/\d+$"), _eu_docs),
+]
+
+
+class MockTradeApi:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, fail_first=0, fail_status=503):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.hits = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_urls(self):
+        return {api: self.url for api in ("api_ninjas", "uk_tariff", "comtrade", "taric")}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with mock._lock:
+                    mock.hits[parsed.path] += 1
+                    failing = mock.fail_first > 0
+                    if failing:
+                        mock.fail_first -= 1
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if failing:
+                    return self._send(mock.fail_status, {"error": "injected failure"})
+                for pattern, handler in ROUTES:
+                    if pattern.match(parsed.path):
+                        return self._send(200, handler(parsed.path, parse_qs(parsed.query)))
+                self._send(404, {"error": "not found"})
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve mock trade API responses locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args(argv)
+
+    mock = MockTradeApi(port=args.port, latency=args.latency)
+    print(f"🧪 Mock trade API on {mock.url} (set API_NINJAS_BASE_URL, UK_TARIFF_BASE_URL, "
+          "COMTRADE_BASE_URL and TARIC_BASE_URL to it)")
+    try:
+        mock._server.serve_forever()
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import time
+import asyncio
+import inspect
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# ----------------------------- DAG Stages -----------------------------
+class Stage:
+    """
+    One step of a pipeline. `fn` is called with the results of `deps` as
+    keyword arguments, e.g. Stage("translate", fn, deps=("verification",))
+    calls fn(verification=<result of the verification stage>).
+    """
+
+    def __init__(self, name, fn, deps=()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+
+
+class StageError(Exception):
+    def __init__(self, stage, error):
+        super().__init__(f"Stage '{stage}' failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+def _check_graph(stages):
+    names = {s.name for s in stages}
+    if len(names) != len(stages):
+        raise ValueError("Duplicate stage names")
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown stages {missing}")
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+# ----------------------------- Thread Executor -----------------------------
+def run_dag(stages, max_workers=None, on_stage=None):
+    """
+    Run stages as soon as their dependencies are done, independent ones in
+    parallel on a thread pool (the stages here are network bound: LLM and
+    translation calls).
+
+    Returns (results, timings) where timings maps each stage to its wall-clock
+    milliseconds, plus "total_ms" for the whole graph. `on_stage(name, ms)`
+    is called as each stage finishes (progress reporting for upload jobs).
+    """
+    _check_graph(stages)
+    pending = {s.name: s for s in stages}
+    results = {}
+    timings = {}
+    start = time.perf_counter()
+
+    def _timed(stage, kwargs):
+        t = time.perf_counter()
+        value = stage.fn(**kwargs)
+        return value, time.perf_counter() - t
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(stages)) as pool:
+        running = {}
+        while pending or running:
+            for stage in [s for s in pending.values() if all(d in results for d in s.deps)]:
+                del pending[stage.name]
+                kwargs = {d: results[d] for d in stage.deps}
+                # Copy the context so per-request tracing follows the stage onto the pool thread
+                running[pool.submit(contextvars.copy_context().run, _timed, stage, kwargs)] = stage
+            if not running:
+                raise ValueError(f"Dependency cycle between stages {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    value, elapsed = future.result()
+                except Exception as e:
+                    for other in running:
+                        other.cancel()
+                    raise StageError(stage.name, e) from e
+                results[stage.name] = value
+                timings[f"{stage.name}_ms"] = _ms(elapsed)
+                if on_stage is not None:
+                    on_stage(stage.name, timings[f"{stage.name}_ms"])
+
+    timings["total_ms"] = _ms(time.perf_counter() - start)
+    return results, timings
+
+
+# ----------------------------- Asyncio Executor -----------------------------
+async def arun_dag(stages):
+    """
+    Asyncio version of run_dag. Stage functions may be coroutines (awaited
+    directly) or plain functions (run in the default thread pool).
+    """
+    _check_graph(stages)
+    pending = {s.name: s for s in stages}
+    results = {}
+    timings = {}
+    start = time.perf_counter()
+
+    async def _timed(stage, kwargs):
+        t = time.perf_counter()
+        if inspect.iscoroutinefunction(stage.fn):
+            value = await stage.fn(**kwargs)
+        else:
+            value = await asyncio.to_thread(stage.fn, **kwargs)
+        return value, time.perf_counter() - t
+
+    running = {}
+    try:
+        while pending or running:
+            for stage in [s for s in pending.values() if all(d in results for d in s.deps)]:
+                del pending[stage.name]
+                kwargs = {d: results[d] for d in stage.deps}
+                running[asyncio.ensure_future(_timed(stage, kwargs))] = stage
+            if not running:
+                raise ValueError(f"Dependency cycle between stages {sorted(pending)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                stage = running.pop(task)
+                try:
+                    value, elapsed = task.result()
+                except Exception as e:
+                    raise StageError(stage.name, e) from e
+                results[stage.name] = value
+                timings[f"{stage.name}_ms"] = _ms(elapsed)
+    finally:
+        for task in running:
+            task.cancel()
+
+    timings["total_ms"] = _ms(time.perf_counter() - start)
+    return results, timings
@@ -0,0 +1,209 @@
+import re
+
+from src.prompt import build_verification_prompt, VERIFICATION_WINDOW
+
+
+# ----------------------------- Field Extractors -----------------------------
+# Deterministic first pass over an uploaded document. Everything here is a
+# compiled regex so a 3000-character window is scanned in well under a
+# millisecond; only documents that are not clear-cut go to the LLM.
+
+_HS_LABEL = re.compile(r"\b(?:hs|hsn|h\.s\.|tariff|commodity)\s*(?:code|no\.?|number|heading)?\b", re.IGNORECASE)
+_CODE_TOKEN = re.compile(r"(?<![\d.,])(\d{4}(?:[.\s]?\d{2}){0,3})(?![\d,]|\.\d)")
+# Outside a labelled line only the full dotted form is unambiguous ("1500.00" is money)
+_DOTTED_CODE = re.compile(r"(?<![\d.,])(\d{4}\.\d{2}\.\d{2,4})(?![\d,]|\.\d)")
+# Rows of a table under an "HS Code" header; "xxxx.00" there is almost always a price
+_TABLE_CODE = re.compile(r"(?<![\d.,])(\d{4}\.(?!00\b)\d{2}(?:\.\d{2,4})?)(?![\d,]|\.\d)")
+HS_TABLE_ROWS = 30
+_PRICE_PREFIX = re.compile(r"(?:USD|US\$|EUR|GBP|INR|NPR|Rs\.?|\$|€|£|₹)\s?$", re.IGNORECASE)
+
+INCOTERMS = ("EXW", "FCA", "FAS", "FOB", "CFR", "CIF", "CPT", "CIP", "DAP", "DPU", "DDP", "DAT", "DDU", "C&F")
+_INCOTERM = re.compile(r"(?<![A-Za-z])(" + "|".join(re.escape(t) for t in INCOTERMS) + r")(?![A-Za-z])")
+
+_CURRENCY = r"(?:USD|US\$|EUR|GBP|INR|NPR|CNY|RMB|JPY|AED|Rs\.?|NRs\.?|\$|€|£|₹|रु\.?)"
+_NUMBER = r"\d{1,3}(?:[,\s]\d{2,3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?"
+_AMOUNT = re.compile(
+    rf"(?:{_CURRENCY}\s?({_NUMBER}))|(?:({_NUMBER})\s?{_CURRENCY}(?![A-Za-z]))", re.IGNORECASE
+)
+_QUANTITY = re.compile(
+    r"\b(?:qty|quantity|no\. of (?:packages|cartons)|\d+\s*(?:pcs|pieces|units|nos|kgs?|cartons|ctns|"
+    r"packages|pkgs|bags|sets|pairs|mt|tons?))\b",
+    re.IGNORECASE,
+)
+_DESCRIPTION = re.compile(
+    r"\b(?:description(?: of goods)?|commodity|goods|item|product|particulars|marks and numbers)\b", re.IGNORECASE
+)
+_EXPORTER = re.compile(r"\b(?:exporter|shipper|seller|consignor|supplier|beneficiary)\b", re.IGNORECASE)
+_IMPORTER = re.compile(r"\b(?:importer|consignee|buyer|notify party|bill to|sold to)\b", re.IGNORECASE)
+_ORIGIN = re.compile(r"\b(?:country of origin|origin|made in|manufactured in)\b\s*[:\-]?\s*([A-Z][A-Za-z .]{2,30})?")
+
+# Major trading partners of Nepal/India plus the usual origin countries
+COUNTRIES = (
+    "Afghanistan", "Australia", "Bangladesh", "Belgium", "Bhutan", "Brazil", "Canada", "China", "Denmark",
+    "Egypt", "France", "Germany", "Hong Kong", "India", "Indonesia", "Iran", "Israel", "Italy", "Japan",
+    "Kenya", "Korea", "Kuwait", "Malaysia", "Maldives", "Mexico", "Myanmar", "Nepal", "Netherlands",
+    "New Zealand", "Nigeria", "Norway", "Oman", "Pakistan", "Philippines", "Poland", "Qatar", "Russia",
+    "Saudi Arabia", "Singapore", "South Africa", "Spain", "Sri Lanka", "Sweden", "Switzerland", "Taiwan",
+    "Thailand", "Turkey", "United Arab Emirates", "UAE", "United Kingdom", "UK", "United States", "USA",
+    "Vietnam",
+)
+_COUNTRY = re.compile(r"\b(" + "|".join(re.escape(c) for c in COUNTRIES) + r")\b")
+
+DOCUMENT_MARKERS = {
+    "Invoice": re.compile(r"\b(?:commercial|proforma|pro-forma|tax|customs)?\s*invoice\b", re.IGNORECASE),
+    "Bill of Lading": re.compile(
+        r"\b(?:bill of lading|b/l\b|airway bill|air waybill|awb\b|port of loading|port of discharge)", re.IGNORECASE
+    ),
+    "Customs Declaration": re.compile(
+        r"\b(?:customs declaration|bill of entry|shipping bill|declaration no|pragyapan patra|"
+        r"single administrative document|sad\b)", re.IGNORECASE
+    ),
+    "Packing List": re.compile(r"\b(?:packing list|gross weight|net weight)\b", re.IGNORECASE),
+}
+
+# Fields the verification prompt asks for; "value" is satisfied by an amount
+ESSENTIAL_FIELDS = ("hs_codes", "description", "origin", "quantity", "value", "parties")
+ESSENTIAL_LABELS = {
+    "hs_codes": "HS Code",
+    "description": "Product Description",
+    "origin": "Country of Origin",
+    "quantity": "Quantity",
+    "value": "Value",
+    "parties": "Exporter/Importer Details",
+}
+
+MIN_DOCUMENT_CHARS = 40
+
+
+def _unique(items):
+    return list(dict.fromkeys(items))
+
+
+def _codes(pattern, line):
+    # Skip numbers written right after a currency: those are prices
+    return [
+        m.group(1) for m in pattern.finditer(line)
+        if not _PRICE_PREFIX.search(line[max(0, m.start() - 5):m.start()])
+    ]
+
+
+def extract_hs_codes(text):
+    """
+    HS codes as digit strings. Any 4-10 digit code on a line labelled HS/
+    tariff/commodity code (and the line after it), dotted codes ("8504.40")
+    in the table rows below such a label, and fully dotted codes
+    ("8517.12.00") anywhere.
+    """
+    codes = []
+    lines = text.splitlines()
+    table_rows = 0
+    for i, line in enumerate(lines):
+        if _HS_LABEL.search(line):
+            window = line + " " + (lines[i + 1] if i + 1 < len(lines) else "")
+            codes.extend(_codes(_CODE_TOKEN, window))
+            table_rows = HS_TABLE_ROWS
+        elif table_rows:
+            table_rows -= 1
+            codes.extend(_codes(_TABLE_CODE, line))
+        codes.extend(_codes(_DOTTED_CODE, line))
+    digits = (re.sub(r"\D", "", c) for c in codes)
+    return _unique(d for d in digits if 1 <= int(d[:2]) <= 97)
+
+
+def extract_fields(text):
+    """
+    Structured fields found in the document text.
+    """
+    origin_labels = [m.group(1).strip() for m in _ORIGIN.finditer(text) if m.group(1)]
+    return {
+        "document_types": [name for name, marker in DOCUMENT_MARKERS.items() if marker.search(text)],
+        "hs_codes": extract_hs_codes(text),
+        "incoterms": _unique(m.group(1).upper() for m in _INCOTERM.finditer(text)),
+        "amounts": _unique(m.group(0).strip() for m in _AMOUNT.finditer(text))[:10],
+        "countries": _unique(origin_labels + _COUNTRY.findall(text))[:10],
+        "has_origin": bool(_ORIGIN.search(text)),
+        "has_quantity": bool(_QUANTITY.search(text)),
+        "has_description": bool(_DESCRIPTION.search(text)),
+        "has_exporter": bool(_EXPORTER.search(text)),
+        "has_importer": bool(_IMPORTER.search(text)),
+    }
+
+
+def missing_fields(fields):
+    present = {
+        "hs_codes": bool(fields["hs_codes"]),
+        "description": fields["has_description"],
+        "origin": fields["has_origin"] or bool(fields["countries"]),
+        "quantity": fields["has_quantity"],
+        "value": bool(fields["amounts"]),
+        "parties": fields["has_exporter"] or fields["has_importer"],
+    }
+    return [name for name in ESSENTIAL_FIELDS if not present[name]]
+
+
+# ----------------------------- Decision -----------------------------
+def _rejection(document_type, reason, missing):
+    # Same format the LLM is asked for, so the UI and batch reports need no special case
+    return (
+        f"📄 Document Type: {document_type}\n"
+        "📋 Document Status: ❌ Incorrect\n"
+        f"🔍 Verification Result: ❌ Invalid: {reason}\n"
+        "💡 Missing or Suspicious Details (if any): "
+        + (", ".join(ESSENTIAL_LABELS[m] for m in missing) or "None")
+    )
+
+
+def pre_verify(text):
+    """
+    Returns {"fields", "missing", "decision", "response"}.
+
+    decision is "reject" when the text is clearly not a usable customs
+    document: too little text, or no document-type marker and at most one
+    essential field. `response` then holds the final verification answer.
+    Everything else is "llm" and goes to the model with `fields` attached.
+    """
+    fields = extract_fields(text)
+    missing = missing_fields(fields)
+    found = len(ESSENTIAL_FIELDS) - len(missing)
+    document_type = fields["document_types"][0] if fields["document_types"] else "Unknown"
+
+    response = None
+    if len(text.strip()) < MIN_DOCUMENT_CHARS:
+        response = _rejection(document_type, "the document contains almost no readable text.", list(ESSENTIAL_FIELDS))
+    elif not fields["document_types"] and found <= 1:
+        response = _rejection(
+            "Unknown", "no invoice, bill of lading, declaration or packing list details were found.", missing
+        )
+    return {
+        "fields": fields,
+        "missing": missing,
+        "decision": "reject" if response else "llm",
+        "response": response,
+    }
+
+
+def format_fields(result):
+    """
+    Pre-extracted fields as prompt lines for the LLM.
+    """
+    fields = result["fields"]
+    lines = [
+        f"- Document type markers: {', '.join(fields['document_types']) or 'none'}",
+        f"- HS codes: {', '.join(fields['hs_codes']) or 'none'}",
+        f"- Incoterms: {', '.join(fields['incoterms']) or 'none'}",
+        f"- Amounts: {', '.join(fields['amounts']) or 'none'}",
+        f"- Countries: {', '.join(fields['countries']) or 'none'}",
+        f"- Not found by the rule check: {', '.join(ESSENTIAL_LABELS[m] for m in result['missing']) or 'nothing'}",
+    ]
+    return "\n".join(lines)
+
+
+def prepare_verification(extracted_text):
+    """
+    Run the rule-based pre-pass. Returns (answer, None) when the document is
+    rejected without the LLM, otherwise (None, prompt for the LLM).
+    """
+    pre_check = pre_verify(extracted_text[:VERIFICATION_WINDOW])
+    if pre_check["decision"] == "reject":
+        return pre_check["response"], None
+    return None, build_verification_prompt(extracted_text, format_fields(pre_check))
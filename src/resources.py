@@ -0,0 +1,115 @@
+import threading
+import time
+
+
+# ----------------------------- Lazy Resources -----------------------------
+class LazyResource:
+    """
+    A heavy object (embedding model, vector store client, LLM, chain) that is
+    built on first use, exactly once, even when several request threads ask
+    for it at the same time.
+
+    With cache_none=False a factory returning None (e.g. an index file that
+    does not exist yet) is called again on the next get().
+    """
+
+    def __init__(self, name, factory, cache_none=True):
+        self.name = name
+        self.factory = factory
+        self.cache_none = cache_none
+        self.load_seconds = None
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def get(self):
+        # Fast path without the lock once the resource exists
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                value = self.factory()
+                if value is None and not self.cache_none:
+                    return None
+                self._value = value
+                self.load_seconds = time.perf_counter() - start
+                self._ready = True
+                print(f"✅ {self.name} ready in {self.load_seconds:.2f}s")
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._ready = False
+            self.load_seconds = None
+
+
+class ResourceRegistry:
+    """
+    Named lazy resources. Factories may call registry.get() for their own
+    dependencies (e.g. the vector store asks for the embeddings).
+    """
+
+    def __init__(self):
+        self._resources = {}
+
+    def register(self, name, factory, cache_none=True):
+        self._resources[name] = LazyResource(name, factory, cache_none)
+        return factory
+
+    def resource(self, name, cache_none=True):
+        """Decorator form of register()."""
+        def decorator(factory):
+            return self.register(name, factory, cache_none)
+        return decorator
+
+    def get(self, name):
+        try:
+            resource = self._resources[name]
+        except KeyError:
+            raise KeyError(f"Unknown resource: {name}") from None
+        return resource.get()
+
+    def is_ready(self, name):
+        return name in self._resources and self._resources[name].ready
+
+    def status(self):
+        return {
+            name: {"ready": res.ready, "load_seconds": res.load_seconds}
+            for name, res in self._resources.items()
+        }
+
+    def reset(self, name=None):
+        names = [name] if name else list(self._resources)
+        for n in names:
+            self._resources[n].reset()
+
+    def warm_up(self, names=None, background=True):
+        """
+        Build resources ahead of the first request. With background=True this
+        returns immediately and loads in a daemon thread; requests arriving
+        meanwhile simply wait on the same once-only lock.
+        """
+        names = list(names or self._resources)
+
+        def _load():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"❌ Warm-up failed for {name}:", e)
+
+        if not background:
+            _load()
+            return None
+        thread = threading.Thread(target=_load, name="resource-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+
+registry = ResourceRegistry()
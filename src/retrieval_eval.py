@@ -0,0 +1,290 @@
+"""
+Retrieval evaluation over a grid of chunking and k settings.
+
+    python -m src.retrieval_eval --chunk-sizes 400,750,1000 --overlaps 50,100 --k 2,3,5
+    python -m src.retrieval_eval --modes dense,hybrid --stand-in-embeddings --out eval.csv
+
+For every (chunk size, overlap) the corpus is split and embedded into a
+throwaway local index; every labelled question is then retrieved at each k
+(dense, or hybrid BM25 + dense as served with RETRIEVER_MODE=hybrid). Per
+setting the report has:
+
+  recall@k        share of questions with a relevant chunk in the top k
+  mrr             mean reciprocal rank of the first relevant chunk (0 if none)
+  prompt_tokens   mean estimated tokens of the system prompt stuffed with the
+                  retrieved chunks, i.e. what the LLM is actually sent
+  p50/p95 ms      retrieval latency (query embedding + search)
+
+A chunk is relevant to a question when it contains one of the question's
+answer phrases (whitespace and case insensitive) and, if the question names
+a source file, comes from that file. Phrases keep the labels valid whatever
+the chunking. The recommendation is the setting with the smallest prompt
+among those within --max-recall-drop of the best recall@k; apply it with
+the CHUNK_SIZE / CHUNK_OVERLAP / RETRIEVER_K environment variables.
+With --compress every setting is also scored on the compressed context the
+RAG chain actually sends (src/context_builder.py), and the recommendation
+is made among those rows.
+"""
+import os
+import re
+import csv
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+from src.helper import (
+    load_multiple_pdfs,
+    text_split,
+    download_hugging_face_embeddings,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBEDDING_MODEL_NAME,
+)
+from src.vector_store import LocalVectorIndex, LocalVectorStore
+from src.hybrid_retriever import HybridRetriever, LexicalIndex, RETRIEVER_MODE
+from src.prompt import system_prompt
+from src.tokens import estimate_tokens
+from src.context_builder import assemble_context, context_budget
+
+# ----------------------------- Settings -----------------------------
+DEFAULT_QUESTIONS = os.path.join("data", "retrieval_questions.jsonl")
+DEFAULT_DATA = ["data"]
+# Dense candidates fused with BM25 in hybrid mode (as in app.build_retriever)
+HYBRID_CANDIDATE_K = 10
+# create_stuff_documents_chain's default separator between stuffed chunks
+DOCUMENT_SEPARATOR = "\n\n"
+
+_SPACE = re.compile(r"\s+")
+
+
+def _normalise(text):
+    return _SPACE.sub(" ", text).strip().lower()
+
+
+# ----------------------------- Questions -----------------------------
+def load_questions(path):
+    """[{"id", "question", "answers": [phrase, ...], "source": optional file name}]"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question") or not item.get("answers"):
+                raise ValueError(f"❌ {path}:{number} needs 'question' and 'answers'")
+            item.setdefault("id", str(number))
+            item["_answers"] = [_normalise(a) for a in item["answers"]]
+            questions.append(item)
+    return questions
+
+
+def is_relevant(question, document):
+    source = question.get("source")
+    if source and os.path.basename(document.metadata.get("source", "")) != source:
+        return False
+    text = _normalise(document.page_content)
+    return any(answer in text for answer in question["_answers"])
+
+
+def unanswerable(questions, documents):
+    """Questions none of whose answer phrases occur in the corpus (mislabelled or missing source)."""
+    return [q["id"] for q in questions if not any(is_relevant(q, doc) for doc in documents)]
+
+
+# ----------------------------- Scoring -----------------------------
+def first_relevant_rank(question, documents):
+    for rank, document in enumerate(documents, start=1):
+        if is_relevant(question, document):
+            return rank
+    return None
+
+
+def prompt_tokens(documents):
+    context = DOCUMENT_SEPARATOR.join(doc.page_content for doc in documents)
+    return estimate_tokens(system_prompt.format(context=context))
+
+
+def score(questions, retrieve):
+    """Run every question through `retrieve(question) -> [Document]`; returns the metric row."""
+    ranks, tokens, latencies = [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        documents = retrieve(question["question"])
+        latencies.append(time.perf_counter() - start)
+        ranks.append(first_relevant_rank(question, documents))
+        tokens.append(prompt_tokens(documents) + estimate_tokens(question["question"]))
+    ms = np.asarray(latencies) * 1000
+    return {
+        "recall": round(sum(r is not None for r in ranks) / len(ranks), 3),
+        "mrr": round(sum(1.0 / r for r in ranks if r) / len(ranks), 3),
+        "prompt_tokens": round(float(np.mean(tokens)), 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "missed": [q["id"] for q, r in zip(questions, ranks) if r is None],
+    }
+
+
+# ----------------------------- Grid -----------------------------
+def build_indexes(documents, chunk_size, chunk_overlap, embeddings, workdir):
+    """(dense store, lexical index, chunk count, build seconds) for one chunking setting."""
+    start = time.perf_counter()
+    chunks = text_split(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    path = os.path.join(workdir, f"index_{chunk_size}_{chunk_overlap}")
+    store = LocalVectorStore(LocalVectorIndex(path), embeddings)
+    ids = store.add_texts([c.page_content for c in chunks], [dict(c.metadata) for c in chunks])
+
+    lexical = LexicalIndex()
+    by_source = {}
+    for vid, chunk in zip(ids, chunks):
+        by_source.setdefault(os.path.basename(chunk.metadata.get("source", "")), []).append((vid, chunk))
+    for name, items in by_source.items():
+        lexical.set_file(name, [vid for vid, _ in items], [chunk for _, chunk in items])
+    lexical.build()
+    return store, lexical, len(chunks), time.perf_counter() - start
+
+
+def compressed(retrieve):
+    """`retrieve` followed by the context assembly the RAG chain applies (no history)."""
+    fixed_tokens = estimate_tokens(system_prompt.format(context=""))
+
+    def run(question):
+        budget = context_budget(fixed_tokens + estimate_tokens(question))
+        return assemble_context(question, retrieve(question), budget)
+    return run
+
+
+def run_grid(documents, questions, embeddings, chunk_sizes, overlaps, ks, modes=("dense",), compress=False):
+    rows = []
+    workdir = tempfile.mkdtemp(prefix="retrieval_eval_")
+    try:
+        for chunk_size in chunk_sizes:
+            for overlap in overlaps:
+                if overlap >= chunk_size:
+                    continue
+                store, lexical, n_chunks, build_seconds = build_indexes(
+                    documents, chunk_size, overlap, embeddings, workdir
+                )
+                print(f"🧱 chunk_size={chunk_size} overlap={overlap}: {n_chunks} chunks in {build_seconds:.1f}s")
+                for k in ks:
+                    for mode in modes:
+                        if mode == "hybrid":
+                            retriever = HybridRetriever(
+                                dense=store.as_retriever(search_kwargs={"k": HYBRID_CANDIDATE_K}),
+                                lexical=lexical, k=k, candidate_k=HYBRID_CANDIDATE_K,
+                            )
+                        else:
+                            retriever = store.as_retriever(search_kwargs={"k": k})
+                        for context in ("full", "compressed") if compress else ("full",):
+                            retrieve = compressed(retriever.invoke) if context == "compressed" else retriever.invoke
+                            row = {"mode": mode, "context": context, "chunk_size": chunk_size,
+                                   "chunk_overlap": overlap, "k": k, "chunks": n_chunks,
+                                   "build_s": round(build_seconds, 2)}
+                            row.update(score(questions, retrieve))
+                            rows.append(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def recommend(rows, max_recall_drop=0.02):
+    """Cheapest prompt among the settings whose recall is within max_recall_drop of the best."""
+    if not rows:
+        return None
+    best = max(row["recall"] for row in rows)
+    eligible = [row for row in rows if row["recall"] >= best - max_recall_drop]
+    return min(eligible, key=lambda row: (row["prompt_tokens"], -row["mrr"], row["p50_ms"]))
+
+
+# ----------------------------- Reporting -----------------------------
+COLUMNS = ("mode", "context", "chunk_size", "chunk_overlap", "k", "chunks", "recall", "mrr", "prompt_tokens", "p50_ms", "p95_ms")
+
+
+def print_table(rows):
+    print("\n" + " ".join(f"{c:>13}" for c in COLUMNS))
+    for row in rows:
+        print(" ".join(f"{row[c]:>13}" for c in COLUMNS))
+
+
+def write_report(rows, path):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(COLUMNS) + ["build_s", "missed"])
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, "missed": " ".join(row["missed"])})
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare retrieval quality, prompt size and latency across chunking and k.")
+    parser.add_argument("--data", action="append", help="PDF file or folder (repeatable, default: data/)")
+    parser.add_argument("--questions", default=DEFAULT_QUESTIONS, help="labelled questions (JSONL)")
+    parser.add_argument("--chunk-sizes", type=_int_list, default=[400, 750, 1000])
+    parser.add_argument("--overlaps", type=_int_list, default=[50, 100])
+    parser.add_argument("--k", type=_int_list, default=[2, 3, 5])
+    parser.add_argument("--modes", default="dense", help="comma separated: dense, hybrid")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    parser.add_argument("--compress", action="store_true",
+                        help="also score the compressed context the chain sends (src/context_builder.py)")
+    parser.add_argument("--stand-in-embeddings", action="store_true",
+                        help="hashing embeddings instead of the MiniLM model (offline smoke runs)")
+    parser.add_argument("--out", help="write all rows to a .csv or .json file")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.questions)
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    documents = load_multiple_pdfs(args.data or DEFAULT_DATA)
+    print(f"📚 {len(documents)} pages, {len(questions)} questions")
+    missing = unanswerable(questions, documents)
+    if missing:
+        print(f"⚠️ Skipping questions whose answer is on no page: {', '.join(missing)}")
+        questions = [q for q in questions if q["id"] not in missing]
+
+    if args.stand_in_embeddings:
+        from src.stand_ins import HashingEmbeddings
+
+        embeddings = HashingEmbeddings()
+    else:
+        # Chunks already in the embedding artifact (store_index.py) are not embedded again
+        from src.embedding_artifact import EmbeddingArtifact
+
+        artifact = EmbeddingArtifact.load_or_none()
+        if artifact is not None and artifact.settings["model"] == EMBEDDING_MODEL_NAME:
+            embeddings = artifact.embeddings(fallback_factory=download_hugging_face_embeddings)
+        else:
+            embeddings = download_hugging_face_embeddings()
+
+    rows = run_grid(documents, questions, embeddings, args.chunk_sizes, args.overlaps, args.k, modes,
+                    args.compress)
+    print_table(rows)
+
+    served = "compressed" if args.compress else "full"
+    serving = (RETRIEVER_MODE if RETRIEVER_MODE in modes else modes[0], CHUNK_SIZE, CHUNK_OVERLAP,
+               int(os.getenv("RETRIEVER_K", "3")))
+    current = next((r for r in rows if (r["mode"], r["chunk_size"], r["chunk_overlap"], r["k"]) == serving
+                    and r["context"] == served), None)
+    best = recommend([r for r in rows if r["context"] == served], args.max_recall_drop)
+    if current:
+        print(f"\n📌 Current ({current['mode']}, {CHUNK_SIZE}/{CHUNK_OVERLAP}, k={current['k']}): "
+              f"recall {current['recall']}, mrr {current['mrr']}, {current['prompt_tokens']} prompt tokens")
+    if best:
+        print(f"✅ Recommended: {best['mode']} CHUNK_SIZE={best['chunk_size']} CHUNK_OVERLAP={best['chunk_overlap']} "
+              f"RETRIEVER_K={best['k']} (recall {best['recall']}, mrr {best['mrr']}, "
+              f"{best['prompt_tokens']} prompt tokens)")
+    if args.out:
+        write_report(rows, args.out)
+        print(f"📄 Rows written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
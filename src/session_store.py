@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+from dotenv import load_dotenv
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import SystemMessage, messages_from_dict, message_to_dict
+
+from src.cache import LRUCache
+from src.tokens import estimate_tokens, message_tokens
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+# SESSION_BACKEND: memory (per process) | sqlite (shared by all workers on a host)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join("artifacts", "sessions.sqlite3"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+# Token budget for the {chat_history} part of every prompt
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "250"))
+# Seconds between purges of expired / surplus sessions in the SQLite store
+SESSION_EVICT_INTERVAL = float(os.getenv("SESSION_EVICT_INTERVAL", "60"))
+
+
+# ----------------------------- Session IDs -----------------------------
+# Clients are identified by the X-Session-ID header (API clients) or the
+# session_id cookie the server sets on the first request (browsers).
+SESSION_COOKIE = "session_id"
+SESSION_HEADER = "X-Session-ID"
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def resolve_session_id(header_value, cookie_value):
+    """
+    Returns (session_id, is_new). Unknown or malformed IDs get a fresh one.
+    """
+    for value in (header_value, cookie_value):
+        if value and _SESSION_ID.match(value):
+            return value, False
+    return uuid.uuid4().hex, True
+
+
+# ----------------------------- Summarisation -----------------------------
+def _first_sentence(text, limit=160):
+    text = " ".join(text.split())
+    for end in (". ", "? ", "! ", "। "):
+        cut = text.find(end)
+        if 0 < cut < limit:
+            return text[:cut + 1]
+    return text[:limit] + ("…" if len(text) > limit else "")
+
+
+def extractive_summary(previous, messages, max_tokens=HISTORY_SUMMARY_TOKENS):
+    """
+    Cheap running summary: the first sentence of each folded turn appended to
+    the previous summary, keeping the most recent lines within max_tokens.
+    No LLM call, so compaction never adds latency to a request.
+    """
+    lines = previous.split("\n") if previous else []
+    for message in messages:
+        role = "User" if message.type == "human" else "Assistant"
+        lines.append(f"{role}: {_first_sentence(str(message.content))}")
+
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+# ----------------------------- Stores -----------------------------
+class InMemorySessionStore:
+    """
+    Per-process sessions with LRU eviction beyond `max_sessions` and a TTL
+    since last use. Each session is bounded by compaction, so total memory
+    is bounded too.
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX, ttl=SESSION_TTL):
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=ttl, sliding=True)
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return "", []
+        return session["summary"], list(session["messages"])
+
+    def append(self, session_id, messages):
+        with self._lock:
+            session = self._sessions.get(session_id) or {"summary": "", "messages": []}
+            session["messages"] = session["messages"] + list(messages)
+            self._sessions.set(session_id, session)
+
+    def compact(self, session_id, summary, drop):
+        """Replace the summary and drop the `drop` oldest stored messages."""
+        with self._lock:
+            session = self._sessions.get(session_id) or {"summary": "", "messages": []}
+            self._sessions.set(session_id, {"summary": summary, "messages": session["messages"][drop:]})
+
+    def clear(self, session_id):
+        self._sessions.pop(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in SQLite so every worker process sees the same conversation.
+    Reads and writes both count as use. Expired sessions are never returned;
+    they and the least recently used ones beyond `max_sessions` are purged at
+    most every `evict_interval` seconds, on a write.
+    """
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX, ttl=SESSION_TTL,
+                 evict_interval=SESSION_EVICT_INTERVAL):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);"
+            "CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at);"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary FROM sessions WHERE session_id = ? AND updated_at > ?",
+                (session_id, time.time() - self.ttl),
+            ).fetchone()
+            if row is None:
+                return "", []
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id))
+            self._conn.commit()
+        return row[0], messages_from_dict([json.loads(r[0]) for r in rows])
+
+    def _touch(self, session_id, summary=None):
+        now = time.time()
+        # An expired session that was not purged yet starts over instead of coming back
+        if self._conn.execute(
+            "DELETE FROM sessions WHERE session_id = ? AND updated_at <= ?", (session_id, now - self.ttl)
+        ).rowcount:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, summary, updated_at) VALUES (?, COALESCE(?, ''), ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at,"
+            " summary = COALESCE(?, sessions.summary)",
+            (session_id, summary, now, summary),
+        )
+
+    def _evict(self):
+        now = time.time()
+        if now - self._last_evict < self.evict_interval:
+            return
+        self._last_evict = now
+        cutoff = now - self.ttl
+        self._conn.execute(
+            "DELETE FROM sessions WHERE updated_at <= ? OR session_id IN ("
+            " SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (cutoff, self.max_sessions),
+        )
+        self._conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def append(self, session_id, messages):
+        with self._lock:
+            self._touch(session_id)
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(message_to_dict(m))) for m in messages],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def compact(self, session_id, summary, drop):
+        with self._lock:
+            self._touch(session_id, summary)
+            self._conn.execute(
+                "DELETE FROM messages WHERE id IN ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id LIMIT ?)",
+                (session_id, drop),
+            )
+            self._conn.commit()
+
+    def clear(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def build_session_store(backend=None):
+    backend = backend or SESSION_BACKEND
+    if backend == "memory":
+        return InMemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+
+
+# ----------------------------- Bounded History -----------------------------
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history whose prompt footprint stays constant however long the
+    conversation gets.
+
+    Reading returns a summary of older turns (as one system message) plus the
+    most recent messages that fit `token_budget`. Writing folds the oldest
+    turns into that summary once the stored messages exceed the budget, so
+    storage per session is bounded as well.
+    """
+
+    def __init__(self, session_id, store, token_budget=HISTORY_TOKEN_BUDGET,
+                 summary_tokens=HISTORY_SUMMARY_TOKENS, summarizer=extractive_summary):
+        self.session_id = session_id
+        self.store = store
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+
+    @property
+    def messages(self):
+        summary, stored = self.store.load(self.session_id)
+        budget = self.token_budget
+        window = []
+        if summary:
+            summary_message = SystemMessage(content="Summary of the earlier conversation:\n" + summary)
+            budget -= message_tokens(summary_message)
+        for message in reversed(stored):
+            cost = message_tokens(message)
+            if cost > budget:
+                break
+            window.append(message)
+            budget -= cost
+        window.reverse()
+        return ([summary_message] if summary else []) + window
+
+    def add_messages(self, messages):
+        self.store.append(self.session_id, messages)
+        self._compact()
+
+    def _compact(self):
+        summary, stored = self.store.load(self.session_id)
+        recent_budget = self.token_budget - self.summary_tokens
+        total = sum(message_tokens(m) for m in stored)
+        if total <= recent_budget:
+            return
+        # Drop whole turns from the front until the rest fits the budget
+        drop = 0
+        while drop < len(stored) and total > recent_budget:
+            total -= message_tokens(stored[drop])
+            drop += 1
+        summary = self.summarizer(summary, stored[:drop], self.summary_tokens)
+        self.store.compact(self.session_id, summary, drop)
+
+    def clear(self):
+        self.store.clear(self.session_id)
@@ -0,0 +1,177 @@
+"""
+Offline stand-ins for the external services, for benchmarks and evaluation.
+
+    from app import registry
+    from src.stand_ins import install_stand_ins
+    install_stand_ins(registry, corpus_texts)
+
+Each stand-in keeps the interface of the real component and can add a fixed
+latency, so a run exercises the app's own code paths (batching, caching,
+routing, streaming) with realistic waits but without Groq, Pinecone, Google
+Translate, the trade APIs or a model download.
+"""
+import re
+import time
+import zlib
+import tempfile
+from io import BytesIO
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.helper import EMBEDDING_DIMENSION
+
+
+# ----------------------------- Embeddings -----------------------------
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words vectors (hashed unigrams and bigrams, unit
+    length), so texts sharing words are close, like a real model would put
+    them. `latency_ms` is slept per call plus `per_text_ms` per text to
+    mimic a forward pass.
+    """
+
+    def __init__(self, dimension=EMBEDDING_DIMENSION, latency_ms=0.0, per_text_ms=0.0):
+        self.dimension = dimension
+        self.latency = latency_ms / 1000.0
+        self.per_text = per_text_ms / 1000.0
+        self.calls = 0
+
+    def _vector(self, text):
+        tokens = _TOKEN.findall(text.lower())
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.latency or self.per_text:
+            time.sleep(self.latency + self.per_text * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# ----------------------------- LLM -----------------------------
+VERIFICATION_ANSWER = (
+    "📄 Document Type: Invoice\n"
+    "📋 Document Status: ✅ Correct\n"
+    "🔍 Verification Result: ✅ Verified\n"
+    "💡 Missing or Suspicious Details (if any): None"
+)
+
+
+class StandInChatModel(BaseChatModel):
+    """
+    Chat model that answers instantly from the prompt itself, after
+    `first_token_ms`, then streams one word every `token_ms`. Verification
+    prompts get an answer in the verification format.
+    """
+
+    first_token_ms: float = 0.0
+    token_ms: float = 0.0
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "stand-in"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        if "Document Type" in prompt:
+            return VERIFICATION_ANSWER
+        words = _TOKEN.findall(str(messages[-1].content)) or ["customs"]
+        body = (" ".join(words) + " ") * (self.answer_words // len(words) + 1)
+        return "Based on the retrieved customs guidance: " + " ".join(body.split()[:self.answer_words]) + "."
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_ms / 1000.0)
+        for i, word in enumerate(self._answer(messages).split(" ")):
+            if i:
+                time.sleep(self.token_ms / 1000.0)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+        text = "".join(chunk.text for chunk in self._stream(messages, stop))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+
+# ----------------------------- Translation -----------------------------
+def stand_in_translator(latency_ms=0.0):
+    """OfflineBackend function that tags text with the target language after a delay."""
+    def translate(text, source, target):
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        return f"[{target}] {text}"
+    return translate
+
+
+# ----------------------------- Sample Documents -----------------------------
+def sample_invoice_docx(number=1, hs_code="6403.99.00", value=5000):
+    """A small commercial invoice as DOCX bytes (python-docx is already a dependency)."""
+    import docx
+
+    document = docx.Document()
+    document.add_heading("COMMERCIAL INVOICE", level=1)
+    for line in (
+        f"Invoice No: INV-{number:05d}    Date: 2024-05-{number % 28 + 1:02d}",
+        "Exporter: Himalayan Footwear Exports Pvt. Ltd., Kolkata, India",
+        "Importer / Consignee: Kathmandu Trading House, Kathmandu, Nepal",
+        "Country of Origin: India    Port of Loading: Kolkata    Incoterms: CIF Birgunj",
+        f"Description of Goods: Leather shoes, HS Code: {hs_code}",
+        f"Quantity: {number * 10 + 100} pairs    Net Weight: 420 kg    Gross Weight: 455 kg",
+        f"Total Value: USD {value:,.2f}",
+    ):
+        document.add_paragraph(line)
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+# ----------------------------- Installation -----------------------------
+def install_stand_ins(registry, corpus_texts, embed_latency_ms=0.0, llm_first_token_ms=0.0, llm_token_ms=0.0,
+                      translate_latency_ms=0.0, answer_cache=True, index_dir=None):
+    """
+    Replace the app's external resources in `registry` with stand-ins.
+    `corpus_texts` are indexed into a throwaway local vector index that
+    serves retrieval in place of Pinecone. Trade API lookups go to a
+    MockTradeApi, which is returned so the caller can stop it.
+    """
+    from src.embedding_service import BatchingEmbeddingService
+    from src.vector_store import LocalVectorIndex, LocalVectorStore
+    from src.translation import OfflineBackend, TranslationService
+    from src.mock_trade_api import MockTradeApi
+    from src.trade_api_integration import TradeApiClient, set_client
+
+    base = HashingEmbeddings(latency_ms=embed_latency_ms)
+    index = LocalVectorIndex(index_dir or tempfile.mkdtemp(prefix="stand_in_index_"))
+    LocalVectorStore(index, base).add_texts(corpus_texts)
+
+    registry.register("embeddings", lambda: BatchingEmbeddingService(base))
+    registry.register("docsearch", lambda: LocalVectorStore(index, registry.get("embeddings")))
+    registry.register("llm", lambda: StandInChatModel(first_token_ms=llm_first_token_ms, token_ms=llm_token_ms))
+    registry.register("translation", lambda: TranslationService(
+        OfflineBackend(stand_in_translator(translate_latency_ms)), disk_cache=None
+    ))
+    if not answer_cache:
+        registry.register("answer_cache", lambda: None)
+
+    mock = MockTradeApi().start()
+    set_client(TradeApiClient(base_urls=mock.base_urls))
+    return mock
@@ -1,54 +1,118 @@
 import os 
+from functools import lru_cache
 from pinecone.grpc import PineconeGRPC as Pinecone 
 from pinecone import ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
 
 from dotenv import load_dotenv
 
-from src.helper import load_multiple_pdfs ,text_split,download_hugging_face_embeddings
+from src.helper import (
+    download_hugging_face_embeddings,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_DIMENSION,
+)
+from src.ingestion import run_incremental_ingest, DEFAULT_MANIFEST_PATH
+from src.hybrid_retriever import LexicalIndex, LEXICAL_INDEX_PATH
+from src.tariff_index import ensure_tariff_index, TARIFF_INDEX_PATH
+from src.embedding_artifact import build_artifact, EMBEDDING_ARTIFACT_DIR, EMBEDDING_ARTIFACT_DTYPE
+from src.vector_store import (
+    LocalVectorIndex,
+    VECTOR_BACKEND,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_DTYPE,
+    PINECONE_INDEX_NAME,
+    manifest_settings,
+)
 load_dotenv()
 
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 
-PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
-os.environ['PINECONE_API_KEY'] = PINECONE_API_KEY
+# All PDFs in this folder are indexed; the manifest tracks what is already embedded
+DATA_DIR = os.getenv("DATA_DIR", "data")
+# Each backend tracks its own contents, so each gets its own manifest
+MANIFEST_PATH = os.getenv(
+    "INGEST_MANIFEST_PATH",
+    os.path.join(LOCAL_INDEX_DIR, "ingest_manifest.json") if VECTOR_BACKEND == "local" else DEFAULT_MANIFEST_PATH,
+)
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+# Keep the precomputed embedding artifact (src/embedding_artifact.py) in step
+# and embed from it, so the model only runs on chunks it has never seen
+WRITE_EMBEDDING_ARTIFACT = os.getenv("WRITE_EMBEDDING_ARTIFACT", "1") == "1"
+
+index_name = PINECONE_INDEX_NAME
+
 
-# Example usage:
-pdf_files = [
-    "D:\Customs Clearance_chatbot\\data\\Customs Tariff 2024-25_zz1tedk.pdf",
-    "D:\Customs Clearance_chatbot\\data\\Navigating Import.pdf",
-    "D:\Customs Clearance_chatbot\\data\\nepal.pdf",
-    "D:\Customs Clearance_chatbot\\data\\np_e.pdf",
-    "D:\Customs Clearance_chatbot\\data\\trade_industry_tax.pdf",
-    "D:\Customs Clearance_chatbot\\data\\CUSTOMS_ACT &  REGULATION 2064_1wnta5d.pdf"
-]
+def get_or_create_index(pc):
+    """
+    Reuse the existing Pinecone index; only create it on the very first run.
+    """
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name = index_name,
+            dimension=EMBEDDING_DIMENSION,
+            metric="cosine",
+            spec = ServerlessSpec(
+                cloud = "aws",
+                region="us-east-1"
+            )
+        )
+    return pc.Index(index_name)
 
 
-extracted_data = load_multiple_pdfs(pdf_files)
-text_chunks = text_split(extracted_data)
-embeddings = download_hugging_face_embeddings()
+def open_target_index():
+    if VECTOR_BACKEND == "local":
+        return LocalVectorIndex(LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE)
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
+    PINECONE_API_KEY = os.environ.get('PINECONE_API_KEY')
+    if not PINECONE_API_KEY:
+        raise ValueError("❌ Missing PINECONE_API_KEY. Check your .env file.")
 
-index_name = "customs-clearance-chatbot"
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    return get_or_create_index(pc)
 
-pc.create_index(
-    name = index_name,
-    dimension=384,
-    metric="cosine",
-    spec = ServerlessSpec(
-        cloud = "aws",
-        region="us-east-1"
+
+def main():
+    index = open_target_index()
+    lexical_index = LexicalIndex.load_or_empty(LEXICAL_INDEX_PATH)
+    settings = {
+        "model": EMBEDDING_MODEL_NAME,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+    }
+    # Loaded at most once, and only if some chunk really needs embedding
+    load_model = lru_cache(maxsize=1)(download_hugging_face_embeddings)
+    embeddings_factory = load_model
+
+    if WRITE_EMBEDDING_ARTIFACT:
+        artifact, artifact_stats = build_artifact(
+            DATA_DIR, EMBEDDING_ARTIFACT_DIR, load_model, settings, dtype=EMBEDDING_ARTIFACT_DTYPE
+        )
+        print(f"✅ Embedding artifact at {EMBEDDING_ARTIFACT_DIR}:", artifact_stats)
+        embeddings_factory = lambda: artifact.embeddings(fallback_factory=load_model)
+
+    # Embed only new/changed chunks and upsert them into the configured index
+    stats = run_incremental_ingest(
+        data_dir=DATA_DIR,
+        index=index,
+        embeddings_factory=embeddings_factory,
+        manifest_path=MANIFEST_PATH,
+        settings=manifest_settings(index, settings),
+        batch_size=UPSERT_BATCH_SIZE,
+        lexical_index=lexical_index,
     )
-)
+    # BM25 + HS-code index used by the hybrid retriever
+    if stats["lexical_rebuilt"] or not os.path.exists(LEXICAL_INDEX_PATH):
+        lexical_index.save(LEXICAL_INDEX_PATH)
+    print(f"✅ Ingestion complete ({VECTOR_BACKEND}):", stats)
 
+    # Structured HS code / duty table for local lookups; skipped when the PDF is unchanged
+    tariff_lines = ensure_tariff_index()
+    if tariff_lines is not None:
+        print(f"✅ Tariff index written to {TARIFF_INDEX_PATH}: {tariff_lines} tariff lines")
 
 
-# Embed each chunk and upsert the embeddings into your Pinecone index 
-docsearch = PineconeVectorStore.from_documents(
-    documents = text_chunks,
-    index_name = index_name,
-    embedding = embeddings,
-)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import re
+import json
+import asyncio
+
+
+# ----------------------------- Server-Sent Events -----------------------------
+def sse_event(data, event=None):
+    """
+    Format one Server-Sent Event. `data` is sent as JSON on a single line.
+    """
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False))
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop nginx and similar proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
+
+
+# ----------------------------- Sentence Buffering -----------------------------
+# A sentence ends at ., !, ?, the Devanagari danda or a newline, followed by
+# whitespace. Very short pieces ("e.g.", "1.") are held back and merged with
+# the next sentence so the translator always gets enough context.
+_SENTENCE_END = re.compile(r"(?<=[.!?।\n])\s+")
+_ABBREVIATION = re.compile(r"\b(?:e\.g|i\.e|etc|no|vs|approx|mr|ms|dr)\.$", re.IGNORECASE)
+MIN_SENTENCE_CHARS = 40
+
+
+class SentenceBuffer:
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """
+        Add streamed text; return the complete sentences it finished, if any.
+        """
+        self._buffer += text
+        ready = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            if _ABBREVIATION.search(self._buffer, start, match.start()):
+                continue
+            if match.end() - start >= self.min_chars:
+                ready.append(self._buffer[start:match.end()])
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return ready
+
+    def flush(self):
+        rest, self._buffer = self._buffer, ""
+        return [rest] if rest.strip() else []
+
+
+def translate_stream(tokens, translate):
+    """
+    Progressive translation of a token stream: tokens are buffered into
+    sentences and each finished sentence is translated and yielded at once,
+    so the first translated sentence arrives long before generation ends.
+    With translate=None tokens are passed through unchanged.
+    """
+    if translate is None:
+        yield from tokens
+        return
+    buffer = SentenceBuffer()
+    for token in tokens:
+        for sentence in buffer.feed(token):
+            yield _translate_keeping_spacing(sentence, translate)
+    for sentence in buffer.flush():
+        yield _translate_keeping_spacing(sentence, translate)
+
+
+def _translate_keeping_spacing(sentence, translate):
+    # Translators strip whitespace; keep the newlines of lists and paragraphs
+    body = sentence.rstrip()
+    return translate(body) + (sentence[len(body):] or " ")
+
+
+async def atranslate_stream(tokens, translate):
+    """
+    Async counterpart of translate_stream for async token iterators; the
+    blocking translate call runs in a worker thread.
+    """
+    if translate is None:
+        async for token in tokens:
+            yield token
+        return
+    buffer = SentenceBuffer()
+    async for token in tokens:
+        for sentence in buffer.feed(token):
+            yield await asyncio.to_thread(_translate_keeping_spacing, sentence, translate)
+    for sentence in buffer.flush():
+        yield await asyncio.to_thread(_translate_keeping_spacing, sentence, translate)
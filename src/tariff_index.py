@@ -0,0 +1,470 @@
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from pypdf import PdfReader
+
+from src.helper import repair_extracted_text
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+TARIFF_PDF_PATH = os.getenv("TARIFF_PDF_PATH", os.path.join("data", "Customs Tariff 2024-25_zz1tedk.pdf"))
+TARIFF_INDEX_PATH = os.getenv("TARIFF_INDEX_PATH", os.path.join("artifacts", "tariff_index.sqlite3"))
+TARIFF_INDEX_VERSION = 1
+
+
+# ----------------------------- PDF Parsing -----------------------------
+# Schedule rows look like (after repair_extracted_text):
+#
+#   02.03    Meat of swine, fresh, chilled or frozen
+#       -Fresh or chilled:
+#     0203.11.00  --Carcasses and half-carcasses   kg  6  10
+#     0203.12.00  --Hams, shoulders and cuts thereof, with
+#   bone in  kg  6  10
+#
+# i.e. heading, tariff code, description (wrapping over lines), unit and the
+# SAARC / GENERAL import duty (percent). Lines starting with dashes and no
+# code group the rows below them.
+_HEADING_ROW = re.compile(r"^(\d{2}\.\d{2})\s+(?:(\d{4}\.\d{2}\.\d{2})\s+)?(.*)$")
+_CODE_ROW = re.compile(r"^(\d{4}\.\d{2}\.\d{2})\s+(.*)$")
+_GROUP_ROW = re.compile(r"^(-+)\s*(.+)$")
+_TABLE_HEADER = re.compile(r"^Heading\s+Sub-heading\s+Description")
+_COLUMN_NUMBERS = re.compile(r"^1\s+2\s+3\s+4\s+5\s+6$")
+_CHAPTER = re.compile(r"^Chapter\s+(\d{1,2})\s*$")
+_PAGE_NUMBER = re.compile(r"^\d{1,3}$")
+# The import schedule ends where the export duty schedule starts
+_EXPORT_SCHEDULE = re.compile(r"^Export Customs Tariff Rate$", re.IGNORECASE)
+# Unit column ("kg", "nos/kg", "m 2", "kg/ltr.") followed by the two duty
+# columns: ad valorem rates ("6  10", "Free") or specific duties ("Per ltr Rs. 60")
+_UNIT = r"(?:m\s?[23]|ft\s?[23]?|kg|kl|nos|stk|pkt|pair|carat|ltr|mtr|gro|mt|decitex|cm\s?[23]?|g|m|u)\.?"
+# Some iron and steel lines carry a lower SAARC rate for LDCs: "kg 30, For Least Developed Countries 7.25 30"
+_LDC_RATE = r",\s*For Least Developed Countries\s+[\d.]+"
+_ROW_TAIL = re.compile(
+    rf"\s(?P<unit>{_UNIT}(?:\s?/\s?{_UNIT})*)\s+"
+    rf"(?P<duty>(?:Free|[\d.]+/?)(?:{_LDC_RATE})?(?:\s+(?:Free|[\d.]+/?))*|(?:Rs\.|Per\b).*)\s*$",
+    re.IGNORECASE,
+)
+_DASHES = re.compile(r"^(-+)\s*")
+
+
+def _clean(text):
+    return " ".join(text.split())
+
+
+def _parse_duties(duty):
+    """
+    SAARC and GENERAL rates as floats. OCR-like splits ("3 0  3 0") are
+    joined back; specific duties ("Rs. 150 per ltr") give None and, like
+    the LDC rate, are kept in the raw text.
+    """
+    duty = re.sub(_LDC_RATE, "", duty, flags=re.IGNORECASE)
+    fields = [f for f in re.split(r"\s{2,}", duty.strip()) if f]
+    if len(fields) == 1:
+        fields = fields[0].split()
+    if len(fields) > 2 and all(len(f) == 1 for f in fields[1:]):
+        # "7.25 1 0": the GENERAL rate split digit by digit
+        fields = [fields[0], "".join(fields[1:])]
+    if len(fields) != 2:
+        return None, None
+    rates = []
+    for field in fields:
+        # "3/" carries a footnote marker
+        value = field.replace(" ", "").rstrip("/")
+        if value.lower() == "free":
+            rates.append(0.0)
+        elif re.fullmatch(r"\d+(?:\.\d+)?", value):
+            rates.append(float(value))
+        else:
+            return None, None
+    return rates[0], rates[1]
+
+
+class _Row:
+    def __init__(self, code, heading, text, page, context):
+        self.code = code
+        self.heading = heading
+        self.text = text
+        self.page = page
+        self.context = context
+
+    def tail(self):
+        return _ROW_TAIL.search(" " + self.text)
+
+    def complete(self):
+        # Duty columns sometimes wrap one value per line; wait for both
+        match = self.tail()
+        if not match:
+            return False
+        duty = match.group("duty")
+        if duty[0].isdigit() or duty.lower().startswith("free"):
+            return _parse_duties(duty)[0] is not None
+        return duty.count("Rs") >= 2
+
+
+def _finish(row):
+    text = " " + row.text
+    match = _ROW_TAIL.search(text)
+    if match:
+        description = text[:match.start()]
+        unit = match.group("unit").replace(" ", "")
+        duty_text = _clean(match.group("duty"))
+        saarc, general = _parse_duties(match.group("duty"))
+    else:
+        description, unit, duty_text, saarc, general = text, "", "", None, None
+    description = _clean(_DASHES.sub("", description.strip()))
+    return {
+        "code": row.code.replace(".", ""),
+        "heading": row.heading.replace(".", ""),
+        "subheading": row.code.replace(".", "")[:6],
+        "description": description,
+        "context": " > ".join(row.context),
+        "unit": unit,
+        "duty_saarc": saarc,
+        "duty_general": general,
+        "duty_text": duty_text,
+        "page": row.page,
+    }
+
+
+def parse_tariff_text(pages):
+    """
+    Parse the import schedule from repaired page texts. Returns (rows, headings,
+    chapters): one row per 8-digit tariff code, headings as
+    {"0203": description} and chapters as {"02": title}.
+    """
+    rows, headings, chapters = [], {}, {}
+    in_table = False
+    heading = None        # current "02.03"
+    heading_text = None   # description being collected for the heading
+    groups = []           # [(dash level, text)] above the current row
+    current = None        # open _Row (description may continue on next lines)
+    chapter = None
+    want_title = False
+
+    def close():
+        nonlocal current
+        if current is not None:
+            rows.append(_finish(current))
+            current = None
+
+    def context(level):
+        parts = [headings.get(heading.replace(".", ""), "")] if heading else []
+        return [p for p in parts + [g for lvl, g in groups if lvl < level] if p]
+
+    for page_no, text in enumerate(pages, start=1):
+        lines = [raw.strip() for raw in text.split("\n") if raw.strip()]
+        # The printed page number is the first line; later bare numbers are duty columns
+        if lines and _PAGE_NUMBER.match(lines[0]):
+            lines = lines[1:]
+        for line in lines:
+            if _EXPORT_SCHEDULE.match(line):
+                close()
+                return rows, headings, chapters
+            if _COLUMN_NUMBERS.match(line):
+                continue
+            m = _CHAPTER.match(line)
+            if m:
+                close()
+                chapter, want_title, in_table = m.group(1).zfill(2), True, False
+                continue
+            if want_title:
+                chapters[chapter] = _clean(line)
+                want_title = False
+                continue
+            if _TABLE_HEADER.match(line):
+                in_table = True
+                continue
+            if not in_table:
+                continue
+
+            m = _HEADING_ROW.match(line)
+            if m and (not current or current.tail()):
+                close()
+                heading, groups = m.group(1), []
+                headings[heading.replace(".", "")] = _clean(_ROW_TAIL.sub("", " " + m.group(3)))
+                heading_text = heading
+                if m.group(2):
+                    # Heading that is itself a single tariff line
+                    current = _Row(m.group(2), heading, m.group(3), page_no, [])
+                continue
+
+            m = _CODE_ROW.match(line)
+            if m and heading:
+                close()
+                heading_text = None
+                level = len(_DASHES.match(m.group(2)).group(1)) if _DASHES.match(m.group(2)) else 1
+                current = _Row(m.group(1), heading, m.group(2), page_no, context(level))
+                continue
+
+            m = _GROUP_ROW.match(line)
+            if m and (current is None or current.tail()):
+                close()
+                heading_text = None
+                level = len(m.group(1))
+                groups = [(lvl, g) for lvl, g in groups if lvl < level] + [(level, _clean(m.group(2)).rstrip(" :"))]
+                continue
+
+            # Continuation of whatever is open: a row, a heading or a group
+            if current is not None and not current.complete():
+                current.text += " " + line
+            elif heading_text is not None:
+                key = heading_text.replace(".", "")
+                headings[key] = _clean(headings[key] + " " + line)
+            elif groups:
+                level, g = groups[-1]
+                groups[-1] = (level, _clean(g + " " + line).rstrip(" :"))
+    close()
+    return rows, headings, chapters
+
+
+def _read_pages(task):
+    path, start, stop = task
+    reader = PdfReader(path)
+    return [repair_extracted_text(reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def read_tariff_pages(path, max_workers=None, pages_per_task=16):
+    total = len(PdfReader(path).pages)
+    tasks = [(path, i, min(i + pages_per_task, total)) for i in range(0, total, pages_per_task)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return [page for pages in pool.map(_read_pages, tasks) for page in pages]
+
+
+# ----------------------------- SQLite Storage -----------------------------
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE chapters (chapter TEXT PRIMARY KEY, title TEXT);
+CREATE TABLE headings (heading TEXT PRIMARY KEY, description TEXT);
+CREATE TABLE tariff_lines (
+    code TEXT PRIMARY KEY, heading TEXT, subheading TEXT, description TEXT, context TEXT,
+    unit TEXT, duty_saarc REAL, duty_general REAL, duty_text TEXT, page INTEGER
+);
+CREATE VIRTUAL TABLE tariff_fts USING fts5(description, context, content='tariff_lines', content_rowid='rowid');
+"""
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_tariff_index(pdf_path=TARIFF_PDF_PATH, db_path=TARIFF_INDEX_PATH, max_workers=None):
+    """
+    Parse the tariff PDF into a fresh SQLite file (written next to db_path
+    and swapped in atomically). Returns the number of tariff lines.
+    """
+    rows, headings, chapters = parse_tariff_text(read_tariff_pages(pdf_path, max_workers))
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany("INSERT INTO chapters VALUES (?, ?)", sorted(chapters.items()))
+        conn.executemany("INSERT INTO headings VALUES (?, ?)", sorted(headings.items()))
+        # A code printed twice (a wrapped sub-table) keeps its first, complete row
+        conn.executemany(
+            "INSERT OR IGNORE INTO tariff_lines VALUES "
+            "(:code, :heading, :subheading, :description, :context, :unit, :duty_saarc, :duty_general, "
+            ":duty_text, :page)",
+            rows,
+        )
+        conn.execute("INSERT INTO tariff_fts (tariff_fts) VALUES ('rebuild')")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("version", str(TARIFF_INDEX_VERSION)),
+            ("source", os.path.basename(pdf_path)),
+            ("source_sha256", _file_sha256(pdf_path)),
+        ])
+        conn.commit()
+        count = conn.execute("SELECT COUNT(*) FROM tariff_lines").fetchone()[0]
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+def tariff_index_is_current(pdf_path=TARIFF_PDF_PATH, db_path=TARIFF_INDEX_PATH):
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return meta.get("version") == str(TARIFF_INDEX_VERSION) and meta.get("source_sha256") == _file_sha256(pdf_path)
+
+
+def ensure_tariff_index(pdf_path=TARIFF_PDF_PATH, db_path=TARIFF_INDEX_PATH):
+    """
+    Rebuild the index only when the PDF (or the parser version) changed.
+    Returns the number of lines written, or None if it was up to date.
+    """
+    if not os.path.exists(pdf_path) or tariff_index_is_current(pdf_path, db_path):
+        return None
+    return build_tariff_index(pdf_path, db_path)
+
+
+# ----------------------------- Lookup -----------------------------
+class CodeTrie:
+    """
+    Digit trie over tariff codes: every node keeps the codes below it, so a
+    heading ("6403"), subheading ("640399") or full code is one walk.
+    """
+
+    def __init__(self, codes=()):
+        self.root = {}
+        for code in codes:
+            self.insert(code)
+
+    def insert(self, code):
+        node = self.root
+        for digit in code:
+            node = node.setdefault(digit, {})
+            node.setdefault("", []).append(code)
+
+    def prefix(self, digits):
+        node = self.root
+        for digit in digits:
+            node = node.get(digit)
+            if node is None:
+                return []
+        return node.get("", [])
+
+
+_FTS_TOKEN = re.compile(r"[A-Za-z0-9]+")
+# Question words and tariff vocabulary that never occur in a line's
+# description; left in, they make "what is the hs code for green tea" match nothing
+_QUERY_STOP_WORDS = frozenset("""
+a about an and any are as at be by can classified classify code codes customs do does duty for from give hs
+how i import importing in into is it me my of on or please rate rates s show tariff tell the to under what
+whats which with
+""".split())
+
+
+class TariffIndex:
+    """
+    Read-only view of the tariff index. All tariff lines are held in memory
+    (a few thousand rows) with a code trie, so code lookups never touch
+    SQLite; description search uses the FTS5 table.
+    """
+
+    def __init__(self, db_path=TARIFF_INDEX_PATH):
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self.lines = {r["code"]: dict(r) for r in self._conn.execute("SELECT * FROM tariff_lines ORDER BY code")}
+        self.headings = dict(self._conn.execute("SELECT heading, description FROM headings").fetchall())
+        self.chapters = dict(self._conn.execute("SELECT chapter, title FROM chapters").fetchall())
+        self.trie = CodeTrie(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def lookup(self, code, limit=50):
+        """
+        Tariff lines under a code or code prefix ("6403", "6403.99", "64039900").
+        """
+        digits = re.sub(r"\D", "", str(code))
+        return [self.lines[c] for c in self.trie.prefix(digits)[:limit]] if digits else []
+
+    def duty_rate(self, code):
+        """The tariff line for an exact 8-digit code (or None)."""
+        return self.lines.get(re.sub(r"\D", "", str(code)))
+
+    def search(self, text, limit=5):
+        """
+        Tariff lines whose description matches `text`, best BM25 match first.
+        Question and stop words are dropped; lines matching every remaining
+        term come first, and if there are none, lines matching any of them.
+        """
+        terms = [t for t in _FTS_TOKEN.findall(text.lower()) if t not in _QUERY_STOP_WORDS]
+        if not terms:
+            return []
+        prefixes = [f'"{t}"*' for t in terms]
+        rows = self._match(" ".join(prefixes), limit)
+        if not rows and len(prefixes) > 1:
+            rows = self._match(" OR ".join(prefixes), limit)
+        return [self.lines[r[0]] for r in rows]
+
+    def _match(self, query, limit):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT l.code FROM tariff_fts JOIN tariff_lines l ON l.rowid = tariff_fts.rowid "
+                "WHERE tariff_fts MATCH ? ORDER BY bm25(tariff_fts, 2.0, 1.0) LIMIT ?",
+                (query, limit),
+            ).fetchall()
+
+    @staticmethod
+    def format_code(code):
+        return f"{code[:4]}.{code[4:6]}.{code[6:]}" if len(code) == 8 else code
+
+    def describe(self, line):
+        duty = (
+            f"SAARC {line['duty_saarc']:g}%, General {line['duty_general']:g}%"
+            if line["duty_general"] is not None else (line["duty_text"] or "n/a")
+        )
+        context = f"{line['context']} > " if line["context"] else ""
+        return f"{self.format_code(line['code'])}: {context}{line['description']} (unit {line['unit'] or 'n/a'}; duty {duty})"
+
+    def answer(self, query, limit=5):
+        """
+        Plain-text answer for the chatbot: code lookups when the query
+        contains an HS code, description search otherwise.
+        """
+        codes = re.findall(r"(?<!\d)\d{4}(?:\.?\d{2}){0,2}(?!\d)", query)
+        lines = [line for code in codes for line in self.lookup(code, limit)][:limit]
+        if not lines:
+            lines = self.search(query, limit)
+        if not lines:
+            return "No matching tariff line found in the Customs Tariff."
+        return "\n".join(self.describe(line) for line in lines)
+
+    def as_tool(self):
+        from langchain_core.tools import Tool
+
+        return Tool(
+            name="customs_tariff_lookup",
+            description=(
+                "Look up HS codes, descriptions, units and import duty rates (SAARC and general, %) in the "
+                "Customs Tariff. Input: an HS code/prefix such as 6403.99, or a product description."
+            ),
+            func=self.answer,
+        )
+
+
+def open_tariff_index(db_path=TARIFF_INDEX_PATH):
+    """The tariff index, or None when it has not been built yet."""
+    return TariffIndex(db_path) if os.path.exists(db_path) else None
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_tariff_index():
+    """
+    Process-wide index opened on first use; None (and retried on the next
+    call) while the index file does not exist.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = open_tariff_index()
+        return _shared
+
+
+if __name__ == "__main__":
+    count = build_tariff_index()
+    print(f"✅ Tariff index written to {TARIFF_INDEX_PATH}: {count} tariff lines")
@@ -0,0 +1,19 @@
+import re
+
+
+# ----------------------------- Token Estimation -----------------------------
+# A tokenizer round trip per message would cost more than it saves; for
+# budgeting prompt sections a word/punctuation count is close enough to the
+# Llama 3 tokenizer (about 1.3 tokens per English word).
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    return int(len(_PIECES.findall(text)) * 1.3) + 1
+
+
+def message_tokens(message):
+    # ~4 tokens of role/formatting overhead per chat message
+    return estimate_tokens(message.content if isinstance(message.content, str) else str(message.content)) + 4
@@ -1,27 +1,217 @@
 import requests
 import os
+import re
+import asyncio
+import threading
+from concurrent.futures import Future
+from urllib3.util.retry import Retry
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from src.cache import LRUCache
+from src.tariff_index import get_tariff_index
+
 load_dotenv()
 API_NINJA_KEY = os.getenv("API_NINJA_KEY")
 
+# -------------------------------
+# ⚙️ Settings
+# -------------------------------
+TRADE_API_BASE_URLS = {
+    "api_ninjas": os.getenv("API_NINJAS_BASE_URL", "https://api.api-ninjas.com"),
+    "uk_tariff": os.getenv("UK_TARIFF_BASE_URL", "https://api.trade-tariff.service.gov.uk"),
+    "comtrade": os.getenv("COMTRADE_BASE_URL", "https://comtradeapi.un.org"),
+    "taric": os.getenv("TARIC_BASE_URL", "https://api.taric.es"),
+}
+TRADE_API_CONNECT_TIMEOUT = float(os.getenv("TRADE_API_CONNECT_TIMEOUT", "3"))
+TRADE_API_READ_TIMEOUT = float(os.getenv("TRADE_API_READ_TIMEOUT", "10"))
+TRADE_API_RETRIES = int(os.getenv("TRADE_API_RETRIES", "3"))
+TRADE_API_POOL_SIZE = int(os.getenv("TRADE_API_POOL_SIZE", "20"))
+TRADE_API_CACHE_SIZE = int(os.getenv("TRADE_API_CACHE_SIZE", "2048"))
+# Lookups made while routing a chat question get one attempt with this
+# timeout (connect and read); on failure the question goes to RAG instead
+TRADE_API_ROUTING_TIMEOUT = float(os.getenv("TRADE_API_ROUTING_TIMEOUT", "1.5"))
+
+# HS descriptions and tariff lines change a few times a year; trade statistics monthly
+CACHE_TTLS = {
+    "hs_lookup": 7 * 86400,
+    "tariff": 86400,
+    "trade_stats": 6 * 3600,
+    "eu_docs": 86400,
+}
+
+
+def normalise_query(value):
+    """
+    Cache key form of a lookup argument: case, surrounding/double spaces and
+    the dots/spaces inside HS codes ("6403.99" == "640399") do not matter.
+    """
+    value = " ".join(str(value).lower().split())
+    if re.fullmatch(r"[\d. ]+", value):
+        value = re.sub(r"[. ]", "", value)
+    return value
+
+
+# -------------------------------
+# 🔌 Shared HTTP Client
+# -------------------------------
+class TradeApiClient:
+    """
+    One pooled requests.Session for all trade APIs, with timeouts, retry
+    with exponential backoff on 429/5xx, a TTL cache of decoded JSON and
+    coalescing of identical in-flight lookups (concurrent callers share one
+    HTTP request).
+    """
+
+    def __init__(self, base_urls=None, timeout=(TRADE_API_CONNECT_TIMEOUT, TRADE_API_READ_TIMEOUT),
+                 retries=TRADE_API_RETRIES, pool_size=TRADE_API_POOL_SIZE, cache_size=TRADE_API_CACHE_SIZE,
+                 cache=None):
+        self.base_urls = {**TRADE_API_BASE_URLS, **(base_urls or {})}
+        self.timeout = timeout
+        # Clients with different timeouts can share one cache
+        self.cache = cache if cache is not None else LRUCache(maxsize=cache_size)
+        self.requests_sent = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=len(self.base_urls), pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get_json(self, api, path, params=None, headers=None, kind=None):
+        """
+        GET base_urls[api] + path and return the decoded JSON, served from the
+        cache for CACHE_TTLS[kind] seconds.
+        """
+        key = (api, path, tuple(sorted((k, normalise_query(v)) for k, v in (params or {}).items())))
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                self.requests_sent += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            response = self.session.get(
+                self.base_urls[api] + path, params=params, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+            data = response.json()
+            self.cache.set(key, data, ttl=CACHE_TTLS.get(kind))
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    async def aget_json(self, api, path, params=None, headers=None, kind=None):
+        # requests is blocking; run it on the default executor so lookups fan out
+        return await asyncio.to_thread(self.get_json, api, path, params, headers, kind)
+
+    def stats(self):
+        return {"requests_sent": self.requests_sent, "coalesced": self.coalesced, "cache": self.cache.stats()}
+
+
+_client = None
+_routing_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TradeApiClient()
+        return _client
+
+
+def get_routing_client():
+    """
+    Client for lookups on the chat path (src/intent_router.py): one attempt,
+    TRADE_API_ROUTING_TIMEOUT, and the cache of get_client().
+    """
+    global _routing_client
+    client = get_client()
+    with _client_lock:
+        if _routing_client is None or _routing_client.cache is not client.cache:
+            _routing_client = TradeApiClient(
+                base_urls=client.base_urls,
+                timeout=(TRADE_API_ROUTING_TIMEOUT, TRADE_API_ROUTING_TIMEOUT),
+                retries=0,
+                cache=client.cache,
+            )
+        return _routing_client
+
+
+def set_client(client):
+    """Swap the shared client, e.g. for one pointed at the mock server."""
+    global _client
+    with _client_lock:
+        _client = client
+
 
 # -------------------------------
 # 🌐 HS Code Lookup (WCO or Similar)
 # -------------------------------
-def get_hs_code(product_name):
+def _hs_code_request(product_name):
+    return ("api_ninjas", "/v1/hslookup", {"query": product_name}, {"X-Api-Key": API_NINJA_KEY or ""}, "hs_lookup")
+
+
+def _format_hs_code(product_name, data):
+    if data:
+        return f"HS Code for {product_name}: {data[0]['hs_code']} - {data[0]['description']}"
+    return "No HS code found for that product."
+
+
+def _local_hs_code(product_name):
+    # The Customs Tariff index answers most lookups without a network call
+    index = get_tariff_index()
+    lines = index.search(product_name, limit=1) if index is not None else []
+    if lines:
+        return f"HS Code for {product_name}: {index.format_code(lines[0]['code'])} - {lines[0]['description']}"
+    return None
+
+
+def get_hs_code(product_name, client=None):
     """
-    Fetch HS code for a given product using a trade API or open dataset.
+    Fetch HS code for a given product from the local tariff index, falling
+    back to a trade API or open dataset.
     Example: product_name="leather shoes"
     """
     try:
-        url = f"https://api.api-ninjas.com/v1/hslookup?query={product_name}"
-        headers = {"X-Api-Key": "API_NINJA_KEY"}  # Replace with your key
-        response = requests.get(url, headers=headers)
-        data = response.json()
-        if data:
-            return f"HS Code for {product_name}: {data[0]['hs_code']} - {data[0]['description']}"
-        return "No HS code found for that product."
+        return _local_hs_code(product_name) or _format_hs_code(
+            product_name, (client or get_client()).get_json(*_hs_code_request(product_name))
+        )
+    except Exception as e:
+        return f"Error fetching HS code: {str(e)}"
+
+
+async def aget_hs_code(product_name):
+    local = _local_hs_code(product_name)
+    if local:
+        return local
+    try:
+        return _format_hs_code(product_name, await get_client().aget_json(*_hs_code_request(product_name)))
     except Exception as e:
         return f"Error fetching HS code: {str(e)}"
 
@@ -29,18 +219,30 @@ def get_hs_code(product_name):
 # -------------------------------
 # 💰 Tariff / Duty Calculation
 # -------------------------------
-def get_tariff_info(country_from, country_to, hs_code):
+def _tariff_request(hs_code):
+    return ("uk_tariff", f"/commodities/{normalise_query(hs_code)}.json", None, None, "tariff")
+
+
+def _format_tariff(country_to, hs_code, data):
+    if 'data' in data:
+        desc = data['data']['attributes']['description']
+        return f"Duty Info for HS {hs_code} ({desc}): Check tariff details in {country_to} customs portal."
+    return "No tariff information available."
+
+
+def get_tariff_info(country_from, country_to, hs_code, client=None):
     """
     Example API for duty rates (replace with Trade Tariff / USITC API endpoints).
     """
     try:
-        url = f"https://api.trade-tariff.service.gov.uk/commodities/{hs_code}.json"
-        response = requests.get(url)
-        data = response.json()
-        if 'data' in data:
-            desc = data['data']['attributes']['description']
-            return f"Duty Info for HS {hs_code} ({desc}): Check tariff details in {country_to} customs portal."
-        return "No tariff information available."
+        return _format_tariff(country_to, hs_code, (client or get_client()).get_json(*_tariff_request(hs_code)))
+    except Exception as e:
+        return f"Error fetching tariff info: {str(e)}"
+
+
+async def aget_tariff_info(country_from, country_to, hs_code):
+    try:
+        return _format_tariff(country_to, hs_code, await get_client().aget_json(*_tariff_request(hs_code)))
     except Exception as e:
         return f"Error fetching tariff info: {str(e)}"
 
@@ -48,75 +250,106 @@ def get_tariff_info(country_from, country_to, hs_code):
 # -------------------------------
 # 📊 Global Trade Data (UN Comtrade)
 # -------------------------------
-def get_trade_statistics(country, commodity):
+def _trade_statistics_request(country, commodity):
+    params = {"reporter": country, "cmdCode": commodity, "type": "C", "freq": "A", "px": "HS"}
+    return ("comtrade", "/public/v1/preview", params, None, "trade_stats")
+
+
+def get_trade_statistics(country, commodity, client=None):
     """
     Returns basic trade statistics for a product and country.
     """
     try:
-        url = (
-            "https://comtradeapi.un.org/public/v1/preview"
-            f"?reporter={country}&cmdCode={commodity}&type=C&freq=A&px=HS"
-        )
-        response = requests.get(url)
-        data = response.json()
+        data = (client or get_client()).get_json(*_trade_statistics_request(country, commodity))
         return data if data else "No trade data found."
     except Exception as e:
         return f"Error fetching trade statistics: {str(e)}"
 
 
-# -------------------------------
-# 📄 EU Documentation (TARIC API)
-# -------------------------------
-def get_eu_doc_requirements(hs_code):
+_FLOWS = {"M": "Imports", "X": "Exports", "RM": "Re-imports", "RX": "Re-exports"}
+
+
+def format_trade_statistics(country, commodity, data, limit=6):
     """
-    Fetch documentation/licensing requirements for goods entering the EU.
+    Comtrade records as one readable line each ("Imports 2023: US$ 1,234,567
+    (World)"), or None when the response has no usable figures.
     """
-    try:
-        url = f"https://api.taric.es/api/commodities/{hs_code}"
-        response = requests.get(url)
-        data = response.json()
-        if 'measures' in data:
-            return f"Documentation required for HS {hs_code}: {', '.join([m['measure_type'] for m in data['measures']])}"
-        return "No documentation found."
-    except Exception as e:
-        return f"Error fetching documentation: {str(e)}"
+    records = data.get("data") if isinstance(data, dict) else None
+    lines = []
+    for record in (records or [])[:limit]:
+        value = record.get("primaryValue")
+        if value is None:
+            continue
+        label = record.get("flowDesc") or _FLOWS.get(record.get("flowCode"), "Trade value")
+        if record.get("period"):
+            label += f" {record['period']}"
+        line = f"- {label}: US$ {float(value):,.0f}"
+        if record.get("netWgt"):
+            line += f", {float(record['netWgt']):,.0f} kg"
+        if record.get("partnerDesc"):
+            line += f" ({record['partnerDesc']})"
+        lines.append(line)
+    if not lines:
+        return None
+    reporter = (records[0].get("reporterDesc") if records else None) or country
+    description = records[0].get("cmdDesc") if records else None
+    heading = f"Trade statistics for HS {commodity}" + (f" ({description})" if description else "")
+    return f"{heading}, reported by {reporter} (UN Comtrade):\n" + "\n".join(lines)
 
 
+async def aget_trade_statistics(country, commodity):
+    try:
+        data = await get_client().aget_json(*_trade_statistics_request(country, commodity))
+        return data if data else "No trade data found."
+    except Exception as e:
+        return f"Error fetching trade statistics: {str(e)}"
 
 
-# app.py
+# -------------------------------
+# 📄 EU Documentation (TARIC API)
+# -------------------------------
+def _eu_doc_request(hs_code):
+    return ("taric", f"/api/commodities/{normalise_query(hs_code)}", None, None, "eu_docs")
 
 
-# @app.route("/get", methods=["GET", "POST"])
-# def chat():
-#     msg = request.form["msg"].lower()
-#     session_id = "default_user"
+def _format_eu_docs(hs_code, data):
+    if 'measures' in data:
+        return f"Documentation required for HS {hs_code}: {', '.join([m['measure_type'] for m in data['measures']])}"
+    return "No documentation found."
 
-#     # 🔍 Smart routing based on user query
-#     if "hs code" in msg:
-#         product = msg.replace("hs code for", "").strip()
-#         response_text = get_hs_code(product)
 
-    # elif "duty" in msg or "tariff" in msg:
-    #     # Example: "duty for hs 6403 from china to india"
-    #     words = msg.split()
-    #     hs_code = next((w for w in words if w.isdigit()), None)
-    #     response_text = get_tariff_info("china", "india", hs_code)
+def get_eu_doc_requirements(hs_code, client=None):
+    """
+    Fetch documentation/licensing requirements for goods entering the EU.
+    """
+    try:
+        return _format_eu_docs(hs_code, (client or get_client()).get_json(*_eu_doc_request(hs_code)))
+    except Exception as e:
+        return f"Error fetching documentation: {str(e)}"
 
-    # elif "trade data" in msg or "export" in msg:
-    #     response_text = get_trade_statistics("India", "TOTAL")
 
-    # elif "documentation" in msg or "eu" in msg:
-    #     hs_code = next((w for w in msg.split() if w.isdigit()), None)
-    #     response_text = get_eu_doc_requirements(hs_code)
+async def aget_eu_doc_requirements(hs_code):
+    try:
+        return _format_eu_docs(hs_code, await get_client().aget_json(*_eu_doc_request(hs_code)))
+    except Exception as e:
+        return f"Error fetching documentation: {str(e)}"
 
-    # else:
-    #     # Fall back to LLM RAG response
-    #     response = rag_chain_with_memory.invoke(
-    #         {"input": msg},
-    #         config={"configurable": {"session_id": session_id}}
-    #     )
-    #     response_text = response["answer"]
 
-    # print("Response:", response_text)
-    # return str(response_text)
\ No newline at end of file
+# -------------------------------
+# 🚀 Concurrent Fan-out
+# -------------------------------
+async def alookup_all(product_name=None, hs_code=None, country_to="india", country=None):
+    """
+    Run every lookup that applies to the given arguments concurrently and
+    return {name: result}. Total latency is that of the slowest API.
+    """
+    calls = {}
+    if product_name:
+        calls["hs_code"] = aget_hs_code(product_name)
+    if hs_code:
+        calls["tariff"] = aget_tariff_info(None, country_to, hs_code)
+        calls["eu_docs"] = aget_eu_doc_requirements(hs_code)
+        if country:
+            calls["trade_statistics"] = aget_trade_statistics(country, hs_code)
+    results = await asyncio.gather(*calls.values())
+    return dict(zip(calls, results))
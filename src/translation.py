@@ -0,0 +1,255 @@
+import os
+import time
+import sqlite3
+import hashlib
+import importlib
+import threading
+
+from dotenv import load_dotenv
+from langdetect import DetectorFactory, detect
+
+from src.cache import LRUCache
+
+load_dotenv()
+
+# ----------------------------- Settings -----------------------------
+# TRANSLATION_BACKEND: google (default) | offline | "package.module:factory"
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "google")
+# TRANSLATION_CACHE_PATH="" keeps the cache in memory only
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", os.path.join("artifacts", "translations.sqlite3"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "4096"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(30 * 86400)))
+# langdetect only needs a few sentences; long documents are cut to this prefix
+DETECT_PREFIX_CHARS = int(os.getenv("DETECT_PREFIX_CHARS", "500"))
+
+# Google rejects requests over 5000 characters
+MAX_REQUEST_CHARS = 4500
+SEGMENT_SEPARATOR = "\n\n"
+
+SUPPORTED_LANGS = {"en": "en", "hi": "hi", "ne": "ne", "mai": "mai"}
+
+# langdetect is randomised by default; seed it so detection is repeatable
+DetectorFactory.seed = 0
+
+
+# ----------------------------- Language Detection -----------------------------
+def detect_language(text, default="en"):
+    """
+    Detect the language of `text`, limited to SUPPORTED_LANGS.
+
+    Every supported non-English language is written in Devanagari, so pure
+    ASCII text is English without asking langdetect; other text is detected
+    on its first DETECT_PREFIX_CHARS characters only.
+    """
+    text = (text or "").strip()
+    if not text or text.isascii():
+        return default
+    try:
+        detected = detect(text[:DETECT_PREFIX_CHARS])
+    except Exception:
+        return default
+    return SUPPORTED_LANGS.get(detected, default)
+
+
+# ----------------------------- Backends -----------------------------
+class GoogleBackend:
+    """
+    deep_translator's GoogleTranslator. Segments are packed into as few
+    requests as possible by joining them with a blank line and splitting the
+    result; if the translator merges or splits segments the batch is redone
+    one segment per request.
+    """
+
+    name = "google"
+
+    def __init__(self):
+        self._translators = {}
+
+    def _translator(self, source, target):
+        from deep_translator import GoogleTranslator
+
+        key = (source, target)
+        if key not in self._translators:
+            self._translators[key] = GoogleTranslator(source=source, target=target)
+        return self._translators[key]
+
+    def translate_batch(self, texts, source, target):
+        translator = self._translator(source, target)
+        results = []
+        for group in _pack(texts, MAX_REQUEST_CHARS):
+            if len(group) > 1 and not any(SEGMENT_SEPARATOR in t for t in group):
+                parts = (translator.translate(SEGMENT_SEPARATOR.join(group)) or "").split(SEGMENT_SEPARATOR)
+                if len(parts) == len(group):
+                    results.extend(p.strip() for p in parts)
+                    continue
+            results.extend(translator.translate(t) or t for t in group)
+        return results
+
+
+class OfflineBackend:
+    """
+    Local stand-in for tests and air-gapped deployments. Applies `fn` to each
+    segment (identity by default, i.e. answers are served untranslated).
+    """
+
+    name = "offline"
+
+    def __init__(self, fn=None):
+        self.fn = fn or (lambda text, source, target: text)
+        self.calls = 0
+
+    def translate_batch(self, texts, source, target):
+        self.calls += 1
+        return [self.fn(text, source, target) for text in texts]
+
+
+def _pack(texts, max_chars):
+    group, size = [], 0
+    for text in texts:
+        if group and size + len(text) + len(SEGMENT_SEPARATOR) > max_chars:
+            yield group
+            group, size = [], 0
+        group.append(text)
+        size += len(text) + len(SEGMENT_SEPARATOR)
+    if group:
+        yield group
+
+
+def load_backend(spec=None):
+    spec = spec or TRANSLATION_BACKEND
+    if spec == "google":
+        return GoogleBackend()
+    if spec == "offline":
+        return OfflineBackend()
+    if ":" in spec:
+        module, attr = spec.split(":", 1)
+        return getattr(importlib.import_module(module), attr)()
+    raise ValueError(f"Unknown TRANSLATION_BACKEND: {spec}")
+
+
+# ----------------------------- Disk Cache -----------------------------
+class SQLiteTranslationCache:
+    """
+    Translations shared by every worker and kept across restarts. Rows past
+    their TTL are ignored on read.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, ttl=TRANSLATION_CACHE_TTL):
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY, translation TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                found.update(self._conn.execute(
+                    f"SELECT key, translation FROM translations WHERE key IN ({','.join('?' * len(part))})"
+                    " AND expires_at > ?",
+                    (*part, time.time()),
+                ).fetchall())
+        return found
+
+    def set_many(self, items):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, translation, expires_at) VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+            self._conn.commit()
+
+
+# ----------------------------- Service -----------------------------
+def _cache_key(source, target, text):
+    return hashlib.sha256(f"{source}\x00{target}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class TranslationService:
+    """
+    Cached, batched translation. Lookups go memory LRU -> disk cache ->
+    backend, and all misses of one call are sent to the backend together.
+    """
+
+    def __init__(self, backend=None, cache_size=TRANSLATION_CACHE_SIZE, disk_cache=None):
+        self.backend = backend or load_backend()
+        self.memory = LRUCache(maxsize=cache_size)
+        self.disk = disk_cache
+        self.backend_segments = 0
+
+    def translate_batch(self, texts, source, target):
+        if source == target:
+            return list(texts)
+        keys = [_cache_key(source, target, t) for t in texts]
+        results = {}
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                results[key] = value
+
+        missing = [k for k in dict.fromkeys(keys) if k not in results]
+        if missing and self.disk is not None:
+            for key, value in self.disk.get_many(missing).items():
+                results[key] = value
+                self.memory.set(key, value)
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in results and key not in todo:
+                todo[key] = text
+        if todo:
+            translated = self.backend.translate_batch(list(todo.values()), source, target)
+            self.backend_segments += len(todo)
+            fresh = dict(zip(todo, translated))
+            for key, value in fresh.items():
+                results[key] = value
+                self.memory.set(key, value)
+            if self.disk is not None:
+                self.disk.set_many(fresh)
+        return [results[k] for k in keys]
+
+    def translate(self, text, source, target):
+        """
+        Translate a whole text in one round trip: it is split into lines,
+        blank lines and layout are kept, and only uncached lines are sent.
+        """
+        if source == target or not text.strip():
+            return text
+        lines = text.split("\n")
+        segments = [line.strip() for line in lines if line.strip()]
+        translated = iter(self.translate_batch(segments, source, target))
+        out = []
+        for line in lines:
+            if line.strip():
+                indent = line[:len(line) - len(line.lstrip())]
+                out.append(indent + next(translated))
+            else:
+                out.append(line)
+        return "\n".join(out)
+
+    def translator(self, source, target):
+        return lambda text: self.translate(text, source, target)
+
+    def detect(self, text):
+        return detect_language(text)
+
+    def stats(self):
+        return {
+            "backend": getattr(self.backend, "name", type(self.backend).__name__),
+            "memory": self.memory.stats(),
+            "backend_segments": self.backend_segments,
+        }
+
+
+def build_translation_service(backend=None):
+    disk = SQLiteTranslationCache() if TRANSLATION_CACHE_PATH else None
+    return TranslationService(load_backend(backend), disk_cache=disk)
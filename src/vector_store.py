@@ -0,0 +1,304 @@
+import os
+import json
+import uuid
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.versioned_dir import current_dir, read_current, write_version
+
+load_dotenv()
+
+# ----------------------------- Backend Settings -----------------------------
+# VECTOR_BACKEND=pinecone (default) keeps the hosted index; VECTOR_BACKEND=local
+# serves retrieval from the on-disk index below, with no network round trip.
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join("artifacts", "local_index"))
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+PINECONE_INDEX_NAME = "customs-clearance-chatbot"
+
+INDEX_FORMAT_VERSION = 1
+_INDEX_FILES = ("index.json", "vectors.npy", "scales.npy", "metadata.json")
+
+
+def _normalise_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# ----------------------------- Local Vector Index -----------------------------
+class LocalVectorIndex:
+    """
+    Exact cosine-similarity index stored as a NumPy matrix on disk.
+
+    Layout of each version directory under `path` (see src/versioned_dir.py;
+    CURRENT names the live one):
+      index.json     header (format version, dtype, dimension, count)
+      vectors.npy    float32 [n, dim] unit vectors, or int8 [n, dim] when quantised
+      scales.npy     float32 [n] per-row dequantisation scale (int8 only)
+      metadata.json  [{"id": ..., "metadata": {..., "text": ...}}, ...] in row order
+
+    The matrix is opened memory-mapped, so loading is instant and the OS page
+    cache shares it between workers. upsert()/delete() mirror the Pinecone
+    index API used by the ingestion pipeline; changes are written by flush().
+
+    An index stored with another dtype than `dtype` is served as stored (with
+    a warning) until it is rebuilt: vectors are only encoded with `dtype`
+    once the index is empty. store_index.py rebuilds it when
+    LOCAL_INDEX_DTYPE changes.
+    """
+
+    def __init__(self, path, dtype="float32"):
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported local index dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.requested_dtype = dtype
+        self.ids = []
+        self.metadata = []
+        self._rows = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._scales = None
+        self._dirty = False
+        if current_dir(path, legacy_file="index.json") is not None:
+            read_current(path, self._load, legacy_file="index.json")
+        if self.dtype != dtype:
+            print(f"⚠️ Local index at {path} is stored as {self.dtype}, not {dtype}; "
+                  f"serving it as {self.dtype} until python -m src.store_index rebuilds it.")
+
+    # -------- Persistence --------
+    def _load(self, directory):
+        with open(os.path.join(directory, "index.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported local index version: {header.get('version')}")
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        scales = np.load(os.path.join(directory, "scales.npy"), mmap_mode="r") if header["dtype"] == "int8" else None
+        with open(os.path.join(directory, "metadata.json"), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        if len(records) != header["count"] or vectors.shape[0] != header["count"]:
+            raise ValueError(f"❌ Local index at {self.path} is incomplete "
+                             f"(header {header['count']}, vectors {vectors.shape[0]}, records {len(records)})")
+        self.dtype = header["dtype"]
+        self._vectors = vectors
+        self._scales = scales
+        self.ids = [r["id"] for r in records]
+        self.metadata = [r["metadata"] for r in records]
+        self._rows = {vid: row for row, vid in enumerate(self.ids)}
+
+    def flush(self):
+        """
+        Write the index if it changed. All files go to a new version
+        directory that becomes current in one pointer swap, so a reader
+        loads either the old or the new index, never a mix of the two.
+        """
+        if not self._dirty:
+            return
+        vectors = np.ascontiguousarray(self._vectors)
+        scales = np.ascontiguousarray(self._scales) if self.dtype == "int8" else None
+        records = [{"id": vid, "metadata": meta} for vid, meta in zip(self.ids, self.metadata)]
+        header = {
+            "version": INDEX_FORMAT_VERSION,
+            "dtype": self.dtype,
+            "dimension": self.dimension,
+            "count": len(self.ids),
+        }
+
+        def _write(directory):
+            np.save(os.path.join(directory, "vectors.npy"), vectors)
+            if scales is not None:
+                np.save(os.path.join(directory, "scales.npy"), scales)
+            with open(os.path.join(directory, "metadata.json"), "w", encoding="utf-8") as f:
+                json.dump(records, f)
+            with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+                json.dump(header, f)
+
+        write_version(self.path, _write, legacy_files=_INDEX_FILES)
+        self._dirty = False
+
+    # -------- Storage helpers --------
+    @property
+    def dimension(self):
+        return int(self._vectors.shape[1]) if self._vectors.ndim == 2 else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _encode(self, unit_vectors):
+        if self.dtype == "float32":
+            return unit_vectors.astype(np.float32), None
+        scales = np.abs(unit_vectors).max(axis=1)
+        scales[scales == 0] = 1.0
+        quantised = np.round(unit_vectors / scales[:, None] * 127).astype(np.int8)
+        return quantised, (scales / 127).astype(np.float32)
+
+    def _materialise(self):
+        # Copy the read-only memory map before the first in-place change
+        if isinstance(self._vectors, np.memmap) or not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+            if self._scales is not None:
+                self._scales = np.array(self._scales)
+
+    # -------- Pinecone-style write API --------
+    def upsert(self, vectors):
+        if not vectors:
+            return
+        # As in Pinecone, the last write of an ID within one batch wins
+        last = {v["id"]: i for i, v in enumerate(vectors)}
+        if len(last) < len(vectors):
+            vectors = [vectors[i] for i in sorted(last.values())]
+        values = _normalise_rows(np.asarray([v["values"] for v in vectors], dtype=np.float32))
+        if len(self.ids) == 0:
+            # A new index, or one emptied for a rebuild, takes the requested dtype
+            self.dtype = self.requested_dtype
+        encoded, scales = self._encode(values)
+        self._materialise()
+        if len(self.ids) == 0:
+            self._vectors = np.zeros((0, values.shape[1]), dtype=encoded.dtype)
+            self._scales = np.zeros(0, dtype=np.float32) if scales is not None else None
+        elif values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} != index dimension {self.dimension}")
+
+        new_rows = []
+        for i, v in enumerate(vectors):
+            row = self._rows.get(v["id"])
+            if row is None:
+                new_rows.append(i)
+                continue
+            self._vectors[row] = encoded[i]
+            self.metadata[row] = v.get("metadata", {})
+            if scales is not None:
+                self._scales[row] = scales[i]
+
+        if new_rows:
+            start = len(self.ids)
+            self._vectors = np.concatenate([self._vectors, encoded[new_rows]])
+            if scales is not None:
+                self._scales = np.concatenate([self._scales, scales[new_rows]])
+            for offset, i in enumerate(new_rows):
+                self.ids.append(vectors[i]["id"])
+                self.metadata.append(vectors[i].get("metadata", {}))
+                self._rows[vectors[i]["id"]] = start + offset
+        self._dirty = True
+
+    def delete(self, ids):
+        drop = {self._rows[vid] for vid in ids if vid in self._rows}
+        if not drop:
+            return
+        keep = np.array([row for row in range(len(self.ids)) if row not in drop], dtype=np.int64)
+        self._vectors = np.asarray(self._vectors)[keep]
+        if self._scales is not None:
+            self._scales = np.asarray(self._scales)[keep]
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self._rows = {vid: row for row, vid in enumerate(self.ids)}
+        self._dirty = True
+
+    # -------- Search --------
+    def query(self, vector, top_k=3):
+        """
+        Exact top-k by cosine similarity: one matrix-vector product over the
+        whole corpus plus an O(n) argpartition. Returns [(row, score), ...].
+        """
+        n = len(self.ids)
+        if n == 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        if self.dtype == "int8":
+            scores = (self._vectors @ q) * self._scales
+        else:
+            scores = self._vectors @ q
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+
+# ----------------------------- LangChain Wrapper -----------------------------
+class LocalVectorStore(VectorStore):
+    """
+    LangChain VectorStore over a LocalVectorIndex, so the existing
+    `as_retriever(search_type="similarity", search_kwargs={"k": 3})` call works
+    unchanged. Page content lives in metadata["text"], as with Pinecone.
+    """
+
+    def __init__(self, index, embedding, text_key="text"):
+        self.index = index
+        self._embedding = embedding
+        self.text_key = text_key
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _to_document(self, row):
+        metadata = dict(self.index.metadata[row])
+        text = metadata.pop(self.text_key, "")
+        return Document(page_content=text, metadata=metadata, id=self.index.ids[row])
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, **kwargs):
+        return [(self._to_document(row), score) for row, score in self.index.query(embedding, k)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.upsert(vectors=[
+            {"id": vid, "values": vec, "metadata": {**meta, self.text_key: text}}
+            for vid, vec, meta, text in zip(ids, vectors, metadatas, texts)
+        ])
+        self.index.flush()
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, path=LOCAL_INDEX_DIR,
+                   dtype=LOCAL_INDEX_DTYPE, **kwargs):
+        store = cls(LocalVectorIndex(path, dtype=dtype), embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+def manifest_settings(index, settings):
+    """
+    Ingestion manifest settings for `index`. A local index's dtype is one of
+    them, so changing LOCAL_INDEX_DTYPE re-stores every vector like a model change.
+    """
+    if isinstance(index, LocalVectorIndex):
+        return {**settings, "local_index_dtype": index.requested_dtype}
+    return settings
+
+
+# ----------------------------- Backend Selection -----------------------------
+def open_vector_store(embeddings, backend=None):
+    """
+    Open the configured vector store for retrieval.
+    """
+    backend = backend or VECTOR_BACKEND
+    if backend == "local":
+        index = LocalVectorIndex(LOCAL_INDEX_DIR, dtype=LOCAL_INDEX_DTYPE)
+        if len(index) == 0:
+            raise ValueError(f"❌ Local index at {LOCAL_INDEX_DIR} is empty. Run src/store_index.py first.")
+        return LocalVectorStore(index, embeddings)
+    if backend == "pinecone":
+        from langchain_pinecone import PineconeVectorStore
+
+        return PineconeVectorStore.from_existing_index(index_name=PINECONE_INDEX_NAME, embedding=embeddings)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
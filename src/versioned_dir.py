@@ -0,0 +1,81 @@
+"""
+Directories whose files are replaced together (the local vector index, the
+embedding artifact).
+
+A writer builds a complete new version in a fresh subdirectory and then
+switches the CURRENT pointer file to it with a single os.replace. A reader
+resolves CURRENT once and reads every file from that version, so it never
+combines files of two versions. The previous version is kept, so a reader
+that resolved the pointer just before a switch can still finish; older
+versions are removed.
+
+Directories written before versioning (files directly in `path`) are still
+read, and their files are removed by the first versioned write.
+"""
+import os
+import time
+import uuid
+import shutil
+
+POINTER = "CURRENT"
+_PREFIX = "v-"
+# A version pruned between resolving the pointer and opening its files is rare; retry that many times
+READ_ATTEMPTS = 3
+
+
+def current_dir(path, legacy_file=None):
+    """The directory holding the current version's files, or None if nothing was written yet."""
+    try:
+        with open(os.path.join(path, POINTER), "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        if legacy_file and os.path.exists(os.path.join(path, legacy_file)):
+            return path
+        return None
+
+
+def read_current(path, read, legacy_file=None):
+    """
+    read(directory) on the current version. Retried when a concurrent writer
+    removed the version after the pointer was resolved.
+    """
+    for attempt in range(READ_ATTEMPTS):
+        directory = current_dir(path, legacy_file)
+        if directory is None:
+            raise FileNotFoundError(f"Nothing written at {path}")
+        try:
+            return read(directory)
+        except FileNotFoundError:
+            if attempt == READ_ATTEMPTS - 1:
+                raise
+
+
+def write_version(path, write, legacy_files=()):
+    """
+    write(directory) into a new version directory, then make it current.
+    Returns the new version directory.
+    """
+    os.makedirs(path, exist_ok=True)
+    name = f"{_PREFIX}{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(path, name)
+    os.makedirs(directory)
+    try:
+        write(directory)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    previous = current_dir(path)
+    tmp = os.path.join(path, POINTER + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp, os.path.join(path, POINTER))
+
+    keep = {name, os.path.basename(previous) if previous else None}
+    for entry in os.listdir(path):
+        if entry.startswith(_PREFIX) and entry not in keep:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+    for legacy in legacy_files:
+        if os.path.exists(os.path.join(path, legacy)):
+            os.remove(os.path.join(path, legacy))
+    return directory
@@ -0,0 +1,195 @@
+// --------------------------
+// 🎙️ VOICE TOGGLE
+// --------------------------
+let voiceEnabled = false;
+let recognition;
+
+document.getElementById("voiceToggle").addEventListener("click", function () {
+    voiceEnabled = !voiceEnabled;
+
+    if (voiceEnabled) {
+        this.innerText = "🎙️ Voice: ON";
+        startVoiceRecognition();
+    } else {
+        this.innerText = "🎙️ Voice: OFF";
+        if (recognition) recognition.stop();
+    }
+});
+
+// --------------------------
+// 🎤 Speech-To-Text
+// --------------------------
+function startVoiceRecognition() {
+    if (!('webkitSpeechRecognition' in window)) {
+        alert("Your browser does not support voice recognition.");
+        return;
+    }
+
+    recognition = new webkitSpeechRecognition();
+    recognition.lang = "en-IN";
+    recognition.continuous = false;
+    recognition.interimResults = false;
+
+    recognition.start();
+
+    recognition.onresult = function (event) {
+        const text = event.results[0][0].transcript;
+        console.log("🎤 Voice Input:", text);
+        sendMessage(text);
+    };
+
+    recognition.onerror = () => recognition.stop();
+    recognition.onend = () => { if (voiceEnabled) recognition.start(); };
+}
+
+// --------------------------
+// 🔊 Text-to-Speech (Play TTS)
+// --------------------------
+function speakText(text) {
+    fetch("/tts", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ text })
+    })
+    .then(res => res.json())
+    .then(data => {
+        const player = document.getElementById("audioPlayer");
+        player.src = data.audio_url;
+        player.play();
+    });
+}
+
+// --------------------------
+// 📡 Server-Sent Events over fetch (POST)
+// --------------------------
+// Calls onEvent(eventName, data) for every event; resolves when the stream ends.
+// Falls back to a plain JSON body when the server answered without streaming
+// (validation errors, empty documents).
+async function readEventStream(response, onEvent) {
+    const contentType = response.headers.get("Content-Type") || "";
+    if (!contentType.startsWith("text/event-stream")) {
+        const data = await response.json();
+        onEvent(data.error ? "error" : "reply", data);
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventName = "message";
+            let data = "";
+            for (const line of raw.split("\n")) {
+                if (line.startsWith("event: ")) eventName = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            }
+            onEvent(eventName, data ? JSON.parse(data) : {});
+        }
+    }
+}
+
+function addBotMessage(text) {
+    const chatBox = document.getElementById("chat-box");
+    const botMessage = document.createElement("div");
+    botMessage.className = "bot-message";
+    botMessage.innerText = text;
+    chatBox.appendChild(botMessage);
+    chatBox.scrollTop = chatBox.scrollHeight;
+    return botMessage;
+}
+
+// --------------------------
+// 📩 Chat Function (streamed)
+// --------------------------
+function sendMessage(userText = null) {
+    let userInput = userText || document.getElementById("user-input").value.trim();
+    if (!userInput) return;
+
+    let chatBox = document.getElementById("chat-box");
+
+    let userMessage = document.createElement("div");
+    userMessage.className = "user-message";
+    userMessage.innerText = userInput;
+    chatBox.appendChild(userMessage);
+
+    const botMessage = addBotMessage("");
+    let botReply = "";
+
+    fetch("/get/stream", {
+        method: "POST",
+        body: new URLSearchParams({ msg: userInput }),
+        headers: { "Content-Type": "application/x-www-form-urlencoded" }
+    })
+    .then(response => readEventStream(response, (event, data) => {
+        if (event === "message") {
+            botReply += data.text;
+            botMessage.innerText = botReply;
+            chatBox.scrollTop = chatBox.scrollHeight;
+        } else if (event === "error") {
+            botMessage.innerText = "❌ Error: " + data.error;
+        }
+    }))
+    .then(() => {
+        // ➤ Speak LLM response
+        if (voiceEnabled && botReply) speakText(botReply);
+    });
+
+    document.getElementById("user-input").value = "";
+}
+
+// Enter key = send
+document.getElementById("user-input").addEventListener("keypress", function(event) {
+    if (event.key === "Enter") sendMessage();
+});
+
+// --------------------------
+// 📤 File Upload (streamed)
+// --------------------------
+function uploadFile() {
+    const fileInput = document.getElementById("fileInput");
+    if (!fileInput.files.length) {
+        alert("Please select a file!");
+        return;
+    }
+
+    const formData = new FormData();
+    formData.append("file", fileInput.files[0]);
+
+    let chatBox = document.getElementById("chat-box");
+    const botMessage = addBotMessage("📤 Processing your document...");
+    const sections = { verification: "", analysis: "" };
+
+    function render() {
+        let result = "✅ Verification Result:\n" + sections.verification;
+        if (sections.analysis) result += "\n\n📄 Document Analysis:\n" + sections.analysis;
+        botMessage.innerText = result;
+        chatBox.scrollTop = chatBox.scrollHeight;
+        return result;
+    }
+
+    fetch("/upload/stream", { method: "POST", body: formData })
+    .then(response => readEventStream(response, (event, data) => {
+        if (event === "message") {
+            sections[data.stage] += data.text;
+            render();
+        } else if (event === "reply") {
+            botMessage.innerText = data.reply;
+        } else if (event === "error") {
+            botMessage.innerText = "❌ Error: " + data.error;
+        }
+    }))
+    .then(() => {
+        // Speak if voice mode is ON
+        if (voiceEnabled && sections.verification) speakText(render());
+    });
+}
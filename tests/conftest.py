@@ -0,0 +1,57 @@
+import re
+
+import pytest
+
+from src.tariff_index import CodeTrie, TariffIndex
+
+
+def tariff_line(code, description, general, saarc=None, duty_text=None, context=""):
+    return {
+        "code": code, "heading": code[:4], "subheading": code[:6], "description": description,
+        "context": context, "unit": "kg", "duty_saarc": saarc if saarc is not None else general,
+        "duty_general": general, "duty_text": duty_text or f"{general:g} {general:g}", "page": 1,
+    }
+
+
+class InMemoryTariffIndex:
+    """The code lookups of TariffIndex over a few lines, without SQLite."""
+
+    format_code = staticmethod(TariffIndex.format_code)
+
+    def __init__(self, lines):
+        self.lines = {line["code"]: line for line in lines}
+        self.trie = CodeTrie(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def lookup(self, code, limit=50):
+        digits = re.sub(r"\D", "", str(code))
+        return [self.lines[c] for c in self.trie.prefix(digits)[:limit]] if digits else []
+
+    def duty_rate(self, code):
+        return self.lines.get(re.sub(r"\D", "", str(code)))
+
+
+@pytest.fixture
+def tariff_index():
+    return InMemoryTariffIndex([
+        tariff_line("09021000", "Green tea in immediate packings", 40.0, saarc=30.0),
+        tariff_line("64039900", "Other", 40.0, context="Footwear > Other footwear"),
+        tariff_line("85171300", "Smartphones", 10.0),
+        tariff_line("85171400", "Other telephones for cellular networks", 10.0),
+    ])
+
+
+@pytest.fixture
+def mock_trade_api():
+    """The mock trade API server, with the shared trade API client pointed at it."""
+    from src.mock_trade_api import MockTradeApi
+    from src.trade_api_integration import TradeApiClient, set_client
+
+    with MockTradeApi() as mock:
+        set_client(TradeApiClient(base_urls=mock.base_urls, retries=2))
+        try:
+            yield mock
+        finally:
+            set_client(None)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from src.answer_cache import InMemoryAnswerStore, SQLiteAnswerStore, SemanticAnswerCache
+
+
+def _vector(i):
+    v = np.zeros(8, dtype=np.float32)
+    v[i % 8] = 1.0
+    return v
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store_factory(request, tmp_path):
+    def build(max_entries):
+        if request.param == "memory":
+            return InMemoryAnswerStore(max_entries=max_entries)
+        return SQLiteAnswerStore(path=str(tmp_path / "answers.sqlite3"), max_entries=max_entries)
+    return build
+
+
+def test_max_entries_counts_answers_not_contexts(store_factory):
+    store = store_factory(max_entries=5)
+    for i in range(4):
+        store.add("fp-a", _vector(i), f"a{i}")
+    for i in range(4):
+        store.add("fp-b", _vector(i), f"b{i}")
+
+    assert len(store) == 5
+    assert [a for _, a in store.candidates("fp-b")] == ["b0", "b1", "b2", "b3"]
+    assert [a for _, a in store.candidates("fp-a")] == ["a3"]
+
+
+def test_in_memory_store_evicts_least_recently_used_context_first():
+    store = InMemoryAnswerStore(max_entries=4)
+    store.add("fp-a", _vector(0), "a0")
+    store.add("fp-a", _vector(1), "a1")
+    store.add("fp-b", _vector(0), "b0")
+    store.add("fp-b", _vector(1), "b1")
+    store.candidates("fp-a")
+    store.add("fp-c", _vector(0), "c0")
+
+    assert len(store) == 4
+    assert [a for _, a in store.candidates("fp-b")] == ["b1"]
+    assert len(store.candidates("fp-a")) == 2
+
+
+def test_lookup_matches_paraphrases_of_the_same_context():
+    cache = SemanticAnswerCache(InMemoryAnswerStore(), threshold=0.95)
+    cache.add(_vector(0), "fp", "cached")
+
+    assert cache.lookup(_vector(0) + 0.01, "fp") == "cached"
+    assert cache.lookup(_vector(0), "other-fp") is None
+    assert cache.lookup(_vector(1), "fp") is None
+    assert cache.stats()["hits"] == 1
@@ -0,0 +1,32 @@
+import app as flask_app
+from src.benchmark import FlaskClient, Workload, compare, run_load
+from src.stand_ins import install_stand_ins
+from src.trade_api_integration import set_client
+
+CORPUS = [
+    "Goods imported into Nepal need a customs declaration, a commercial invoice, a packing list and a bill of lading.",
+    "The customs value of imported goods is the transaction value plus freight and insurance up to the border.",
+    "Customs clearance at the border starts with lodging the declaration in ASYCUDA and paying the assessed duty.",
+]
+
+
+def test_load_against_offline_stand_ins(tmp_path, monkeypatch):
+    # install_stand_ins replaces registrations in place; restore the originals afterwards
+    monkeypatch.setattr(flask_app.registry, "_resources", dict(flask_app.registry._resources))
+    mock = install_stand_ins(flask_app.registry, CORPUS, answer_cache=False, index_dir=str(tmp_path / "index"))
+    try:
+        workload = Workload(12, upload_ratio=0.2, stream_ratio=0.3, invoices=None, seed=3)
+        report = run_load(FlaskClient(flask_app.app), workload, concurrency=2)
+    finally:
+        mock.stop()
+        set_client(None)
+        # drop resources built on top of the stand-ins (chains, retrievers)
+        flask_app.registry.reset()
+
+    endpoints = report["endpoints"]
+    assert sum(row["count"] for row in endpoints.values()) == 12
+    assert set(endpoints) == {"/get", "/get/stream", "/upload"}
+    assert all(row["errors"] == 0 for row in endpoints.values()), endpoints
+    assert report["stages"] and report["throughput_rps"] > 0
+    # a report is never a regression against itself
+    assert compare(report, report, tolerance=0.0) == []
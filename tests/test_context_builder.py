@@ -0,0 +1,48 @@
+from langchain_core.documents import Document
+
+from src.context_builder import assemble_context, dedupe_sentences, truncate_to_tokens
+from src.tokens import estimate_tokens
+
+
+def _doc(text, source="a.pdf"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+def test_dedupe_drops_chunk_overlap():
+    first = _doc("Goods must be declared at the border. Duty is paid before release of the goods.")
+    # The next chunk starts mid-sentence inside the overlap
+    second = _doc("paid before release of the goods.\nA bill of lading is required for sea freight.")
+    grouped = dedupe_sentences([first, second])
+    assert grouped[1][1] == ["A bill of lading is required for sea freight."]
+
+
+def test_dedupe_matches_whole_words_only():
+    first = _doc("Otherwise the leaves are steamed and dried before export.")
+    second = _doc("0902.10.00\nOther\nTea\nthe leaves are steamed and dried")
+    kept = dedupe_sentences([first, second])[1][1]
+    # "Other" and "Tea" only occur inside "Otherwise" and "steamed"; short rows are never dropped
+    assert kept == ["0902.10.00", "Other", "Tea"]
+
+
+def test_dedupe_keeps_repeats_within_a_document():
+    text = "0403.10.00 Yogurt kg 10 15\n0403.10.00 Yogurt kg 10 15"
+    assert dedupe_sentences([_doc(text)])[0][1] == ["0403.10.00 Yogurt kg 10 15"] * 2
+
+
+def test_assemble_context_keeps_matching_sentences_within_budget():
+    documents = [
+        _doc("Footwear with leather uppers falls under heading 6403. " + "Unrelated filler sentence here. " * 40),
+        _doc("Green tea is classified under 0902.10.00. Black tea is classified under 0902.30.00."),
+    ]
+    result = assemble_context("what is the hs code for green tea", documents, budget=60)
+    text = " ".join(d.page_content for d in result)
+    assert "Green tea is classified under 0902.10.00." in text
+    assert "filler" not in text
+    assert sum(estimate_tokens(d.page_content) for d in result) <= 60
+    assert all(d.metadata == {"source": "a.pdf"} for d in result)
+
+
+def test_truncate_to_tokens():
+    text = "word " * 500
+    assert estimate_tokens(truncate_to_tokens(text, 50)) <= 52
+    assert truncate_to_tokens("short", 50) == "short"
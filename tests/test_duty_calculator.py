@@ -0,0 +1,54 @@
+import pytest
+
+from src.duty_calculator import DutyCalculator, parse_specific_duty
+
+
+@pytest.fixture
+def calculator(tariff_index):
+    return DutyCalculator(index=tariff_index, vat_rate=13, excise_rates={}, levies={},
+                          exchange_rates={"NPR": 1.0, "INR": 1.6})
+
+
+def test_cif_duty_and_vat(calculator):
+    r = calculator.calculate({"hs_code": "0902.10.00", "value": 1000, "incoterm": "CIF"})
+    assert r["error"] is None
+    assert r["assessable_value"] == 1000
+    assert r["customs_duty"] == 400
+    assert r["vat"] == pytest.approx(182.0)
+    assert r["total_taxes"] == pytest.approx(582.0)
+
+
+def test_saarc_origin_gets_preferential_rate(calculator):
+    r = calculator.calculate({"hs_code": "09021000", "value": 1000, "incoterm": "CIF", "origin": "India"})
+    assert r["duty_rate"] == 30
+
+
+@pytest.mark.parametrize("code", ["6403.99", "640399", "6403"])
+def test_subheading_with_one_line_resolves(calculator, code):
+    r = calculator.calculate({"hs_code": code, "value": 1000})
+    assert r["error"] is None
+    assert r["hs_code"] == "64039900"
+
+
+def test_ambiguous_subheading_is_an_error(calculator):
+    r = calculator.calculate({"hs_code": "8517.1", "value": 1000})
+    assert r["error"] == "no tariff line for 85171"
+
+
+def test_missing_exchange_rate(calculator):
+    r = calculator.calculate({"hs_code": "85171300", "value": 1000, "currency": "USD"})
+    assert r["error"].startswith("no exchange rate for USD")
+
+
+def test_parse_specific_duty():
+    assert parse_specific_duty("Per ltr. Rs.300") == (300.0, "ltr")
+    assert parse_specific_duty("Per thousand sticks Rs. 4,500") == (4500.0, "thousand sticks")
+    assert parse_specific_duty("40 40") is None
+
+
+def test_batch_endpoint_rejects_lines_that_are_not_objects():
+    from app import run_duty_calculation
+
+    body, status = run_duty_calculation({"lines": [1, "x", {"hs_code": "0902.10", "value": 100}]})
+    assert status == 400
+    assert body["error"] == "Invoice lines at index 0, 1 are not JSON objects"
@@ -0,0 +1,76 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from src.embedding_artifact import EmbeddingArtifact, build_artifact, write_artifact
+from src.versioned_dir import POINTER
+
+SAMPLE_PDF = os.path.join(os.path.dirname(__file__), os.pardir, "data", "np_e.pdf")
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [[float(len(t)), float(sum(map(ord, t)) % 97), 1.0, 0.5] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    shutil.copy(SAMPLE_PDF, directory / "np_e.pdf")
+    return str(directory)
+
+
+def _build(data_dir, path, dtype):
+    model = CountingEmbeddings()
+    artifact, stats = build_artifact(data_dir, path, lambda: model, dtype=dtype, max_workers=1)
+    return artifact, stats, model
+
+
+def test_rebuilds_swap_versions_and_reuse_unchanged_files(data_dir, tmp_path):
+    path = str(tmp_path / "artifact")
+    first, stats, model = _build(data_dir, path, "float32")
+    assert len(first) > 0 and model.embedded == len(first)
+    assert os.path.exists(os.path.join(path, POINTER))
+    assert os.path.dirname(first.path) == path
+
+    second, stats, model = _build(data_dir, path, "float32")
+    assert model.embedded == 0 and stats["reused_files"] == 1
+    np.testing.assert_array_equal(second.unit_vectors(), first.unit_vectors())
+
+
+def test_dtype_change_embeds_again(data_dir, tmp_path):
+    path = str(tmp_path / "artifact")
+    first, _, _ = _build(data_dir, path, "int8")
+    second, stats, model = _build(data_dir, path, "float32")
+
+    assert second.header["dtype"] == "float32"
+    assert model.embedded == len(second) and stats["reused_vectors"] == 0
+    # float32 vectors come from the model, not from the int8 values
+    assert not np.array_equal(second.unit_vectors(), first.unit_vectors())
+
+
+def test_flat_artifact_is_read_and_replaced_by_a_version(tmp_path):
+    path = str(tmp_path / "artifact")
+    header = {"version": 1, "model": "m", "chunk_size": 1, "chunk_overlap": 0, "dtype": "float32",
+              "dimension": 2, "count": 1, "created": 0, "files": {"a.pdf": {"sha256": "x", "start": 0, "count": 1}}}
+    records = [{"id": "a-0", "text": "tea", "metadata": {}}]
+    directory = write_artifact(path, header, records, np.array([[1.0, 0.0]], dtype=np.float32))
+    for name in os.listdir(directory):
+        shutil.move(os.path.join(directory, name), os.path.join(path, name))
+    os.remove(os.path.join(path, POINTER))
+
+    assert EmbeddingArtifact.load(path).records == records
+    write_artifact(path, header, records, np.array([[0.0, 1.0]], dtype=np.float32))
+    assert not os.path.exists(os.path.join(path, "header.json"))
+    np.testing.assert_array_equal(EmbeddingArtifact.load(path).unit_vectors(), [[0.0, 1.0]])
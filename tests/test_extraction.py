@@ -0,0 +1,54 @@
+import io
+
+import pytest
+import pytesseract
+from docx import Document
+from PIL import Image
+
+from src import extraction
+from src.extraction import extract_document, ocr_images
+from src.prompt import VERIFICATION_WINDOW
+from src.tokens import estimate_tokens
+
+
+def _docx(paragraphs):
+    document = Document()
+    for text in paragraphs:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def test_full_text_by_default():
+    data = _docx([f"Line {i}: footwear with leather uppers, HS 6403.99.00" for i in range(200)])
+    text = extract_document(data, "docx")
+    assert len(text) > VERIFICATION_WINDOW
+    assert "Line 199:" in text
+
+
+def test_max_chars_stops_early():
+    data = _docx(["x" * 100] * 100)
+    assert len(extract_document(data, "docx", max_chars=1000)) < 1200
+
+
+def test_unreadable_image_is_skipped():
+    assert ocr_images([b"not an image"]) == ""
+
+
+def test_max_tokens_reads_until_both_windows_are_covered():
+    data = _docx(["tea " * 50] * 100)
+    text = extract_document(data, "docx", max_chars=100, max_tokens=600)
+    assert estimate_tokens(text) > 600
+    assert len(text) < 3000
+
+
+def test_tesseract_errors_are_not_swallowed(monkeypatch):
+    def missing_binary(image):
+        raise pytesseract.TesseractNotFoundError()
+
+    monkeypatch.setattr(extraction.pytesseract, "image_to_string", missing_binary)
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "white").save(buffer, format="PNG")
+    with pytest.raises(pytesseract.TesseractNotFoundError):
+        ocr_images([buffer.getvalue()])
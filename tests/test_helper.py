@@ -0,0 +1,37 @@
+import os
+
+from src.helper import iter_pdf_chunks, load_multiple_pdfs, repair_extracted_text, text_split
+
+
+def test_shifted_font_lines_are_repaired():
+    assert repair_extracted_text("+HDGLQJ\x03\x13\x1c\x11\x13\x15") == "Heading 09.02"
+    assert repair_extracted_text("NJ\x03\x03 NLORJUDP\x0bV\x0c\x03\x03") == "kg   kilogram(s)  "
+
+
+def test_normal_font_words_on_mixed_lines_are_kept():
+    line = "Chapter \x1c\x03 &RIIHH\x0f\x03WHD\x03 ends here"
+    assert repair_extracted_text(line) == "Chapter 9  Coffee, tea  ends here"
+
+
+def test_normal_font_codes_on_mixed_lines_are_kept():
+    line = "HS 0902 green tea \x1c\x03&RIIHH\x0f\x03WHD\x03"
+    assert repair_extracted_text(line) == "HS 0902 green tea 9 Coffee, tea "
+
+
+def test_short_runs_of_fully_shifted_lines_are_repaired():
+    assert repair_extracted_text("\x03\x13\x14\x13\x15\x11\x16\x1c\x11\x13\x13  QRV   \x19") == " 0102.39.00  nos   6"
+
+
+def test_lines_without_control_characters_are_untouched():
+    text = "HS 0902 GREEN TEA\n+HDGLQJ"
+    assert repair_extracted_text(text) == text
+
+
+def test_parallel_chunks_match_pypdfloader_chunks():
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "data", "nepal.pdf")
+    expected = text_split(load_multiple_pdfs([path]))
+    chunks = list(iter_pdf_chunks([path], max_workers=2, pages_per_task=3))
+
+    assert [c.page_content for c in chunks] == [c.page_content for c in expected]
+    assert [c.metadata for c in chunks] == [c.metadata for c in expected]
+    assert {"producer", "creator", "creationdate"} <= set(chunks[0].metadata)
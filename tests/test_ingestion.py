@@ -0,0 +1,90 @@
+import os
+import shutil
+
+import pytest
+from langchain_core.documents import Document
+
+from src.ingestion import chunk_ids, load_manifest, run_incremental_ingest
+
+DATA = os.path.join(os.path.dirname(__file__), os.pardir, "data")
+
+
+class RecordingIndex:
+    """Pinecone-style upsert/delete over a dict."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, vectors):
+        self.vectors.update({v["id"]: v for v in vectors})
+
+    def delete(self, ids):
+        for vid in ids:
+            self.vectors.pop(vid, None)
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def _chunk(text, page):
+    return Document(page_content=text, metadata={"page": page})
+
+
+def test_chunk_ids_change_when_a_chunk_moves_page():
+    same_page = chunk_ids("a.pdf", [_chunk("Header", 0), _chunk("Header", 0)])
+    assert len(set(same_page)) == 2
+    assert chunk_ids("a.pdf", [_chunk("Header", 0)]) == same_page[:1]
+    assert chunk_ids("a.pdf", [_chunk("Header", 1)]) != same_page[:1]
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    index = RecordingIndex()
+    manifest_path = str(tmp_path / "manifest.json")
+
+    def run():
+        model = CountingEmbeddings()
+        stats = run_incremental_ingest(str(data_dir), index, lambda: model, manifest_path=manifest_path,
+                                       settings={"model": "test"}, max_workers=1)
+        return stats, model.embedded
+
+    run.data_dir = data_dir
+    run.index = index
+    run.manifest_path = manifest_path
+    return run
+
+
+def test_incremental_ingest_tracks_unchanged_modified_and_deleted_files(ingest):
+    shutil.copy(os.path.join(DATA, "np_e.pdf"), ingest.data_dir / "a.pdf")
+    shutil.copy(os.path.join(DATA, "trade_industry_tax.pdf"), ingest.data_dir / "b.pdf")
+    stats, embedded = ingest()
+    assert stats["parsed_files"] == 2 and embedded == len(ingest.index.vectors) > 0
+
+    # Unchanged: nothing parsed, embedding model never built
+    stats, embedded = ingest()
+    assert stats["parsed_files"] == 0 and embedded == 0
+
+    # Modified: only the changed file's new chunks are embedded, its old ones deleted
+    manifest, _ = load_manifest(ingest.manifest_path, {"model": "test"})
+    old_a = set(manifest["files"]["a.pdf"]["chunks"])
+    shutil.copy(os.path.join(DATA, "nepal.pdf"), ingest.data_dir / "a.pdf")
+    stats, embedded = ingest()
+    manifest, _ = load_manifest(ingest.manifest_path, {"model": "test"})
+    new_a = manifest["files"]["a.pdf"]["chunks"]
+    assert stats["parsed_files"] == 1 and embedded == len(new_a)
+    assert not old_a & set(ingest.index.vectors)
+    assert all(ingest.index.vectors[vid]["metadata"]["source"].endswith("a.pdf") for vid in new_a)
+
+    # Deleted: its vectors go, the other file's stay
+    os.remove(ingest.data_dir / "a.pdf")
+    stats, embedded = ingest()
+    assert stats["removed_files"] == 1 and embedded == 0
+    assert set(ingest.index.vectors) == set(manifest["files"]["b.pdf"]["chunks"])
@@ -0,0 +1,83 @@
+import pytest
+
+from src import intent_router
+from src.duty_calculator import DutyCalculator
+from src.intent_router import IntentRouter, extract_value, extract_hs_code
+
+
+@pytest.mark.parametrize("text, expected", [
+    # The currency after a keyword amount must not be lost to the NPR default
+    ("total duty and vat for 0902.10.00 with invoice value 10000 INR", (10000.0, "INR")),
+    ("calculate the duty on 6403.99 worth USD 5000 FOB", (5000.0, "USD")),
+    ("how much tax do I pay on 8517.13 valued at Rs 200000", (200000.0, "NPR")),
+    ("duty on 6403.99 worth 5,000", (5000.0, "NPR")),
+    ("duty on 6403.99 worth 5000, invoiced as 60 dollars", (60.0, "USD")),
+    ("what is the duty on 6403.99", (None, None)),
+])
+def test_extract_value(text, expected):
+    assert extract_value(text) == expected
+
+
+def test_extract_hs_code_ignores_years():
+    assert extract_hs_code("duty changes in 2024") is None
+    assert extract_hs_code("hs code 6403") == "6403"
+    assert extract_hs_code("customs duty rate for hs 6403.99") == "640399"
+
+
+@pytest.fixture
+def router(tariff_index, monkeypatch):
+    calculator = DutyCalculator(index=tariff_index, excise_rates={}, levies={}, exchange_rates={"NPR": 1.0, "INR": 1.6})
+    monkeypatch.setattr(intent_router, "get_duty_calculator", lambda: calculator)
+    return IntentRouter(mode="rules")
+
+
+def test_calculation_converts_inr(router):
+    answer = router.route("total duty and vat for 0902.10.00 with invoice value 10000 INR")
+    # 10000 INR FOB + 1% insurance = 10100 INR = NPR 16160 assessable, 40% duty
+    assert "Assessable value at 1.6 NPR/INR: NPR 16,160.00" in answer
+    assert "NPR 6,464.00" in answer
+
+
+def test_calculation_resolves_subheading(router):
+    answer = router.route("calculate the duty on 6403.99 worth Rs 5000 FOB")
+    assert answer.startswith("HS 6403.99.00")
+
+
+def test_calculation_falls_back_to_rag(router):
+    # No exchange rate for USD
+    assert router.route("calculate the duty on 6403.99 worth USD 5000 FOB") is None
+    # Heading 8517 covers two tariff lines, so there is no single rate
+    assert router.route("calculate the duty on hs 8517 worth Rs 5000") is None
+    assert router.stats() == {"rag": 2}
+
+
+def test_trade_stats_are_formatted(mock_trade_api):
+    answer = IntentRouter(mode="rules").route("trade statistics for hs 0902 in India")
+    assert answer.startswith("Trade statistics for HS 0902, reported by India")
+    assert "US$ 1,234,567" in answer
+    assert "{" not in answer
+
+
+def test_routing_lookups_are_not_retried(mock_trade_api):
+    mock_trade_api.fail_first = 1
+    assert IntentRouter(mode="rules").route("trade statistics for hs 0902 in India") is None
+    assert mock_trade_api.hits["/public/v1/preview"] == 1
+
+
+def _router_near(intent):
+    """A full-mode router whose embedder puts every question next to `intent`'s examples."""
+    embed_documents = lambda texts: [
+        [1.0, 0.0] if text in intent_router.INTENT_EXAMPLES[intent] else [0.0, 1.0] for text in texts
+    ]
+    return IntentRouter(embed=lambda text: [1.0, 0.0], embed_documents=embed_documents, mode="full")
+
+
+def test_embedding_classifier_runs_without_slots():
+    intent, slots, method = _router_near("hs_code").classify("how would bamboo baskets be categorised")
+    assert (intent, method) == ("hs_code", "embedding")
+    assert "bamboo baskets" in slots["product"]
+
+
+def test_embedding_intent_without_its_slots_goes_to_rag():
+    intent, _, method = _router_near("duty").classify("how much would I pay on that")
+    assert (intent, method) == (intent_router.RAG, None)
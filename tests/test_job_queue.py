@@ -0,0 +1,112 @@
+import time
+import threading
+
+import pytest
+
+from src.job_queue import JobQueue, JobWorkerPool, public_job
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.3, max_attempts=2, result_ttl=60)
+
+
+def test_enqueue_deduplicates_by_content(queue):
+    job, created = queue.enqueue(b"invoice", "pdf", filename="a.pdf")
+    again, created_again = queue.enqueue(b"invoice", "pdf", filename="b.pdf")
+    other, created_other = queue.enqueue(b"packing list", "pdf")
+    assert created and not created_again and created_other
+    assert again["id"] == job["id"] and other["id"] != job["id"]
+
+    claimed, data = queue.claim()
+    assert data == b"invoice"
+    assert queue.complete(claimed, {"verification": "ok"})
+    cached, created = queue.enqueue(b"invoice", "pdf")
+    assert not created and cached["status"] == "done" and cached["result"] == {"verification": "ok"}
+    assert public_job(cached)["result"] == {"verification": "ok"}
+
+
+def test_claim_is_exclusive_until_the_lease_expires(queue):
+    queue.enqueue(b"invoice", "pdf")
+    first, _ = queue.claim()
+    assert queue.claim() == (None, None)
+    time.sleep(0.35)
+    second, _ = queue.claim()
+    assert second["id"] == first["id"] and second["attempts"] == 2
+
+
+def test_stale_claim_cannot_write(queue):
+    queue.enqueue(b"invoice", "pdf")
+    stale, _ = queue.claim()
+    time.sleep(0.35)
+    current, _ = queue.claim()
+
+    assert not queue.renew(stale)
+    assert not queue.update_progress(stale, {"completed": ["extract"]})
+    assert not queue.complete(stale, {"from": "stale"})
+    assert queue.fail(stale, "boom") is None
+    job = queue.get(current["id"])
+    assert job["status"] == "running" and job["result"] is None and job["progress"] == {}
+
+    assert queue.complete(current, {"from": "current"})
+    assert queue.get(current["id"])["result"] == {"from": "current"}
+
+
+def test_failed_job_is_retried_then_failed(queue):
+    queue.enqueue(b"invoice", "pdf")
+    job, _ = queue.claim()
+    assert queue.fail(job, "boom") == "retried"
+    job, _ = queue.claim()
+    assert queue.fail(job, "boom again") == "failed"
+    assert queue.get(job["id"])["error"] == "boom again"
+    assert queue.claim() == (None, None)
+    # A failed document can be uploaded again
+    assert queue.enqueue(b"invoice", "pdf")[1]
+
+
+def test_abandoned_job_fails_after_max_attempts(queue):
+    job, _ = queue.enqueue(b"invoice", "pdf")
+    queue.claim()
+    time.sleep(0.35)
+    queue.claim()
+    time.sleep(0.35)
+    assert queue.claim() == (None, None)
+    assert queue.get(job["id"])["status"] == "failed"
+
+
+def test_worker_renews_the_lease_during_a_long_stage(queue):
+    release = threading.Event()
+
+    def slow_handler(job, data, on_stage):
+        release.wait(2)
+        on_stage("extract", 1.0)
+        return {"size": len(data)}
+
+    pool = JobWorkerPool(queue, slow_handler, workers=1, stages=("extract",), poll_interval=0.05).start()
+    try:
+        job, _ = queue.enqueue(b"large scan", "pdf")
+        pool.notify()
+        # Three lease periods inside one stage: another claimant must not get the job
+        time.sleep(0.9)
+        assert queue.claim() == (None, None)
+        release.set()
+        for _ in range(40):
+            if queue.get(job["id"])["status"] == "done":
+                break
+            time.sleep(0.05)
+        job = queue.get(job["id"])
+        assert job["status"] == "done" and job["attempts"] == 1
+        assert job["result"] == {"size": 10}
+        assert job["progress"]["completed"] == ["extract"]
+    finally:
+        release.set()
+        pool.stop(timeout=2)
+
+
+def test_purge_removes_expired_results(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), result_ttl=0)
+    queue.enqueue(b"invoice", "pdf")
+    job, _ = queue.claim()
+    queue.complete(job, {})
+    assert queue.purge() == 1
+    assert queue.get(job["id"]) is None
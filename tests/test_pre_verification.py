@@ -0,0 +1,20 @@
+from src.pre_verification import prepare_verification
+
+INVOICE = (
+    "COMMERCIAL INVOICE\nExporter: Himalayan Tea Co.\nConsignee: Leipzig Imports GmbH\n"
+    "HS Code 0902.10 green tea, Country of origin: Nepal\nQuantity 100 kg, value USD 1,200 FOB"
+)
+
+
+def test_clearly_invalid_documents_are_answered_without_the_llm():
+    answer, prompt = prepare_verification("lorem ipsum")
+    assert prompt is None
+    assert "❌ Incorrect" in answer
+
+
+def test_other_documents_get_a_prompt_with_the_pre_checked_fields():
+    answer, prompt = prepare_verification(INVOICE)
+    assert answer is None
+    assert "- HS codes: 090210" in prompt
+    assert "- Incoterms: FOB" in prompt
+    assert prompt.endswith(INVOICE)
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from src.retrieval_eval import first_relevant_rank, load_questions, recommend, run_grid, score
+from src.stand_ins import HashingEmbeddings
+
+
+def _doc(text, source="data/nepal.pdf"):
+    return Document(page_content=text, metadata={"source": source})
+
+
+@pytest.fixture
+def questions(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    path.write_text("\n".join(json.dumps(q) for q in [
+        {"id": "tea", "question": "Duty on green tea?", "answers": ["Green  Tea"]},
+        {"id": "value", "question": "How is customs value set?", "answers": ["transaction value"],
+         "source": "nepal.pdf"},
+        {"id": "permit", "question": "Who issues import permits?", "answers": ["Department of Commerce"]},
+    ]), encoding="utf-8")
+    return load_questions(str(path))
+
+
+def test_recall_and_mrr_on_a_labelled_set(questions):
+    retrieved = {
+        # relevant at rank 1
+        "Duty on green tea?": [_doc("green tea attracts 40%"), _doc("coffee")],
+        # the answer phrase at rank 1 is from another file, so the first relevant chunk is rank 2
+        "How is customs value set?": [_doc("the transaction value", source="data/np_e.pdf"),
+                                      _doc("Customs value is the transaction value")],
+        # never retrieved
+        "Who issues import permits?": [_doc("coffee"), _doc("tea")],
+    }
+    row = score(questions, retrieved.__getitem__)
+    assert row["recall"] == round(2 / 3, 3)
+    assert row["mrr"] == round((1 + 1 / 2 + 0) / 3, 3)
+    assert row["missed"] == ["permit"]
+    assert first_relevant_rank(questions[1], retrieved["How is customs value set?"]) == 2
+
+
+def test_grid_finds_the_labelled_chunks(questions):
+    documents = [
+        _doc("Green tea in immediate packings attracts a customs duty of 40 percent. " * 3),
+        _doc("Customs value is the transaction value of the goods plus freight and insurance. " * 3),
+        _doc("Import permits are issued by the Department of Commerce, Supplies and Consumer Protection. " * 3,
+             source="data/np_e.pdf"),
+    ]
+    rows = run_grid(documents, questions, HashingEmbeddings(), chunk_sizes=[400], overlaps=[0], ks=[1, 3])
+    by_k = {row["k"]: row for row in rows}
+    assert set(by_k) == {1, 3}
+    # at k=3 every chunk of this three-document corpus is retrieved
+    assert by_k[3]["recall"] == 1.0 and by_k[3]["mrr"] >= by_k[1]["mrr"]
+    assert by_k[1]["prompt_tokens"] < by_k[3]["prompt_tokens"]
+    assert recommend(rows, max_recall_drop=0.0)["recall"] == max(row["recall"] for row in rows)
@@ -0,0 +1,67 @@
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.cache import LRUCache
+from src.session_store import InMemorySessionStore, SQLiteSessionStore
+
+TURN = [HumanMessage(content="What is the duty on tea?"), AIMessage(content="Tea attracts 40% customs duty.")]
+
+
+def test_sliding_cache_restarts_ttl_on_each_hit():
+    cache = LRUCache(ttl=0.3, sliding=True)
+    cache.set("k", "v")
+    for _ in range(3):
+        time.sleep(0.15)
+        assert cache.get("k") == "v"
+    time.sleep(0.35)
+    assert cache.get("k") is None
+
+
+def test_fixed_cache_expires_despite_hits():
+    cache = LRUCache(ttl=0.3)
+    cache.set("k", "v")
+    time.sleep(0.2)
+    assert cache.get("k") == "v"
+    time.sleep(0.15)
+    assert cache.get("k") is None
+
+
+def test_in_memory_sessions_stay_alive_while_read():
+    store = InMemorySessionStore(ttl=0.3)
+    store.append("session-1", TURN)
+    for _ in range(3):
+        time.sleep(0.15)
+        assert len(store.load("session-1")[1]) == 2
+
+
+def test_sqlite_sessions_stay_alive_while_read(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), ttl=0.3)
+    store.append("session-1", TURN)
+    for _ in range(3):
+        time.sleep(0.15)
+        assert len(store.load("session-1")[1]) == 2
+    time.sleep(0.35)
+    assert store.load("session-1") == ("", [])
+
+
+def test_sqlite_eviction_runs_at_most_once_per_interval(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), max_sessions=2, evict_interval=3600)
+    for i in range(4):
+        store.append(f"session-{i}", TURN)
+    # Purged by the first append only
+    assert len(store) == 4
+
+    store._last_evict = 0.0
+    store.append("session-4", TURN)
+    assert len(store) == 2
+    assert store.load("session-0") == ("", [])
+    assert len(store.load("session-4")[1]) == 2
+
+
+def test_sqlite_expired_session_is_not_revived_by_a_write(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"), ttl=0.2, evict_interval=3600)
+    store.append("session-1", TURN)
+    time.sleep(0.25)
+    store.append("session-1", TURN[:1])
+    assert [m.content for m in store.load("session-1")[1]] == [TURN[0].content]
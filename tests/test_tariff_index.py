@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+from src.resources import ResourceRegistry
+from src.tariff_index import TariffIndex, _SCHEMA
+from tests.conftest import tariff_line
+
+
+@pytest.fixture
+def sqlite_tariff_index(tmp_path):
+    path = str(tmp_path / "tariff.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    conn.executemany(
+        "INSERT INTO tariff_lines VALUES (:code, :heading, :subheading, :description, :context, :unit, "
+        ":duty_saarc, :duty_general, :duty_text, :page)",
+        [
+            tariff_line("09021000", "Green tea in immediate packings", 40.0, context="Tea"),
+            tariff_line("09023000", "Black tea (fermented)", 40.0, context="Tea"),
+            tariff_line("64035900", "Other footwear with outer soles of leather", 40.0),
+        ],
+    )
+    conn.execute("INSERT INTO tariff_fts (tariff_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.close()
+    return TariffIndex(path)
+
+
+def test_search_ignores_question_words(sqlite_tariff_index):
+    codes = [line["code"] for line in sqlite_tariff_index.search("What is the HS code for green tea?")]
+    assert codes == ["09021000"]
+
+
+def test_search_falls_back_to_any_term(sqlite_tariff_index):
+    codes = [line["code"] for line in sqlite_tariff_index.search("leather sandals")]
+    assert codes == ["64035900"]
+    assert sqlite_tariff_index.search("what is the duty") == []
+
+
+def test_registry_retries_factories_that_returned_none():
+    registry = ResourceRegistry()
+    values = iter([None, "index"])
+    registry.register("tariff_index", lambda: next(values), cache_none=False)
+
+    assert registry.get("tariff_index") is None
+    assert not registry.is_ready("tariff_index")
+    assert registry.get("tariff_index") == "index"
+    assert registry.is_ready("tariff_index")
@@ -0,0 +1,86 @@
+import time
+import threading
+
+import pytest
+import requests
+
+from src import trade_api_integration
+from src.trade_api_integration import TradeApiClient, normalise_query, get_eu_doc_requirements
+
+HS_LOOKUP = ("api_ninjas", "/v1/hslookup")
+
+
+def _lookup(client, query):
+    return client.get_json(*HS_LOOKUP, params={"query": query}, kind="hs_lookup")
+
+
+@pytest.fixture
+def client(mock_trade_api):
+    return TradeApiClient(base_urls=mock_trade_api.base_urls, retries=2)
+
+
+def test_normalise_query():
+    assert normalise_query("  Leather   SHOES ") == "leather shoes"
+    assert normalise_query("6403.99") == normalise_query("640399") == "640399"
+
+
+def test_responses_are_cached_by_normalised_query(client, mock_trade_api):
+    first = _lookup(client, "leather shoes")
+    assert first[0]["hs_code"] == "6403.99"
+    assert _lookup(client, "  Leather Shoes") == first
+    assert mock_trade_api.hits["/v1/hslookup"] == 1
+    assert client.stats()["requests_sent"] == 1
+
+
+def test_cache_entries_expire_after_their_ttl(client, mock_trade_api, monkeypatch):
+    monkeypatch.setitem(trade_api_integration.CACHE_TTLS, "hs_lookup", 0.2)
+    _lookup(client, "green tea")
+    _lookup(client, "green tea")
+    assert mock_trade_api.hits["/v1/hslookup"] == 1
+    time.sleep(0.25)
+    _lookup(client, "green tea")
+    assert mock_trade_api.hits["/v1/hslookup"] == 2
+
+
+def test_concurrent_identical_lookups_share_one_request(client, mock_trade_api):
+    mock_trade_api.latency = 0.2
+    start = threading.Barrier(5)
+    results = []
+
+    def lookup():
+        start.wait()
+        results.append(_lookup(client, "mobile phone"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 5 and all(r == results[0] for r in results)
+    assert mock_trade_api.hits["/v1/hslookup"] == 1
+    assert client.stats()["requests_sent"] == 1
+    assert client.stats()["coalesced"] == 4
+
+
+def test_server_errors_are_retried(client, mock_trade_api):
+    mock_trade_api.fail_first = 2
+    assert _lookup(client, "leather shoes")[0]["hs_code"] == "6403.99"
+    assert mock_trade_api.hits["/v1/hslookup"] == 3
+
+
+def test_exhausted_retries_raise_and_are_not_cached(mock_trade_api):
+    client = TradeApiClient(base_urls=mock_trade_api.base_urls, retries=1)
+    mock_trade_api.fail_first = 2
+    with pytest.raises(requests.exceptions.RequestException):
+        _lookup(client, "leather shoes")
+    assert mock_trade_api.hits["/v1/hslookup"] == 2
+    # The next call goes to the (now healthy) server again
+    assert _lookup(client, "leather shoes")[0]["hs_code"] == "6403.99"
+
+
+def test_lookup_functions_use_the_shared_client(mock_trade_api):
+    assert get_eu_doc_requirements("6403.99") == (
+        "Documentation required for HS 6403.99: Third country duty, Certificate of origin"
+    )
+    assert mock_trade_api.hits["/api/commodities/640399"] == 1
@@ -0,0 +1,88 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from src.vector_store import LocalVectorIndex, manifest_settings
+from src.versioned_dir import POINTER, current_dir
+
+
+def _vector(i, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[i % dim] = 1.0
+    return v.tolist()
+
+
+def _records(ids, tag=""):
+    return [{"id": vid, "values": _vector(i), "metadata": {"text": f"{vid}{tag}"}} for i, vid in enumerate(ids)]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "int8"])
+def test_flush_and_reload(tmp_path, dtype):
+    index = LocalVectorIndex(str(tmp_path), dtype=dtype)
+    index.upsert(_records(["a", "b", "c"]))
+    index.flush()
+    loaded = LocalVectorIndex(str(tmp_path))
+    assert loaded.ids == ["a", "b", "c"] and loaded.dtype == dtype
+    row, score = loaded.query(_vector(1), top_k=1)[0]
+    assert loaded.ids[row] == "b" and score == pytest.approx(1.0, abs=1e-2)
+
+
+def test_duplicate_ids_in_one_batch_keep_the_last(tmp_path):
+    index = LocalVectorIndex(str(tmp_path))
+    index.upsert([
+        {"id": "a", "values": _vector(0), "metadata": {"text": "first"}},
+        {"id": "a", "values": _vector(1), "metadata": {"text": "second"}},
+    ])
+    assert index.ids == ["a"] and index.metadata == [{"text": "second"}]
+    assert index.query(_vector(1), top_k=1)[0][0] == 0
+
+
+def test_reader_keeps_the_version_it_loaded(tmp_path):
+    writer = LocalVectorIndex(str(tmp_path))
+    writer.upsert(_records(["a", "b"]))
+    writer.flush()
+    reader = LocalVectorIndex(str(tmp_path))
+
+    writer.upsert(_records(["a", "b", "c"], tag=" v2"))
+    writer.flush()
+    # The old version is still on disk for readers that resolved the pointer before the swap
+    assert len(reader) == 2 and reader.metadata[0] == {"text": "a"}
+    assert LocalVectorIndex(str(tmp_path)).metadata[0] == {"text": "a v2"}
+
+    writer.delete(["c"])
+    writer.flush()
+    versions = [d for d in os.listdir(tmp_path) if d.startswith("v-")]
+    assert len(versions) == 2
+    assert os.path.basename(current_dir(str(tmp_path))) in versions
+
+
+def test_reads_and_replaces_unversioned_layout(tmp_path):
+    np.save(tmp_path / "vectors.npy", np.asarray([_vector(0)], dtype=np.float32))
+    (tmp_path / "metadata.json").write_text(json.dumps([{"id": "a", "metadata": {"text": "old"}}]))
+    (tmp_path / "index.json").write_text(json.dumps({"version": 1, "dtype": "float32", "dimension": 8, "count": 1}))
+
+    index = LocalVectorIndex(str(tmp_path))
+    assert index.ids == ["a"]
+    index.upsert(_records(["b"]))
+    index.flush()
+    assert (tmp_path / POINTER).exists() and not (tmp_path / "index.json").exists()
+    assert LocalVectorIndex(str(tmp_path)).ids == ["a", "b"]
+
+
+def test_dtype_change_is_reported_and_applied_after_a_rebuild(tmp_path, capsys):
+    index = LocalVectorIndex(str(tmp_path), dtype="int8")
+    index.upsert(_records(["a", "b"]))
+    index.flush()
+
+    reopened = LocalVectorIndex(str(tmp_path), dtype="float32")
+    assert reopened.dtype == "int8"
+    assert "stored as int8, not float32" in capsys.readouterr().out
+    assert manifest_settings(reopened, {"model": "m"}) == {"model": "m", "local_index_dtype": "float32"}
+
+    # A settings change makes ingestion delete every vector and store them again
+    reopened.delete(["a", "b"])
+    reopened.upsert(_records(["a", "b"]))
+    reopened.flush()
+    assert LocalVectorIndex(str(tmp_path), dtype="float32").dtype == "float32"